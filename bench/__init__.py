@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Offline benchmarks of the add-on. See bench/README.md."""
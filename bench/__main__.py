@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+import sys
+
+from bench import routes
+
+if __name__ == '__main__':
+    sys.exit(routes.main())
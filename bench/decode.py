@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Decode time and memory of large responses, per decoding mode
+
+Every page is decoded by:
+
+- ordered: json.loads with object_pairs_hook=OrderedDict, what every response used to be decoded with
+- dict: json.loads to plain dicts, what Viaplay.parse_response does
+- projected: plain dicts pruned with hal.project, for the pages read with a projection
+
+and for every mode it reports the median decode time, the peak memory while
+decoding and the memory the decoded document keeps. The pages are large
+synthetic channels, EPG and list pages, or the responses in a folder of
+recordings with --recordings."""
+
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+from datetime import datetime
+
+from bench import fixtures, report
+from resources.lib.hal import EPG_NOW_PROJECTION, EPG_PROGRAMME_PROJECTION, project
+
+# an EPG page as the EPG store reads it
+EPG_STORE_PROJECTION = {'_embedded': {'viaplay:products': EPG_PROGRAMME_PROJECTION}}
+
+MODES = {
+    'ordered': lambda body: json.loads(body, object_pairs_hook=OrderedDict),
+    'dict': json.loads
+}
+
+
+def synthetic_pages():
+    """Return (name, body, projections) of the synthetic pages."""
+    now = datetime.utcnow()
+    epg_projections = {'projected': EPG_STORE_PROJECTION, 'projected_now': EPG_NOW_PROJECTION}
+    return [
+        ('channels_200', json.dumps(fixtures.channels_page(200, now)), {}),
+        ('epg_500', json.dumps(fixtures.epg_page(fixtures.channel_guid(0), now, 500)), epg_projections),
+        ('list_1000', json.dumps(fixtures.list_page(fixtures.LIST_URL, 1, 1, 1000, now)), {})
+    ]
+
+
+def recorded_pages(folder):
+    """Return (name, body, projections) of every recording in folder. EPG pages get the EPG projections."""
+    pages = []
+    for name in sorted(os.listdir(folder)):
+        if name.endswith('.json') and not name.endswith('.baseline.json'):
+            with open(os.path.join(folder, name)) as recording_file:
+                recording = json.load(recording_file)
+            projections = {}
+            if recording['url'].startswith('https://epg.'):
+                projections = {'projected': EPG_STORE_PROJECTION, 'projected_now': EPG_NOW_PROJECTION}
+            pages.append((os.path.splitext(name)[0], recording['body'], projections))
+    return pages
+
+
+def measure(decode, body, repeat):
+    """Return the median ms, the peak KiB while decoding and the KiB kept by the result of decode(body)."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.time()
+        decode(body)
+        times.append(time.time() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        data = decode(body)
+        kept, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del data
+    return round(statistics.median(times) * 1000, 2), peak // 1024, kept // 1024
+
+
+def decode_page(body, projections, repeat):
+    decoders = dict(MODES)
+    for mode, projection in projections.items():
+        decoders[mode] = lambda b, p=projection: project(json.loads(b), p)
+
+    result = {'bytes': len(body)}
+    for mode, decode in decoders.items():
+        result['%s_ms' % mode], result['%s_peak_kib' % mode], result['%s_kept_kib' % mode] = \
+            measure(decode, body, repeat)
+    return result
+
+
+def run(args):
+    pages = recorded_pages(args.recordings) if args.recordings else synthetic_pages()
+    return {
+        'python': sys.version.split()[0],
+        'pages': args.recordings or 'synthetic',
+        'repeat': args.repeat,
+        'cases': dict((name, decode_page(body, projections, args.repeat)) for name, body, projections in pages)
+    }
+
+
+def main(argv=None):
+    parser = report.parser('Compare the decode time and memory of large responses per decoding mode.')
+    parser.add_argument('--recordings', help='folder of recorded responses to decode instead of the synthetic pages')
+    parser.add_argument('--repeat', type=int, default=10, help='decodes per mode, the median time is reported')
+    args = parser.parse_args(argv)
+    if args.recordings and not args.baseline:
+        # recordings aren't comparable with the synthetic baseline
+        args.baseline = os.path.join(args.recordings, 'decode.baseline.json')
+    return report.main('decode', args, run)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
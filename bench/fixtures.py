@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""Synthetic Viaplay API for the benchmark routes
+
+Responses have the shape of the viaplay.se API as far as the add-on reads it,
+and are generated for the current day so live and upcoming programmes stay
+live and upcoming. Recordings of the real API (see the hidden record_responses
+setting) can be served on top of them with StubServer.load()."""
+
+from datetime import datetime, timedelta
+
+CONTENT = 'https://content.viaplay.se/xdk-se'
+ROOT_URL = CONTENT
+SERIES_URL = CONTENT + '/serier'
+LIST_URL = CONTENT + '/serier/samtliga'
+CHANNELS_URL = CONTENT + '/kanaler'
+SPORT_URL = CONTENT + '/sport'
+SCHEDULE_URL = CONTENT + '/sport/tablaa'
+STREAM_URL = 'https://play.viaplay.se/api/stream/bymediaguid'
+LOGIN_URL = 'https://login.viaplay.se/api/persistentLogin/v1'
+EPG_URL = 'https://epg.viaplay.se/xdk-se/channel/%s/'
+
+DEVICE_ID = '00000000-0000-4000-8000-000000000000'
+USER_DATA = {'userId': 'bench-user', 'accessToken': 'bench-token', 'firstName': 'Bench'}
+IMAGE = 'https://i-viaplay-com.akamaized.net/viaplay-prod/%s/%s.jpg{?width,height}'
+
+
+def timestamp(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def images(guid, names=('landscape', 'boxart', 'hero169', 'coverart23', 'coverart169')):
+    return dict((name, {'template': IMAGE % (name, guid)}) for name in names)
+
+
+def links(href, **extra):
+    result = {'self': {'href': href}, 'viaplay:genres': [{'title': 'Drama'}, {'title': 'Thriller'}]}
+    result.update(extra)
+    return result
+
+
+def movie(number):
+    guid = 'movie-%s' % number
+    return {
+        'type': 'movie',
+        'system': {'guid': guid, 'flags': []},
+        'content': {
+            'title': 'Movie %s' % number,
+            'synopsis': 'The synopsis of movie %s. ' % number * 4,
+            'duration': {'milliseconds': 5400000},
+            'production': {'year': 2000 + number % 25},
+            'people': {'actors': ['Actor %s' % x for x in range(6)], 'directors': ['Director %s' % number]},
+            'imdb': {'rating': '7.%s' % (number % 10), 'votes': 1000 + number, 'id': 'tt%07d' % number},
+            'parentalRating': '15',
+            'images': images(guid)
+        },
+        '_links': links(CONTENT + '/film/movie-%s' % number)
+    }
+
+
+def series(number):
+    guid = 'series-%s' % number
+    page = CONTENT + '/serier/series-%s' % number
+    return {
+        'type': 'series',
+        'system': {'guid': guid, 'flags': []},
+        'content': {
+            'synopsis': 'The synopsis of series %s. ' % number * 4,
+            'series': {'title': 'Series %s' % number, 'synopsis': 'Series %s' % number, 'seasons': 3},
+            'production': {'year': 2010 + number % 15},
+            'people': {'actors': ['Actor %s' % x for x in range(6)]},
+            'imdb': {'rating': '8.%s' % (number % 10), 'votes': 2000 + number, 'id': 'tt%07d' % number},
+            'images': images(guid)
+        },
+        '_links': links(page, **{'viaplay:page': {'href': page}})
+    }
+
+
+def episode(number):
+    guid = 'episode-%s' % number
+    return {
+        'type': 'episode',
+        'system': {'guid': guid, 'flags': []},
+        'content': {
+            'title': 'Episode %s' % number,
+            'synopsis': 'The synopsis of episode %s. ' % number * 3,
+            'duration': {'milliseconds': 2700000},
+            'series': {'title': 'Series', 'episodeTitle': 'Episode %s' % number, 'episodeNumber': number,
+                       'season': {'seasonNumber': 1 + number // 20}},
+            'production': {'year': 2020},
+            'images': images(guid, ('landscape', 'boxart'))
+        },
+        '_links': links(CONTENT + '/serier/series/episode-%s' % number)
+    }
+
+
+def sports_event(number, now):
+    guid = 'sport-%s' % number
+    start = now + timedelta(hours=number % 48 - 24)
+    return {
+        'type': 'sport',
+        'system': {'guid': guid, 'flags': [],
+                   'availability': {'start': timestamp(start), 'end': timestamp(start + timedelta(hours=2))}},
+        'epg': {'start': timestamp(start), 'end': timestamp(start + timedelta(hours=2))},
+        'content': {
+            'title': 'Match %s' % number,
+            'originalTitle': 'Match %s' % number,
+            'synopsis': 'Home - Away',
+            'format': {'title': 'Fotboll'},
+            'production': {'year': 2026},
+            'images': images(guid, ('landscape', 'boxart'))
+        },
+        '_links': links(CONTENT + '/sport/match-%s' % number)
+    }
+
+
+def sports_series(number, now):
+    guid = 'sport-series-%s' % number
+    start = now + timedelta(days=number % 14 - 7)
+    page = CONTENT + '/sport/series-%s' % number
+    return {
+        'type': 'sportSeries',
+        'system': {'guid': guid, 'flags': [],
+                   'availability': {'start': timestamp(start), 'end': timestamp(start + timedelta(days=14))}},
+        'content': {
+            'series': {'title': 'Tournament %s' % number},
+            'synopsis': 'All the matches of tournament %s' % number,
+            'format': {'title': 'Fotboll'},
+            'production': {'year': 2026},
+            'images': images(guid, ('landscape', 'boxart'))
+        },
+        '_links': links(page, **{'viaplay:page': {'href': page}})
+    }
+
+
+def tv_event(number, now):
+    """A programme of a channel, as listed by the channel pages."""
+    start = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=number % 48 - 24)
+    return programme(channel_guid(number % 10), start, 60, number)
+
+
+def clip(number):
+    guid = 'clip-%s' % number
+    return {
+        'type': 'clip',
+        'system': {'guid': guid, 'flags': []},
+        'content': {
+            'title': 'Highlights %s' % number,
+            'synopsis': 'The goals of match %s' % number,
+            'production': {'year': 2026},
+            'images': images(guid, ('landscape',))
+        },
+        '_links': links(CONTENT + '/sport/clip-%s' % number)
+    }
+
+
+def products(count, now=None, first=0):
+    """Return count products of the types list_products maps, most of them movies and series,
+    numbered from first."""
+    now = now or datetime.utcnow()
+    makers = (movie, series, movie, series, episode, lambda x: sports_event(x, now))
+    return [makers[x % len(makers)](x) for x in range(first, first + count)]
+
+
+def all_products(count, now=None):
+    """Return count products, as many of every type list_products maps."""
+    now = now or datetime.utcnow()
+    makers = (movie, series, episode, lambda x: sports_event(x, now), lambda x: sports_series(x, now),
+              lambda x: tv_event(x, now), clip)
+    return [makers[x % len(makers)](x) for x in range(count)]
+
+
+def list_page(url, number, page_count, per_page, now=None):
+    page_links = {'self': {'href': '%s?pageNumber=%s' % (url, number)}}
+    if number < page_count:
+        page_links['next'] = {'href': '%s?pageNumber=%s' % (url, number + 1)}
+    return {
+        'type': 'vod-list',
+        'title': 'Alla serier',
+        'pageCount': page_count,
+        'productsPerPage': per_page,
+        'currentPage': number,
+        '_links': page_links,
+        '_embedded': {'viaplay:products': products(per_page, now, first=(number - 1) * per_page)}
+    }
+
+
+def root_page():
+    return {
+        'type': 'root',
+        'user': {'userId': USER_DATA['userId']},
+        '_links': {
+            'self': {'href': ROOT_URL},
+            'viaplay:root': {'title': 'Start', 'href': CONTENT + '/start'},
+            'viaplay:search': {'title': 'Sök', 'href': CONTENT + '/search'},
+            'viaplay:logout': {'title': 'Logga ut', 'href': 'https://login.viaplay.se/api/logout/v1'},
+            'viaplay:byGuid': {'title': 'byGuid', 'href': CONTENT + '/byguid'},
+            'viaplay:sections': [
+                {'name': 'series', 'title': 'serier', 'href': SERIES_URL},
+                {'name': 'movie', 'title': 'film', 'href': CONTENT + '/film'},
+                {'name': 'sport', 'title': 'sport', 'href': SPORT_URL},
+                {'name': 'channels', 'title': 'kanaler', 'href': CHANNELS_URL}
+            ]
+        }
+    }
+
+
+def vod_page(collections):
+    blocks = [{'type': 'list-featurebox', 'title': '', '_links': {'self': {'href': SERIES_URL + '/featurebox'}},
+               '_embedded': {'viaplay:products': products(5)}}]
+    for number in range(collections):
+        blocks.append({
+            'type': 'list',
+            'id': 'collection-%s' % number,
+            'title': 'Collection %s' % number,
+            'totalProductCount': 20,
+            '_links': {'self': {'href': '%s?pageNumber=1' % LIST_URL},
+                       'next': {'href': '%s?pageNumber=2' % LIST_URL}},
+            '_embedded': {'viaplay:products': products(20)}
+        })
+    return {
+        'type': 'page',
+        '_links': {'self': {'href': SERIES_URL},
+                   'viaplay:categoryFilters': [{'title': 'Drama', 'href': SERIES_URL + '/drama'}]},
+        '_embedded': {'viaplay:blocks': blocks}
+    }
+
+
+def schedule_page(now, days=14):
+    dates = [(now + timedelta(days=x)).strftime('%Y-%m-%d') for x in range(-days // 2, days // 2)]
+    return {
+        'type': 'page',
+        '_links': {'self': {'href': SCHEDULE_URL},
+                   'viaplay:days': [{'date': x, 'href': '%s?date=%s' % (SCHEDULE_URL, x)} for x in dates]}
+    }
+
+
+def programme(channel_guid, start, minutes, number):
+    guid = '%s-programme-%s' % (channel_guid, number)
+    return {
+        'type': 'tvEvent',
+        'system': {'guid': guid, 'flags': [],
+                   'catchupAvailability': {'end': timestamp(start + timedelta(days=7))}},
+        'epg': {'startTime': timestamp(start), 'endTime': timestamp(start + timedelta(minutes=minutes)),
+                'channelGuids': [channel_guid]},
+        'content': {
+            'title': 'Programme %s' % number,
+            'synopsis': 'What happens in programme %s. ' % number * 3,
+            'production': {'year': 2026},
+            'images': images(guid, ('landscape', 'boxart'))
+        },
+        'station': {'images': {'fallbackImage': {'template': IMAGE % ('station', 'replace-Channel%s_logo' % channel_guid)}}}
+    }
+
+
+def channel_guid(number):
+    return 'ch-%s-se' % number
+
+
+def channels_page(count, now):
+    """A channels page. Every channel embeds a finished, a live and an upcoming programme."""
+    blocks = []
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    for number in range(count):
+        guid = channel_guid(number)
+        blocks.append({'viaplay:channel': {
+            'system': {'channelGuid': guid},
+            'content': {'title': 'Channel %s' % number, 'channelNumber': number + 1,
+                        'images': {'logo': {'template': IMAGE % ('logo', guid)}}},
+            '_links': {'self': {'href': CHANNELS_URL + '/%s' % guid}},
+            '_embedded': {'viaplay:products': [programme(guid, hour + timedelta(hours=x), 60, x) for x in (-1, 0, 1)]}
+        }})
+    return {
+        'type': 'page',
+        '_links': {'self': {'href': CHANNELS_URL}},
+        '_embedded': {'viaplay:blocks': [{'type': 'tvChannels', '_links': {}, '_embedded': {'viaplay:blocks': blocks}}]}
+    }
+
+
+def epg_page(guid, day, count):
+    start = datetime(day.year, day.month, day.day)
+    minutes = 24 * 60 // count
+    return {
+        'type': 'tvChannel',
+        '_links': {'self': {'href': EPG_URL % guid}},
+        '_embedded': {'viaplay:products': [programme(guid, start + timedelta(minutes=x * minutes), minutes, x)
+                                           for x in range(count)]}
+    }
+
+
+def stream_response():
+    return {
+        '_links': {
+            'viaplay:media': {'href': 'https://media.viaplay.se/movie-0/manifest.mpd'},
+            'viaplay:license': {'href': 'https://license.viaplay.se/widevine?challenge={widevineChallenge}',
+                                'releasePid': 'bench'},
+            'viaplay:sami': [{'href': 'https://subtitles.viaplay.se/movie-0_sv.sami'}]
+        }
+    }
+
+
+class Sizes(object):
+    """How much synthetic data the routes get."""
+
+    def __init__(self, page_count=5, per_page=100, collections=12, channels=40, epg_days=1, programmes=48):
+        self.page_count = page_count
+        self.per_page = per_page
+        self.collections = collections
+        self.channels = channels
+        self.epg_days = epg_days
+        self.programmes = programmes
+
+
+def serve(stub, sizes=None):
+    """Add the synthetic responses of every benchmark route to a StubServer."""
+    sizes = sizes or Sizes()
+    now = datetime.utcnow()
+    stub.add(ROOT_URL, root_page())
+    stub.add(SERIES_URL, vod_page(sizes.collections))
+    for number in range(1, sizes.page_count + 1):
+        stub.add('%s?pageNumber=%s' % (LIST_URL, number), list_page(LIST_URL, number, sizes.page_count,
+                                                                     sizes.per_page, now))
+    stub.add(CHANNELS_URL, channels_page(sizes.channels, now))
+    stub.add(SCHEDULE_URL, schedule_page(now))
+    stub.add(LOGIN_URL + '?deviceKey=xdk-se', {'success': True, 'userData': USER_DATA})
+
+    today = datetime.now().date()
+    for day in (today + timedelta(days=x) for x in range(sizes.epg_days)):
+        for number in range(sizes.channels):
+            guid = channel_guid(number)
+            stub.add('%s?date=%s' % (EPG_URL % guid, day.strftime('%Y-%m-%d')), epg_page(guid, day, sizes.programmes))
+    stub.add(EPG_URL % 'ch-0-se', epg_page('ch-0-se', today, sizes.programmes))
+
+    stream_query = 'deviceId=%s&deviceKey=chromecast-se&deviceName=web&deviceType=pc&mediaGuid=%s&userAgent=Kodi'
+    stub.add('%s?%s' % (STREAM_URL, stream_query % (DEVICE_ID, 'movie-0')), stream_response())
+    stub.add('https://subtitles.viaplay.se/movie-0_sv.sami', '<SAMI><BODY><SYNC Start=0><P>Hej</P></SYNC></BODY></SAMI>',
+             headers={'Content-Type': 'text/plain'})
@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+"""The product listing of addon.py before ProductMapper, frozen for bench.mappers
+
+add_movie() to add_art() are copied unchanged from the baseline commit, where
+they were module functions of resources/lib/addon.py, so the cost per product
+before the mapper can still be measured. bind() gives them the KodiHelper
+they used as a global. add_product() is how the listing adds a ProductItem now."""
+
+import sys
+from datetime import datetime
+
+from tests import kodi  # noqa: F401, makes the routing stand-in importable when routing isn't installed
+
+import routing
+
+from resources.lib.products import coloring
+
+helper = None
+plugin = routing.Plugin('plugin://plugin.video.viaplay')
+
+
+@plugin.route('/play')
+def play():
+    pass
+
+
+@plugin.route('/dialog')
+def dialog():
+    pass
+
+
+@plugin.route('/seasons_page')
+def seasons_page():
+    pass
+
+
+@plugin.route('/sport_series')
+def sport_series():
+    pass
+
+
+def bind(kodi_helper):
+    global helper
+    helper = kodi_helper
+
+
+def add_product(item):
+    routes = {
+        'play': play,
+        'seasons_page': seasons_page,
+        'sport_series': sport_series,
+        'dialog': dialog
+    }
+    plugin_url = plugin.url_for(routes[item.route], **item.route_args)
+    helper.add_item(item.label, plugin_url, playable=item.playable, info=item.info, art=item.art,
+                    content=item.content, episode=item.episode)
+
+
+def add_movie(movie):
+    if movie['system'].get('guid'):
+        guid = movie['system']['guid']
+        url = None
+    else:
+        guid = None
+        url = movie['_links']['self']['href']
+
+    plugin_url = plugin.url_for(play, guid=guid, url=url, tve='false')
+    details = movie['content']
+    try:
+        plotx = details.get('synopsis')
+    except:
+        plotx = ''
+
+    movie_info = {
+        'mediatype': 'movie',
+        'title': details['title'],
+        'plot': plotx,
+        'genre': ', '.join([x['title'] for x in movie['_links']['viaplay:genres']]),
+        'year': details['production'].get('year'),
+        'duration': int(details['duration'].get('milliseconds')) // 1000 if 'duration' in details else None,
+        'cast': details['people'].get('actors', []) if 'people' in details else [],
+        'director': ', '.join(details['people'].get('directors', [])) if 'people' in details else [],
+        'mpaa': details.get('parentalRating'),
+        'rating': float(details['imdb'].get('rating')) if 'imdb' in details else None,
+        'votes': str(details['imdb'].get('votes')) if 'imdb' in details else None,
+        'code': details['imdb'].get('id') if 'imdb' in details else None
+    }
+
+    helper.add_item(movie_info['title'], plugin_url, info=movie_info, art=add_art(details['images'], 'movie'),
+                    content='movies', playable=True)
+
+
+def add_series(show):
+    plugin_url = plugin.url_for(seasons_page, url=show['_links']['viaplay:page']['href'])
+    details = show['content']
+
+    series_info = {
+        'mediatype': 'tvshow',
+        'title': details['series']['title'],
+        'tvshowtitle': details['series']['title'],
+        'plot': details['synopsis'] if details.get('synopsis') else details['series'].get('synopsis'),
+        'genre': ', '.join([x['title'] for x in show['_links']['viaplay:genres']]),
+        'year': details['production'].get('year') if 'production' in details else None,
+        'cast': details['people'].get('actors', []) if 'people' in details else [],
+        'director': ', '.join(details['people'].get('directors', [])) if 'people' in details else None,
+        'mpaa': details.get('parentalRating'),
+        'rating': float(details['imdb'].get('rating')) if 'imdb' in details else None,
+        'votes': str(details['imdb'].get('votes')) if 'imdb' in details else None,
+        'code': details['imdb'].get('id') if 'imdb' in details else None,
+        'season': int(details['series']['seasons']) if details['series'].get('seasons') else None
+    }
+
+    helper.add_item(series_info['title'], plugin_url, folder=True, info=series_info,
+                    art=add_art(details['images'], 'series'), content='tvshows')
+
+
+def add_episode(episode):
+    plugin_url = plugin.url_for(play, guid=episode['system']['guid'], url=None, tve='false')
+    details = episode['content']
+
+    episode_info = {
+        'mediatype': 'episode',
+        'title': details.get('title'),
+        'tvshowtitle': details['series'].get('title'),
+        'plot': details['synopsis'] if details.get('synopsis') else details['series'].get('synopsis'),
+        'duration': details['duration']['milliseconds'] // 1000 if 'duration' in details else None,
+        'genre': ', '.join([x['title'] for x in episode['_links']['viaplay:genres']]),
+        'year': details['production'].get('year') if 'production' in details else None,
+        'cast': details['people'].get('actors', []) if 'people' in details else [],
+        'director': ', '.join(details['people'].get('directors', [])) if 'people' in details else None,
+        'mpaa': details.get('parentalRating'),
+        'rating': float(details['imdb'].get('rating')) if 'imdb' in details else None,
+        'votes': str(details['imdb'].get('votes')) if 'imdb' in details else None,
+        'code': details['imdb'].get('id') if 'imdb' in details else None,
+        'season': int(details['series']['season'].get('seasonNumber')),
+        'episode': int(details['series'].get('episodeNumber'))
+    }
+
+    list_title = details['series']['episodeTitle'] if details['series'].get('episodeTitle') else details.get('title')
+
+    helper.add_item(list_title, plugin_url, info=episode_info,
+                    art=add_art(details['images'], 'episode'), content='episodes', playable=True, episode=True)
+
+
+def add_sports_event(event):
+    now = datetime.now()
+    date_today = now.date()
+    event_date = helper.vp.parse_datetime(event['epg']['start'], localize=True)
+    event_status = helper.vp.get_event_status(event)
+
+    if date_today == event_date.date():
+        start_time = '{0} {1}'.format(helper.language(30027), event_date.strftime('%H:%M'))
+    else:
+        start_time = event_date.strftime('%Y-%m-%d %H:%M')
+
+    if event_status != 'upcoming':
+        plugin_url = plugin.url_for(play, guid=event['system']['guid'] + '-%s' % helper.get_country_code().upper(), url=None, tve='false')
+        playable = True
+    else:
+        plugin_url = plugin.url_for(dialog, dialog_type='ok',
+                             heading=helper.language(30017),
+                             message=helper.language(30016).format(start_time).encode('utf-8'))
+        playable = False
+
+    details = event['content']
+    format_title = details['format']['title']
+    original_title = details.get('originalTitle')
+    quality = None
+    plotx = ''
+
+    if format_title.lower() == 'ultra hd':
+        quality = 'Ultra HD'
+        format_title = '4K'
+
+    synopsis = [
+        {
+            'heading': '',
+            'message': details.get('synopsis')
+        },
+        {
+            'heading': helper.language(30068) if quality is not None else None,
+            'message': quality
+        },
+        {
+            'heading': helper.language(30069),
+            'message': f'{format_title} | {original_title}' if original_title is not None else format_title
+        }
+    ]
+
+    if sys.version_info[0] > 2:
+        title = details.get('title')
+    else:
+        title = details.get('title').encode('utf-8')
+
+    for index, plot in enumerate(synopsis):
+        if index == 0:
+            plotx += f'{plot["heading"]} {plot["message"]}\n'
+        else:
+            if plot['heading'] is not None:
+                plotx += f'{plot["heading"]}: {plot["message"]}.\n'
+
+    event_info = {
+        'mediatype': 'video',
+        'title': details.get('title'),
+        'plot': plotx,
+        'year': int(details['production'].get('year')),
+        'genre': format_title,
+    }
+
+    list_title = '[B]{0}:[/B] {1}'.format(coloring(start_time, event_status), title)
+
+    helper.add_item(list_title, plugin_url, playable=playable, info=event_info,
+                    art=add_art(details['images'], 'sport'), content='episodes')
+
+
+def add_sports_series(event):
+    now = datetime.now()
+    date_today = now.date()
+    if event.get('epg'):
+        event_date = helper.vp.parse_datetime(event['epg']['start'], localize=True)
+    else:
+        event_date = helper.vp.parse_datetime(event['system']['availability']['start'], localize=True)
+    event_status = helper.vp.get_event_status(event)
+
+    if date_today == event_date.date():
+        start_time = '{0} {1}'.format(helper.language(30027), event_date.strftime('%H:%M'))
+    else:
+        start_time = event_date.strftime('%Y-%m-%d %H:%M')
+
+    event_url = event['_links']['viaplay:page']['href']
+
+    if event_status != 'upcoming':
+        plugin_url = plugin.url_for(sport_series, url=event_url)
+        playable = False
+    else:
+        plugin_url = plugin.url_for(dialog, dialog_type='ok',
+                             heading=helper.language(30017),
+                             message=helper.language(30016).format(start_time).encode('utf-8'))
+        playable = False
+
+    details = event['content']
+
+    if sys.version_info[0] > 2:
+        if details.get('title'):
+            title = details.get('title')
+        else:
+            title = details.get('series', {}).get('title')
+    else:
+        if details.get('title'):
+            title = details.get('title').encode('utf-8')
+        else:
+            title = details.get('series', {}).get('title').encode('utf-8')
+    try:
+        plotx = details.get('synopsis')
+    except:
+        plotx = ''
+
+    if details.get('format'):
+        genre = details.get('format').get('title')
+    else:
+        genre = ''
+
+    event_info = {
+        'mediatype': 'video',
+        'title': title,
+        'plot': plotx,
+        'year': details['production'].get('year'),
+        'genre': genre,
+    }
+
+    list_title = '[B]{0}:[/B] {1}'.format(coloring(start_time, event_status), title)
+
+    helper.add_item(list_title, plugin_url, playable=playable, info=event_info,
+                    art=add_art(details['images'], 'sport'), content='episodes')
+
+
+def add_tv_event(event):
+    now = datetime.now()
+    date_today = now.date()
+
+    start_time_obj = helper.vp.parse_datetime(event['epg']['startTime'], localize=True)
+    end_time_obj = helper.vp.parse_datetime(event['epg']['endTime'], localize=True)
+
+    event_status = helper.vp.get_event_status(event)
+
+    status = False
+
+    if end_time_obj >= now and helper.get_setting('previous_channels'):
+        status = True
+    elif not helper.get_setting('previous_channels'):
+        status = True
+
+    if status:
+        # hide non-available catchup items
+        start_time = str(datetime.now())[:-16]
+        if now > helper.vp.parse_datetime(event['system']['catchupAvailability']['end'], localize=True):
+            return
+
+        if date_today == start_time_obj.date():
+            start_time = '{0} {1}'.format(helper.language(30027), start_time_obj.strftime('%H:%M'))
+        else:
+            start_time = start_time_obj.strftime('%Y-%m-%d %H:%M')
+
+        if event_status != 'upcoming':
+            plugin_url = plugin.url_for(play, guid=event['system']['guid'] + '-%s' % helper.get_country_code().upper(), url=None, tve='true')
+            playable = True
+        else:
+            plugin_url = plugin.url_for(dialog, dialog_type='ok',
+                                 heading=helper.language(30017),
+                                 message=helper.language(30016).format(start_time).encode('utf-8'))
+            playable = False
+
+        details = event['content']
+
+        if sys.version_info[0] > 2:
+            title = details.get('title')
+        else:
+            title = details.get('title').encode('utf-8')
+
+        event_info = {
+            'mediatype': 'video',
+            'title': details.get('title'),
+            'plot': details.get('synopsis'),
+            'year': details['production'].get('year'),
+        }
+
+        list_title = '[B]{0}:[/B] {1}'.format(coloring(start_time, event_status), title)
+
+        art = {
+            'thumb': event['content']['images']['landscape']['template'].split('{')[0] if 'landscape' in details['images'] else None,
+            'fanart': event['content']['images']['landscape']['template'].split('{')[0] if 'landscape' in details['images'] else None
+        }
+
+        helper.add_item(list_title, plugin_url, playable=playable, info=event_info, art=art, content='episodes')
+
+def add_event(event):
+    plugin_url = plugin.url_for(play, guid=event['system']['guid'], url=None, tve='false')
+
+    details = event['content']
+
+    if sys.version_info[0] > 2:
+        title = details.get('title')
+    else:
+        title = details.get('title').encode('utf-8')
+
+    event_info = {
+            'mediatype': 'video',
+            'title': details.get('title'),
+            'plot': details.get('synopsis'),
+            'year': details['production'].get('year'),
+        }
+
+    list_title = '{0}'.format(title)
+
+    art = {
+            'thumb': event['content']['images']['landscape']['template'].split('{')[0] if 'landscape' in details['images'] else None,
+            'fanart': event['content']['images']['landscape']['template'].split('{')[0] if 'landscape' in details['images'] else None
+        }
+
+    helper.add_item(list_title, plugin_url, playable=True, info=event_info, art=art, content='episodes')
+
+def add_art(images, content_type):
+    artwork = {}
+
+    for i in images:
+        image_url = images[i]['template'].split('{')[0]  # get rid of template
+
+        if i == 'landscape':
+            if content_type == 'episode' or 'sport':
+                artwork['thumb'] = image_url
+            artwork['banner'] = image_url
+        elif i == 'hero169':
+            artwork['fanart'] = image_url
+        elif i == 'coverart23':
+            if content_type != 'sport':
+                artwork['poster'] = image_url
+        elif i == 'coverart169':
+            artwork['cover'] = image_url
+        elif i == 'boxart':
+            if content_type != 'episode' or content_type != 'sport':
+                artwork['thumb'] = image_url
+
+    return artwork
+
+
+# the function adding a product of each type, before ProductMapper
+ADD_FUNCTIONS = {
+    'movie': add_movie,
+    'series': add_series,
+    'episode': add_episode,
+    'sport': add_sports_event,
+    'sportSeries': add_sports_series,
+    'tvEvent': add_tv_event,
+    'clip': add_event
+}
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""xbmcplugin calls and rendering time of large listings
+
+The render cases map products with ProductMapper and hand them to
+KodiHelper.add_item() and eod() the way the list_products route does, without
+the HTTP requests. The list_products_* cases run the route itself on a page of
+that many products.
+
+Per case it reports the xbmcplugin calls, the items and the median time per
+item."""
+
+import contextlib
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+import pytest
+
+from bench import fixtures, report
+from bench.routes import PLUGIN, Route, RouteBench, prepare_profile
+from tests.kodi import KodiEnvironment
+from tests.stubserver import StubServer
+
+SIZES = (100, 500, 1000)
+
+
+@contextlib.contextmanager
+def kodi_environment(profile):
+    """Yield a KodiEnvironment installed in Kodistubs for a logged in profile."""
+    prepare_profile(profile)
+    monkeypatch = pytest.MonkeyPatch()
+    kodi = KodiEnvironment(profile)
+    kodi.install(monkeypatch)
+    try:
+        yield kodi
+    finally:
+        monkeypatch.undo()
+
+
+def render(helper, mapper, products):
+    """List products the way the list_products route does."""
+    for product in products:
+        if not mapper.supports(product['type']):
+            raise ValueError('product type %s is not supported' % product['type'])
+        item = mapper.map(product)
+        if item:
+            url = '%s/%s?%s' % (PLUGIN, item.route, urlencode(item.route_args))
+            helper.add_item(item.label, url, playable=item.playable, info=item.info, art=item.art,
+                            content=item.content, episode=item.episode)
+    helper.eod()
+
+
+def render_case(products, profile, repeat):
+    from resources.lib.kodihelper import KodiHelper
+    from resources.lib.products import ProductMapper
+
+    times = []
+    for _ in range(repeat):
+        with kodi_environment(profile) as kodi:
+            helper = KodiHelper(PLUGIN + '/list_products', 1)
+            mapper = ProductMapper(helper.vp, helper.language, helper.get_country_code(),
+                                   helper.get_setting('previous_channels'))
+            started = time.time()
+            render(helper, mapper, products)
+            times.append(time.time() - started)
+
+    result = {
+        'driver': 'helper',
+        'items': len(kodi.directory),
+        'render_ms': round(statistics.median(times) * 1000, 1),
+        'per_item_us': round(statistics.median(times) * 1000000 / len(products), 1)
+    }
+    for name, count in kodi.plugin_calls.items():
+        result['xbmcplugin.%s' % name] = count
+    return result
+
+
+def route_case(size, repeat):
+    with StubServer() as stub:
+        fixtures.serve(stub, fixtures.Sizes(page_count=1, per_page=size))
+        bench = RouteBench(stub)
+        try:
+            return bench.run(Route('list_products', '/list_products', {'url': fixtures.LIST_URL + '?pageNumber=1'}),
+                             repeat)
+        finally:
+            bench.close()
+
+
+def run(args):
+    folder = tempfile.mkdtemp(prefix='viaplay-listing-')
+    profile = os.path.join(folder, 'profile')
+    cases = {}
+    try:
+        for size in args.size or SIZES:
+            cases['episodes_%s' % size] = render_case([fixtures.episode(x) for x in range(size)], profile,
+                                                      args.repeat)
+            cases['products_%s' % size] = render_case(fixtures.products(size), profile, args.repeat)
+            cases['list_products_%s' % size] = route_case(size, args.repeat)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    return {
+        'python': sys.version.split()[0],
+        'repeat': args.repeat,
+        'cases': cases
+    }
+
+
+def main(argv=None):
+    parser = report.parser('Count the xbmcplugin calls and time the rendering of large listings.')
+    parser.add_argument('--size', type=int, action='append', help='products per listing, default %s' % (SIZES,))
+    parser.add_argument('--repeat', type=int, default=5, help='samples per case, the median time is reported')
+    return report.main('listing', parser.parse_args(argv), run)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Cost per product of listing a page, before and after ProductMapper
+
+Lists the products of a page, 500 synthetic ones of every type list_products
+maps by default or the products of a recorded page with --page, and reports
+the median time per item for every product type and for the whole page:
+
+- before_us: the add_* function of the addon.py before ProductMapper (bench.legacy)
+- after_us: ProductMapper.map() and adding the item, what list_products does now
+- map_us: ProductMapper.map() alone
+
+Both sides build the plugin URL with routing and add the item with
+KodiHelper.add_item(). The time of creating the KodiHelper and the mapper is
+not included."""
+
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from bench import fixtures, legacy, report
+from bench.listing import kodi_environment
+from bench.routes import PLUGIN
+from resources.lib.hal import Page
+
+
+def load_page(path):
+    """Return the products of a page saved by record_responses, or of a plain JSON page."""
+    with open(path) as page_file:
+        data = json.load(page_file)
+    if 'body' in data and 'url' in data:
+        data = json.loads(data['body'])
+    return Page(data).products
+
+
+def time_per_item(helper, add, products, repeat):
+    """Return the median µs per product of calling add(product) for products, repeat times."""
+    times = []
+    for _ in range(repeat):
+        helper.items = []
+        started = time.time()
+        for product in products:
+            add(product)
+        times.append(time.time() - started)
+    helper.items = []
+    return round(statistics.median(times) * 1000000 / len(products), 1)
+
+
+def measure(helper, mapper, products, repeat):
+    def before(product):
+        legacy.ADD_FUNCTIONS[product['type']](product)
+
+    def after(product):
+        item = mapper.map(product)
+        if item:
+            legacy.add_product(item)
+
+    items = [x for x in map(mapper.map, products) if x]
+    return {
+        'products': len(products),
+        'items': len(items),
+        'before_us': time_per_item(helper, before, products, repeat),
+        'after_us': time_per_item(helper, after, products, repeat),
+        'map_us': time_per_item(helper, mapper.map, products, repeat)
+    }
+
+
+def run(args):
+    from resources.lib.kodihelper import KodiHelper
+    from resources.lib.products import ProductMapper
+
+    products = load_page(args.page) if args.page else fixtures.all_products(args.count)
+    by_type = {}
+    for product in products:
+        by_type.setdefault(product['type'], []).append(product)
+
+    folder = tempfile.mkdtemp(prefix='viaplay-mappers-')
+    try:
+        with kodi_environment(os.path.join(folder, 'profile')):
+            helper = KodiHelper(PLUGIN + '/list_products', 1)
+            legacy.bind(helper)
+            mapper = ProductMapper(helper.vp, helper.language, helper.get_country_code(),
+                                   helper.get_setting('previous_channels'))
+            cases = {}
+            for product_type, typed in sorted(by_type.items()):
+                if not mapper.supports(product_type):
+                    cases[product_type] = {'skipped': 'product type %s is not supported' % product_type}
+                    continue
+                cases[product_type] = measure(helper, mapper, typed, args.repeat)
+            cases['page'] = measure(helper, mapper, [x for x in products if mapper.supports(x['type'])], args.repeat)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    return {
+        'python': sys.version.split()[0],
+        'page': os.path.basename(args.page) if args.page else 'synthetic',
+        'repeat': args.repeat,
+        'cases': cases
+    }
+
+
+def main(argv=None):
+    parser = report.parser('Time listing products before and after ProductMapper, per product type.')
+    parser.add_argument('--count', type=int, default=500, help='synthetic products to list')
+    parser.add_argument('--page', help='a recorded page to list instead of the synthetic products')
+    parser.add_argument('--repeat', type=int, default=20, help='times the products are listed, the median is reported')
+    args = parser.parse_args(argv)
+    if args.page and not args.baseline:
+        # a recorded page isn't comparable with the synthetic baseline
+        args.baseline = os.path.splitext(args.page)[0] + '.baseline.json'
+    return report.main('mappers', args, run)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Baselines, regression checks and the command line shared by the benchmark suites
+
+A suite returns {case: {metric: value}} with flat metric names. How a metric
+is compared with the baseline follows from its name:
+
+- *_ms, *_us: time, a regression when slower than time_tolerance times the baseline
+- *_kib: memory, a regression when over memory_tolerance times the baseline
+- bytes, *_bytes: a regression when over the baseline by more than 5%
+- anything else is a count (requests, items, xbmcplugin calls) and may not grow
+
+A case that was skipped, or ran with another driver than in the baseline, is
+not compared, nor are the metrics a suite lists in results['unchecked']."""
+
+import argparse
+import json
+import os
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# absolute slack, so tiny numbers don't fail on noise
+MIN_TIME_MS = 5
+MIN_TIME_US = 5
+MIN_MEMORY_KIB = 64
+
+
+def baseline_path(suite):
+    return os.path.join(BASELINES, '%s.json' % suite)
+
+
+def load(path):
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def save(path, results):
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    with open(path, 'w') as baseline_file:
+        json.dump(results, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write('\n')
+
+
+def compare(results, baseline, time_tolerance=1.5, memory_tolerance=1.25, check_time=True):
+    """Return a message for every metric of results that regressed against baseline."""
+    regressions = []
+    unchecked = set(results.get('unchecked', ())) | set(['driver'])
+    for case, metrics in sorted(results['cases'].items()):
+        base = baseline.get('cases', {}).get(case)
+        if not base or 'skipped' in metrics or 'skipped' in base or metrics.get('driver') != base.get('driver'):
+            continue
+        for name, value in sorted(metrics.items()):
+            if name in unchecked or name not in base:
+                continue
+            limit = base[name]
+            if name.endswith('_ms') or name.endswith('_us'):
+                if not check_time:
+                    continue
+                slack = MIN_TIME_MS if name.endswith('_ms') else MIN_TIME_US
+                limit = max(limit * time_tolerance, limit + slack)
+            elif name.endswith('_kib'):
+                limit = max(limit * memory_tolerance, limit + MIN_MEMORY_KIB)
+            elif name == 'bytes' or name.endswith('_bytes'):
+                limit = limit * 1.05
+            if value > limit:
+                regressions.append('%s: %s is %s, baseline %s' % (case, name, value, base[name]))
+    return regressions
+
+
+def table(results):
+    """Return the results as text, one line per case."""
+    lines = []
+    for case, metrics in sorted(results['cases'].items()):
+        if 'skipped' in metrics:
+            lines.append('%-20s skipped: %s' % (case, metrics['skipped']))
+        else:
+            lines.append('%-20s %s' % (case, '  '.join('%s=%s' % (k, v) for k, v in sorted(metrics.items()))))
+    return '\n'.join(lines)
+
+
+def parser(description):
+    """Return an ArgumentParser with the options every suite has."""
+    arguments = argparse.ArgumentParser(description=description)
+    arguments.add_argument('--baseline', help='baseline file, default bench/baselines/<suite>.json')
+    arguments.add_argument('--update-baseline', action='store_true', help='save the results as the new baseline')
+    arguments.add_argument('--output', help='also write the results to this file')
+    arguments.add_argument('--no-time-check', action='store_true',
+                           help="don't compare times, e.g. on another machine than the baseline's")
+    arguments.add_argument('--time-tolerance', type=float, default=1.5)
+    arguments.add_argument('--memory-tolerance', type=float, default=1.25)
+    return arguments
+
+
+def main(suite, args, run):
+    """Run a suite, print the results and check them against the baseline.
+    Return the exit status: 1 when anything regressed."""
+    results = run(args)
+    print(table(results))
+    if args.output:
+        save(args.output, results)
+
+    path = args.baseline or baseline_path(suite)
+    if args.update_baseline:
+        save(path, results)
+        print('Baseline saved to %s' % path)
+        return 0
+
+    baseline = load(path)
+    if baseline is None:
+        print('No baseline at %s, run with --update-baseline to create it' % path)
+        return 0
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance, not args.no_time_check)
+    for regression in regressions:
+        print('REGRESSION %s' % regression)
+    if not regressions:
+        print('No regressions against %s' % path)
+    return 1 if regressions else 0
+
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Runs the plugin routes offline, against Kodistubs and the stub Viaplay API
+
+Every sample calls resources.lib.addon.run() the way Kodi does, with sys.argv
+set to the plugin URL, in a fresh profile that is logged in (or in the same
+profile with --warm, so the response cache is used). All https:// requests go
+to a StubServer serving bench.fixtures, optionally with recordings and latency.
+
+Per route it reports the median wall time, the HTTP requests and bytes served,
+the time spent decoding JSON, the peak memory of an extra traced sample, the
+directory items and the xbmcplugin calls.
+
+The routes need the Kodi routing module (script.module.routing), /play also
+needs inputstreamhelper. Unless they are installed, the stand-ins in
+tests/stubs are used."""
+
+import gc
+import importlib
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+import pytest
+
+from bench import fixtures, report
+from resources.lib.metrics import metrics
+from tests.kodi import KodiEnvironment
+from tests.listener import Listener
+from tests.stubserver import StubServer, route_all
+
+PLUGIN = 'plugin://plugin.video.viaplay'
+
+
+class Route(object):
+    """A plugin route and its query. Routes with socket get the port of a
+    listening socket, the way IPTV Manager calls the /iptv routes."""
+
+    def __init__(self, name, path, query=None, socket=False):
+        self.name = name
+        self.path = path
+        self.query = query or {}
+        self.socket = socket
+
+
+ROUTES = [
+    Route('root', '/'),
+    Route('vod', '/vod', {'url': fixtures.SERIES_URL}),
+    Route('list_products', '/list_products', {'url': fixtures.LIST_URL + '?pageNumber=1'}),
+    Route('channels', '/channels', {'url': fixtures.CHANNELS_URL}),
+    Route('sports_schedule', '/sports_schedule', {'url': fixtures.SCHEDULE_URL}),
+    Route('play', '/play', {'guid': 'movie-0', 'url': 'None', 'tve': 'false'}),
+    Route('iptv_epg', '/iptv/epg', socket=True),
+]
+
+
+def run_plugin(route, query):
+    """Invoke the plugin the way Kodi does."""
+    sys.argv = [PLUGIN + route.path, '1', '?' + urlencode(query)]
+    sys.modules.pop('resources.lib.addon', None)
+    addon = importlib.import_module('resources.lib.addon')
+    addon.run()
+
+
+def prepare_profile(profile):
+    """Make profile a logged in profile with a known device id."""
+    if not os.path.exists(profile):
+        os.makedirs(profile)
+    with open(os.path.join(profile, 'deviceId'), 'w') as device_file:
+        device_file.write(fixtures.DEVICE_ID)
+    with open(os.path.join(profile, 'session'), 'w') as session_file:
+        json.dump({'userData': fixtures.USER_DATA, 'validated': time.time()}, session_file)
+
+
+class RouteBench(object):
+    """Runs samples of routes against one StubServer."""
+
+    def __init__(self, stub, settings=None, warm=False):
+        self.stub = stub
+        self.settings = settings or {}
+        self.warm = warm
+        self.folder = tempfile.mkdtemp(prefix='viaplay-bench-')
+
+    def close(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def sample(self, route, profile, trace=False):
+        """Run route once and return its measurements."""
+        prepare_profile(profile)
+        monkeypatch = pytest.MonkeyPatch()
+        kodi = KodiEnvironment(profile)
+        kodi.settings.update(self.settings)
+        kodi.install(monkeypatch)
+        route_all(monkeypatch, self.stub)
+        listener = Listener(keep=False) if route.socket else None
+        query = dict(route.query, port=listener.port) if listener else route.query
+        argv = sys.argv
+        threads = set(threading.enumerate())
+
+        self.stub.reset_counters()
+        metrics.reset()
+        gc.collect()
+        if trace:
+            tracemalloc.start()
+        try:
+            started = time.time()
+            run_plugin(route, query)
+            # wait for what the route left running, e.g. prefetching
+            for thread in set(threading.enumerate()) - threads:
+                if not thread.daemon:
+                    thread.join(30)
+            elapsed = time.time() - started
+            peak = tracemalloc.get_traced_memory()[1] if trace else None
+        finally:
+            if trace:
+                tracemalloc.stop()
+            sys.argv = argv
+            monkeypatch.undo()
+
+        result = {
+            'wall_ms': elapsed * 1000,
+            'requests': len(self.stub.requests),
+            'bytes': self.stub.bytes_sent,
+            'decode_ms': metrics.summary().get('decode_ms', 0),
+            'items': len(kodi.directory)
+        }
+        for name, count in kodi.plugin_calls.items():
+            result['xbmcplugin.%s' % name] = count
+        if listener:
+            listener.join()
+            result['socket_bytes'] = listener.size
+        if peak is not None:
+            result['peak_kib'] = peak // 1024
+        return result
+
+    def run(self, route, repeat=5):
+        """Return the metrics of route over repeat samples plus one traced for peak memory."""
+        profile = os.path.join(self.folder, route.name)
+        if self.warm:
+            self.sample(route, profile)
+        samples = []
+        for _ in range(repeat):
+            if not self.warm:
+                shutil.rmtree(profile, ignore_errors=True)
+            samples.append(self.sample(route, profile))
+        if not self.warm:
+            shutil.rmtree(profile, ignore_errors=True)
+        traced = self.sample(route, profile, trace=True)
+
+        result = dict(samples[-1])
+        result['driver'] = 'plugin'
+        result['wall_ms'] = round(statistics.median(x['wall_ms'] for x in samples), 1)
+        result['peak_kib'] = traced['peak_kib']
+        return result
+
+
+def run(args):
+    """Run the selected routes and return the results."""
+    latency = args.latency if args.latency == 'recorded' else float(args.latency)
+    sizes = fixtures.Sizes(per_page=args.per_page, channels=args.channels)
+    with StubServer(latency=latency) as stub:
+        fixtures.serve(stub, sizes)
+        if args.recordings:
+            stub.load(args.recordings)
+        bench = RouteBench(stub, warm=args.warm)
+        try:
+            cases = dict((x.name, bench.run(x, args.repeat)) for x in ROUTES if not args.route or x.name in args.route)
+        finally:
+            bench.close()
+
+    return {
+        'python': sys.version.split()[0],
+        'latency': args.latency,
+        'warm': args.warm,
+        'repeat': args.repeat,
+        # only the rest of today's programmes are sent, so it depends on the time of day
+        'unchecked': ['socket_bytes'],
+        'cases': cases
+    }
+
+
+def arguments():
+    parser = report.parser('Run the plugin routes offline and compare them with the baseline.')
+    parser.add_argument('--route', action='append', choices=[x.name for x in ROUTES], help='only run this route')
+    parser.add_argument('--repeat', type=int, default=5, help='samples per route, the median time is reported')
+    parser.add_argument('--latency', default='0',
+                        help="seconds added to every response, or 'recorded' for the latency of the recordings")
+    parser.add_argument('--recordings', help='folder of recorded responses served instead of the synthetic ones')
+    parser.add_argument('--warm', action='store_true', help='keep the profile, and its cache, between samples')
+    parser.add_argument('--per-page', type=int, default=100, help='products per list page')
+    parser.add_argument('--channels', type=int, default=40, help='channels in the lineup')
+    return parser
+
+
+def main(argv=None):
+    return report.main('routes', arguments().parse_args(argv), run)
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Cold start of the plugin per route, in a fresh interpreter like every Kodi invocation
+
+Every sample runs the route in a child process and reports the time to import
+resources.lib.addon and to run the route, the modules the invocation imported
+and whether it imported requests, Viaplay or inputstreamhelper or created an
+HTTP session. Routes like /dialog and cached listings should do neither.
+
+The kodihelper case constructs KodiHelper alone, the start every route pays for."""
+
+import importlib
+import importlib.util
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+from bench import fixtures
+
+# the child process must not import more than what it measures, e.g. requests,
+# so the harness modules are imported by the functions of the parent process
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKER = 'STARTUP '
+
+
+class Case(object):
+    """A route whose start is measured. A cached case runs once before it is measured, in the same profile."""
+
+    def __init__(self, route, name=None, cached=False, helper_only=False):
+        self.route = route
+        self.name = name or route.name
+        self.cached = cached
+        self.helper_only = helper_only
+
+
+CASE_NAMES = ['root', 'vod', 'list_products', 'channels', 'sports_schedule', 'play', 'iptv_epg',
+              'list_products_cached', 'dialog', 'ia_settings', 'kodihelper']
+
+
+def all_cases():
+    from bench.routes import ROUTES, Route
+    return [Case(x) for x in ROUTES] + [
+        Case(Route('list_products', '/list_products', {'url': fixtures.LIST_URL + '?pageNumber=1'}),
+             name='list_products_cached', cached=True),
+        Case(Route('dialog', '/dialog', {'dialog_type': 'notification', 'heading': 'Viaplay', 'message': 'Hello'})),
+        Case(Route('ia_settings', '/ia_settings')),
+        Case(Route('kodihelper', '/'), helper_only=True)
+    ]
+
+
+class StubOnImport(object):
+    """Import hook that sends the requests of every session to the stub server as
+    soon as requests is imported, so importing it stays up to the code measured."""
+
+    def __init__(self, monkeypatch, port):
+        self.monkeypatch = monkeypatch
+        self.server = types.SimpleNamespace(port=port)
+
+    def find_spec(self, name, path=None, target=None):
+        if name != 'requests':
+            return None
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(name)
+        exec_module = spec.loader.exec_module
+
+        def exec_and_route(module):
+            exec_module(module)
+            from tests.stubserver import route_all
+            route_all(self.monkeypatch, self.server)
+
+        spec.loader.exec_module = exec_and_route
+        return spec
+
+
+def child(spec):
+    """Run one case in this, fresh, interpreter and print its measurements."""
+    import pytest
+    from tests.kodi import KodiEnvironment
+
+    monkeypatch = pytest.MonkeyPatch()
+    kodi = KodiEnvironment(spec['profile'])
+    kodi.install(monkeypatch)
+    sys.meta_path.insert(0, StubOnImport(monkeypatch, spec['port']))
+    sys.argv = ['plugin://plugin.video.viaplay' + spec['path'], '1', '?' + spec['query']]
+    preloaded = set(sys.modules)
+
+    started = time.time()
+    if spec['helper_only']:
+        from resources.lib.kodihelper import KodiHelper
+        helper = KodiHelper(sys.argv[0], 1)
+        imported = finished = time.time()
+    else:
+        addon = importlib.import_module('resources.lib.addon')
+        imported = time.time()
+        addon.run()
+        finished = time.time()
+        helper = addon.helper
+
+    loaded = set(sys.modules) - preloaded
+    result = {
+        'import_ms': round((imported - started) * 1000, 1),
+        'run_ms': round((finished - imported) * 1000, 1),
+        'total_ms': round((finished - started) * 1000, 1),
+        'modules': len(loaded),
+        'requests_imported': int('requests' in loaded),
+        'viaplay_imported': int('resources.lib.viaplay' in loaded),
+        'inputstreamhelper_imported': int('inputstreamhelper' in loaded),
+        'http_session': int(helper._vp is not None and helper._vp._http_session is not None)
+    }
+    print(MARKER + json.dumps(result))
+
+
+def sample(case, profile, port):
+    """Run case in a child process and return its measurements."""
+    from tests.listener import Listener
+
+    listener = Listener(keep=False) if case.route.socket else None
+    query = dict(case.route.query, port=listener.port) if listener else case.route.query
+    spec = {
+        'path': case.route.path,
+        'query': urlencode(query),
+        'profile': profile,
+        'port': port,
+        'helper_only': case.helper_only
+    }
+    output = subprocess.run([sys.executable, '-m', 'bench.startup', '--child', json.dumps(spec)], cwd=ROOT,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=300,
+                            universal_newlines=True).stdout
+    if listener:
+        listener.join()
+    for line in output.splitlines():
+        if line.startswith(MARKER):
+            return json.loads(line[len(MARKER):])
+    raise RuntimeError('%s failed:\n%s' % (case.name, output))
+
+
+def measure(case, folder, port, repeat):
+    from bench.routes import prepare_profile
+
+    samples = []
+    for _ in range(repeat):
+        profile = os.path.join(folder, case.name)
+        shutil.rmtree(profile, ignore_errors=True)
+        prepare_profile(profile)
+        if case.cached:
+            sample(case, profile, port)
+        samples.append(sample(case, profile, port))
+
+    result = dict(samples[-1])
+    result['driver'] = 'helper' if case.helper_only else 'plugin'
+    for name in ('import_ms', 'run_ms', 'total_ms'):
+        result[name] = round(statistics.median(x[name] for x in samples), 1)
+    return result
+
+
+def run(args):
+    from tests.stubserver import StubServer
+
+    folder = tempfile.mkdtemp(prefix='viaplay-startup-')
+    try:
+        with StubServer() as stub:
+            fixtures.serve(stub)
+            results = dict((x.name, measure(x, folder, stub.port, args.repeat))
+                         for x in all_cases() if not args.case or x.name in args.case)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    return {
+        'python': sys.version.split()[0],
+        'repeat': args.repeat,
+        'cases': results
+    }
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['--child']:
+        child(json.loads(argv[1]))
+        return 0
+
+    from bench import report
+    parser = report.parser('Measure the cold start of the plugin per route.')
+    parser.add_argument('--case', action='append', choices=CASE_NAMES, help='only run this case')
+    parser.add_argument('--repeat', type=int, default=5, help='samples per case, the median time is reported')
+    return report.main('startup', parser.parse_args(argv), run)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
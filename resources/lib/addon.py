@@ -3,9 +3,11 @@
 A Kodi add-on for Viaplay
 """
 import sys
-from datetime import datetime
 
+from resources.lib import m3u
 from resources.lib.kodihelper import KodiHelper
+from resources.lib.metrics import metrics
+from resources.lib.products import ProductMapper, coloring
 
 try:
     import urllib.error
@@ -20,10 +22,8 @@ except ImportError:
 
 import json
 import os
-import re
 
 import routing
-import xbmcaddon
 import xbmcgui
 import xbmcvfs
 
@@ -33,16 +33,21 @@ params = dict(parse_qsl(sys.argv[2][1:]))
 helper = KodiHelper(base_url, handle)
 plugin = routing.Plugin()
 
-profile_path = xbmcvfs.translatePath(xbmcaddon.Addon().getAddonInfo('profile'))
+profile_path = helper.addon_profile
 
 
 def run():
+    metrics.reset()
     mode = params.get('mode', None)
     action = params.get('action', '')
     gen = params.get('guid', '')
 
     if action == 'BUILD_M3U':
-        generate_m3u()
+        headless = params.get('headless') == 'true'
+        generate_m3u(headless=headless)
+        if headless:  # nothing to list, nor a login to ask for
+            helper.close()
+            return
 
     elif gen != '':
         id = params.get('url', '')
@@ -51,62 +56,83 @@ def run():
         helper.play(url=id, tve=tve, guid=guid)
 
     try:
-        plugin.run()
+        run_route()
     except helper.vp.ViaplayError as error:
         missing_cookie = 'MissingSessionCookieError'
+        login_error = 'PersistentLoginError'
 
-        if error.value == missing_cookie:
+        if error.value in (missing_cookie, login_error):
+            helper.vp.invalidate_session()
             if helper.authorize():
                 plugin.run()
         else:
+            helper.dump_requests()
             show_error(error.value)
+    except Exception:
+        helper.dump_requests()
+        raise
+    finally:
+        helper.close()
+        write_metrics()
+
+
+def run_route():
+    """Dispatch the route, under cProfile when the hidden profiling setting is on."""
+    with metrics.timer('route'):
+        if helper.get_setting('profiling'):
+            from resources.lib.profiling import RouteProfiler  # cProfile only loaded when asked for
+            with RouteProfiler(os.path.join(profile_path, 'profiling'), plugin.path,
+                               memory=helper.get_setting('profiling_memory')):
+                plugin.run()
+        else:
+            plugin.run()
 
 
-def generate_m3u():
-    sessionid = helper.authorize()
-    if not sessionid:
+def write_metrics():
+    """Append the metrics of this invocation to the metrics file in the profile."""
+    if not helper.get_setting('metrics_enabled'):
+        return
+    try:
+        metrics.write(os.path.join(profile_path, 'metrics.jsonl'), route=plugin.path)
+    except (IOError, OSError) as error:
+        helper.log('Failed to write metrics: %s' % error)
+
+
+def generate_m3u(headless=False):
+    """Export the channels to the M3U playlist set in the settings.
+    Headless (e.g. on a schedule) it shows no dialogs, nor asks to log in."""
+    if headless:
+        try:
+            helper.vp.validate_session()
+        except helper.vp.ViaplayError as error:
+            helper.log('Not logged in, M3U export skipped: %s' % error.value)
+            return
+    else:
         sessionid = helper.authorize()
+        if not sessionid:
+            sessionid = helper.authorize()
 
     file_name = helper.get_setting('fname')
     path = helper.get_setting('path')
 
     if file_name == '' or path == '':
-        xbmcgui.Dialog().notification('Viaplay', helper.language(30062),
-                                      xbmcgui.NOTIFICATION_ERROR)
+        if not headless:
+            xbmcgui.Dialog().notification('Viaplay', helper.language(30062),
+                                          xbmcgui.NOTIFICATION_ERROR)
         return
-    xbmcgui.Dialog().notification('Viaplay', helper.language(30063), xbmcgui.NOTIFICATION_INFO)
-
-    url = helper.generate_channel_url()
-    response = helper.vp.make_request(url=url, method='get')
-    channels_block = response['_embedded']['viaplay:blocks'][0]['_embedded']['viaplay:blocks']
-    channels = [x['viaplay:channel']['content']['title'] for x in channels_block]
-    images = [x['viaplay:channel']['_embedded']['viaplay:products'][0]['station']['images']['fallbackImage']['template'] for x in channels_block]
-    guids = [x['viaplay:channel']['_embedded']['viaplay:products'][1]['epg']['channelGuids'][0] for x in channels_block]
-
-    data = '#EXTM3U\n'
-    for i in range(len(channels)):
-        image = images[i].split('{')[0]
+    if not headless:
+        xbmcgui.Dialog().notification('Viaplay', helper.language(30063), xbmcgui.NOTIFICATION_INFO)
 
-        img = re.compile('replace-(.*?)_.*\.png')
-
-        try:
-            title = img.search(image).group(1)
-            title = re.sub(r"(\w)([A-Z])", r"\1 \2", title)
-            title = title + ' ' + helper.get_country_code().upper()
-
-        except:
-            title = channels[i] + ' ' + helper.get_country_code().upper()
-
-        guid = guids[i]
-        data += '#EXTINF:-1 tvg-id="%s" tvg-name="%s" tvg-logo="%s" group-title="Viasat",%s\nplugin://plugin.video.viaplay/play?guid=%s&url=None&tve=true\n' % (guid, title, image, title, guid)
-
-    f = xbmcvfs.File(path + file_name, 'wb')
-    if sys.version_info[0] > 2:
-        f.write(data)
-    else:
-        f.write(bytearray(data, 'utf-8'))
-    f.close()
-    xbmcgui.Dialog().notification('Viaplay', helper.language(30064), xbmcgui.NOTIFICATION_INFO)
+    try:
+        changed = m3u.export(helper.vp, helper.generate_channel_url(), path + file_name, helper.get_country_code())
+    except helper.vp.ViaplayError as error:
+        if not headless:
+            raise
+        helper.log('M3U export failed: %s' % error.value)
+        return
+    helper.log('M3U playlist %s' % ('written' if changed else 'unchanged, not rewritten'))
+    if not headless:
+        xbmcgui.Dialog().notification('Viaplay', helper.language(30064), xbmcgui.NOTIFICATION_INFO)
 
 @plugin.route('/')
 def root():
@@ -149,7 +175,7 @@ def profiles():
 
 @plugin.route('/start')
 def start():
-    collections = helper.vp.get_collections(plugin.args['url'][0])
+    collections = helper.vp.get_collections(plugin.args['url'][0], stale_while_revalidate=True)
     for i in collections:
         if i['type'] == 'list-featurebox':  # skip feature box for now
             continue
@@ -216,7 +242,7 @@ def search():
 def vod():
     """List categories and collections from the VOD pages (movies, series, kids, store)."""
     helper.add_item(helper.language(30041), plugin.url_for(categories, url=plugin.args['url'][0]))
-    collections = helper.vp.get_collections(plugin.args['url'][0])
+    collections = helper.vp.get_collections(plugin.args['url'][0], stale_while_revalidate=True)
 
     for i in collections:
         if i['type'] == 'list-featurebox':  # skip feature box for now
@@ -272,7 +298,7 @@ def vod():
 
 @plugin.route('/sport')
 def sport():
-    collections = helper.vp.get_collections(plugin.args['url'][0])
+    collections = helper.vp.get_collections(plugin.args['url'][0], stale_while_revalidate=True)
     schedule_added = False
 
     for i in collections:
@@ -292,29 +318,29 @@ def channels():
     channels_dict = helper.vp.get_channels(plugin.args['url'][0])
 
     for channel in channels_dict['channels']:
-        plugin_url = plugin.url_for(list_products, url=channel['_links']['self']['href'])
-        if 'fallback' in channel['content']['images']:
-            channel_image = channel['content']['images']['fallback']['template'].split('{')[0]
-        else:
-            channel_image = channel['content']['images']['logo']['template'].split('{')[0]
+        plugin_url = plugin.url_for(list_products, url=channel.href)
         art = {
-            'thumb': channel_image,
-            'fanart': channel_image
+            'thumb': channel.logo,
+            'fanart': channel.logo
         }
 
-        for index, program in enumerate(channel['_embedded']['viaplay:products']):  # get current live program
-            if index > 0:
-                if helper.vp.get_event_status(program) == 'live':
-                    if program.get('content'):
-                        current_program_title = coloring(program['content']['title'], 'live')
-                    else:  # no broadcast
-                        current_program_title = coloring(helper.language(30049), 'no_broadcast')
-                    break
+        now_playing = helper.vp.get_now_playing(channel.guid)
+        if now_playing and now_playing.get('content'):
+            current_program_title = coloring(now_playing['content']['title'], 'live')
+        else:
+            for index, program in enumerate(channel.programmes):  # get current live program
+                if index > 0:
+                    if helper.vp.get_event_status(program) == 'live':
+                        if program.get('content'):
+                            current_program_title = coloring(program['content']['title'], 'live')
+                        else:  # no broadcast
+                            current_program_title = coloring(helper.language(30049), 'no_broadcast')
+                        break
 
         if sys.version_info[0] > 2:
-            list_title = '[B]{0}[/B]: {1}'.format(channel['content']['title'], current_program_title)
+            list_title = '[B]{0}[/B]: {1}'.format(channel.name, current_program_title)
         else:
-            list_title = '[B]{0}[/B]: {1}'.format(channel['content']['title'], current_program_title.encode('utf-8'))
+            list_title = '[B]{0}[/B]: {1}'.format(channel.name, current_program_title.encode('utf-8'))
 
         helper.add_item(list_title, plugin_url, art=art)
 
@@ -334,30 +360,24 @@ def log_out():
 def list_products(url=None, search_query=None):
     if not url:
         url = plugin.args['url'][0]
-    products_dict = helper.vp.get_products(url, search_query=search_query)
+    products_dict = helper.vp.get_products(url, search_query=search_query, stale_while_revalidate=not search_query,
+                                           pages=listing_pages())
+    mapper = ProductMapper(helper.vp, helper.language, helper.get_country_code(), helper.get_setting('previous_channels'))
     for product in products_dict['products']:
-        if product['type'] == 'series':
-            add_series(product)
-        elif product['type'] == 'episode':
-            add_episode(product)
-        elif product['type'] == 'movie':
-            add_movie(product)
-        elif product['type'] == 'sport':
-            add_sports_event(product)
-        elif product['type'] == 'sportSeries':
-            add_sports_series(product)
-        elif product['type'] == 'tvEvent':
-            add_tv_event(product)
-        elif product['type'] == 'clip':
-            add_event(product)
-        else:
+        if not mapper.supports(product['type']):
             helper.log('product type: {0} is not (yet) supported.'.format(product['type']))
             return False
+        item = mapper.map(product)
+        if item:
+            add_product(item)
 
     if products_dict['next_page']:
         helper.add_item(helper.language(30018), plugin.url_for(list_products, url=products_dict['next_page']))
     helper.eod()
 
+    if products_dict['next_page'] and helper.get_setting('prefetch_next_page'):
+        helper.vp.prefetch([products_dict['next_page']])
+
 
 @plugin.route('/sports_schedule')
 def sports_schedule():
@@ -384,11 +404,27 @@ def seasons_page():
     if len(seasons) == 1:  # list products if there's only one season
         list_products(seasons[0]['_links']['self']['href'])
     else:
+        flatten = helper.get_setting('flatten_series')
+        if flatten:
+            helper.add_item(helper.language(30091), plugin.url_for(all_episodes, url=plugin.args['url'][0]))
         for season in seasons:
             title = helper.language(30014).format(season['title'])
             helper.add_item(title, plugin.url_for(list_products, url=season['_links']['self']['href']))
         helper.eod()
 
+        if flatten:  # make season navigation instant
+            helper.vp.prefetch([season['_links']['self']['href'] for season in seasons])
+
+
+@plugin.route('/all_episodes')
+def all_episodes():
+    """List the episodes of all seasons sorted by season and episode."""
+    episodes = helper.vp.get_all_episodes(plugin.args['url'][0])
+    mapper = ProductMapper(helper.vp, helper.language, helper.get_country_code())
+    for episode in episodes:
+        add_product(mapper.map(episode))
+    helper.eod()
+
 
 @plugin.route('/categories')
 def categories():
@@ -442,345 +478,26 @@ def iptv_epg():
     IPTVManager(port).send_epg()
 
 
-def add_movie(movie):
-    if movie['system'].get('guid'):
-        guid = movie['system']['guid']
-        url = None
-    else:
-        guid = None
-        url = movie['_links']['self']['href']
-
-    plugin_url = plugin.url_for(play, guid=guid, url=url, tve='false')
-    details = movie['content']
+def listing_pages():
+    """Return how many API pages to merge into one listing, 0 for all of them."""
+    if helper.get_setting('load_whole_collection'):
+        return 0
     try:
-        plotx = details.get('synopsis')
-    except:
-        plotx = ''
-
-    movie_info = {
-        'mediatype': 'movie',
-        'title': details['title'],
-        'plot': plotx,
-        'genre': ', '.join([x['title'] for x in movie['_links']['viaplay:genres']]),
-        'year': details['production'].get('year'),
-        'duration': int(details['duration'].get('milliseconds')) // 1000 if 'duration' in details else None,
-        'cast': details['people'].get('actors', []) if 'people' in details else [],
-        'director': ', '.join(details['people'].get('directors', [])) if 'people' in details else [],
-        'mpaa': details.get('parentalRating'),
-        'rating': float(details['imdb'].get('rating')) if 'imdb' in details else None,
-        'votes': str(details['imdb'].get('votes')) if 'imdb' in details else None,
-        'code': details['imdb'].get('id') if 'imdb' in details else None
-    }
-
-    helper.add_item(movie_info['title'], plugin_url, info=movie_info, art=add_art(details['images'], 'movie'),
-                    content='movies', playable=True)
-
-
-def add_series(show):
-    plugin_url = plugin.url_for(seasons_page, url=show['_links']['viaplay:page']['href'])
-    details = show['content']
-
-    series_info = {
-        'mediatype': 'tvshow',
-        'title': details['series']['title'],
-        'tvshowtitle': details['series']['title'],
-        'plot': details['synopsis'] if details.get('synopsis') else details['series'].get('synopsis'),
-        'genre': ', '.join([x['title'] for x in show['_links']['viaplay:genres']]),
-        'year': details['production'].get('year') if 'production' in details else None,
-        'cast': details['people'].get('actors', []) if 'people' in details else [],
-        'director': ', '.join(details['people'].get('directors', [])) if 'people' in details else None,
-        'mpaa': details.get('parentalRating'),
-        'rating': float(details['imdb'].get('rating')) if 'imdb' in details else None,
-        'votes': str(details['imdb'].get('votes')) if 'imdb' in details else None,
-        'code': details['imdb'].get('id') if 'imdb' in details else None,
-        'season': int(details['series']['seasons']) if details['series'].get('seasons') else None
-    }
-
-    helper.add_item(series_info['title'], plugin_url, folder=True, info=series_info,
-                    art=add_art(details['images'], 'series'), content='tvshows')
-
-
-def add_episode(episode):
-    plugin_url = plugin.url_for(play, guid=episode['system']['guid'], url=None, tve='false')
-    details = episode['content']
-
-    episode_info = {
-        'mediatype': 'episode',
-        'title': details.get('title'),
-        'tvshowtitle': details['series'].get('title'),
-        'plot': details['synopsis'] if details.get('synopsis') else details['series'].get('synopsis'),
-        'duration': details['duration']['milliseconds'] // 1000 if 'duration' in details else None,
-        'genre': ', '.join([x['title'] for x in episode['_links']['viaplay:genres']]),
-        'year': details['production'].get('year') if 'production' in details else None,
-        'cast': details['people'].get('actors', []) if 'people' in details else [],
-        'director': ', '.join(details['people'].get('directors', [])) if 'people' in details else None,
-        'mpaa': details.get('parentalRating'),
-        'rating': float(details['imdb'].get('rating')) if 'imdb' in details else None,
-        'votes': str(details['imdb'].get('votes')) if 'imdb' in details else None,
-        'code': details['imdb'].get('id') if 'imdb' in details else None,
-        'season': int(details['series']['season'].get('seasonNumber')),
-        'episode': int(details['series'].get('episodeNumber'))
-    }
+        return max(1, int(helper.get_setting('pages_per_listing')))
+    except ValueError:
+        return 1
 
-    list_title = details['series']['episodeTitle'] if details['series'].get('episodeTitle') else details.get('title')
 
-    helper.add_item(list_title, plugin_url, info=episode_info,
-                    art=add_art(details['images'], 'episode'), content='episodes', playable=True, episode=True)
-
-
-def add_sports_event(event):
-    now = datetime.now()
-    date_today = now.date()
-    event_date = helper.vp.parse_datetime(event['epg']['start'], localize=True)
-    event_status = helper.vp.get_event_status(event)
-
-    if date_today == event_date.date():
-        start_time = '{0} {1}'.format(helper.language(30027), event_date.strftime('%H:%M'))
-    else:
-        start_time = event_date.strftime('%Y-%m-%d %H:%M')
-
-    if event_status != 'upcoming':
-        plugin_url = plugin.url_for(play, guid=event['system']['guid'] + '-%s' % helper.get_country_code().upper(), url=None, tve='false')
-        playable = True
-    else:
-        plugin_url = plugin.url_for(dialog, dialog_type='ok',
-                             heading=helper.language(30017),
-                             message=helper.language(30016).format(start_time).encode('utf-8'))
-        playable = False
-
-    details = event['content']
-    format_title = details['format']['title']
-    original_title = details.get('originalTitle')
-    quality = None
-    plotx = ''
-
-    if format_title.lower() == 'ultra hd':
-        quality = 'Ultra HD'
-        format_title = '4K'
-
-    synopsis = [
-        {
-            'heading': '',
-            'message': details.get('synopsis')
-        },
-        {
-            'heading': helper.language(30068) if quality is not None else None,
-            'message': quality
-        },
-        {
-            'heading': helper.language(30069),
-            'message': f'{format_title} | {original_title}' if original_title is not None else format_title
-        }
-    ]
-
-    if sys.version_info[0] > 2:
-        title = details.get('title')
-    else:
-        title = details.get('title').encode('utf-8')
-
-    for index, plot in enumerate(synopsis):
-        if index == 0:
-            plotx += f'{plot["heading"]} {plot["message"]}\n'
-        else:
-            if plot['heading'] is not None:
-                plotx += f'{plot["heading"]}: {plot["message"]}.\n'
-
-    event_info = {
-        'mediatype': 'video',
-        'title': details.get('title'),
-        'plot': plotx,
-        'year': int(details['production'].get('year')),
-        'genre': format_title,
+def add_product(item):
+    routes = {
+        'play': play,
+        'seasons_page': seasons_page,
+        'sport_series': sport_series,
+        'dialog': dialog
     }
-
-    list_title = '[B]{0}:[/B] {1}'.format(coloring(start_time, event_status), title)
-
-    helper.add_item(list_title, plugin_url, playable=playable, info=event_info,
-                    art=add_art(details['images'], 'sport'), content='episodes')
-
-
-def add_sports_series(event):
-    now = datetime.now()
-    date_today = now.date()
-    if event.get('epg'):
-        event_date = helper.vp.parse_datetime(event['epg']['start'], localize=True)
-    else:
-        event_date = helper.vp.parse_datetime(event['system']['availability']['start'], localize=True)
-    event_status = helper.vp.get_event_status(event)
-
-    if date_today == event_date.date():
-        start_time = '{0} {1}'.format(helper.language(30027), event_date.strftime('%H:%M'))
-    else:
-        start_time = event_date.strftime('%Y-%m-%d %H:%M')
-
-    event_url = event['_links']['viaplay:page']['href']
-
-    if event_status != 'upcoming':
-        plugin_url = plugin.url_for(sport_series, url=event_url)
-        playable = False
-    else:
-        plugin_url = plugin.url_for(dialog, dialog_type='ok',
-                             heading=helper.language(30017),
-                             message=helper.language(30016).format(start_time).encode('utf-8'))
-        playable = False
-
-    details = event['content']
-
-    if sys.version_info[0] > 2:
-        if details.get('title'):
-            title = details.get('title')
-        else:
-            title = details.get('series', {}).get('title')
-    else:
-        if details.get('title'):
-            title = details.get('title').encode('utf-8')
-        else:
-            title = details.get('series', {}).get('title').encode('utf-8')
-    try:
-        plotx = details.get('synopsis')
-    except:
-        plotx = ''
-
-    if details.get('format'):
-        genre = details.get('format').get('title')
-    else:
-        genre = ''
-
-    event_info = {
-        'mediatype': 'video',
-        'title': title,
-        'plot': plotx,
-        'year': details['production'].get('year'),
-        'genre': genre,
-    }
-
-    list_title = '[B]{0}:[/B] {1}'.format(coloring(start_time, event_status), title)
-
-    helper.add_item(list_title, plugin_url, playable=playable, info=event_info,
-                    art=add_art(details['images'], 'sport'), content='episodes')
-
-
-def add_tv_event(event):
-    now = datetime.now()
-    date_today = now.date()
-
-    start_time_obj = helper.vp.parse_datetime(event['epg']['startTime'], localize=True)
-    end_time_obj = helper.vp.parse_datetime(event['epg']['endTime'], localize=True)
-
-    event_status = helper.vp.get_event_status(event)
-
-    status = False
-
-    if end_time_obj >= now and helper.get_setting('previous_channels'):
-        status = True
-    elif not helper.get_setting('previous_channels'):
-        status = True
-
-    if status:
-        # hide non-available catchup items
-        start_time = str(datetime.now())[:-16]
-        if now > helper.vp.parse_datetime(event['system']['catchupAvailability']['end'], localize=True):
-            return
-
-        if date_today == start_time_obj.date():
-            start_time = '{0} {1}'.format(helper.language(30027), start_time_obj.strftime('%H:%M'))
-        else:
-            start_time = start_time_obj.strftime('%Y-%m-%d %H:%M')
-
-        if event_status != 'upcoming':
-            plugin_url = plugin.url_for(play, guid=event['system']['guid'] + '-%s' % helper.get_country_code().upper(), url=None, tve='true')
-            playable = True
-        else:
-            plugin_url = plugin.url_for(dialog, dialog_type='ok',
-                                 heading=helper.language(30017),
-                                 message=helper.language(30016).format(start_time).encode('utf-8'))
-            playable = False
-
-        details = event['content']
-
-        if sys.version_info[0] > 2:
-            title = details.get('title')
-        else:
-            title = details.get('title').encode('utf-8')
-
-        event_info = {
-            'mediatype': 'video',
-            'title': details.get('title'),
-            'plot': details.get('synopsis'),
-            'year': details['production'].get('year'),
-        }
-
-        list_title = '[B]{0}:[/B] {1}'.format(coloring(start_time, event_status), title)
-
-        art = {
-            'thumb': event['content']['images']['landscape']['template'].split('{')[0] if 'landscape' in details['images'] else None,
-            'fanart': event['content']['images']['landscape']['template'].split('{')[0] if 'landscape' in details['images'] else None
-        }
-
-        helper.add_item(list_title, plugin_url, playable=playable, info=event_info, art=art, content='episodes')
-
-def add_event(event):
-    plugin_url = plugin.url_for(play, guid=event['system']['guid'], url=None, tve='false')
-
-    details = event['content']
-
-    if sys.version_info[0] > 2:
-        title = details.get('title')
-    else:
-        title = details.get('title').encode('utf-8')
-
-    event_info = {
-            'mediatype': 'video',
-            'title': details.get('title'),
-            'plot': details.get('synopsis'),
-            'year': details['production'].get('year'),
-        }
-
-    list_title = '{0}'.format(title)
-
-    art = {
-            'thumb': event['content']['images']['landscape']['template'].split('{')[0] if 'landscape' in details['images'] else None,
-            'fanart': event['content']['images']['landscape']['template'].split('{')[0] if 'landscape' in details['images'] else None
-        }
-
-    helper.add_item(list_title, plugin_url, playable=True, info=event_info, art=art, content='episodes')
-
-def add_art(images, content_type):
-    artwork = {}
-
-    for i in images:
-        image_url = images[i]['template'].split('{')[0]  # get rid of template
-
-        if i == 'landscape':
-            if content_type == 'episode' or 'sport':
-                artwork['thumb'] = image_url
-            artwork['banner'] = image_url
-        elif i == 'hero169':
-            artwork['fanart'] = image_url
-        elif i == 'coverart23':
-            if content_type != 'sport':
-                artwork['poster'] = image_url
-        elif i == 'coverart169':
-            artwork['cover'] = image_url
-        elif i == 'boxart':
-            if content_type != 'episode' or content_type != 'sport':
-                artwork['thumb'] = image_url
-
-    return artwork
-
-
-def coloring(text, meaning):
-    """Return the text wrapped in appropriate color markup."""
-    if meaning == 'live':
-        color = 'FF03F12F'
-    elif meaning == 'upcoming':
-        color = 'FFF16C00'
-    elif meaning == 'archive':
-        color = 'FFFF0EE0'
-    elif meaning == 'no_broadcast':
-        color = 'FFFF3333'
-    colored_text = '[COLOR=%s]%s[/COLOR]' % (color, text)
-    return colored_text
+    plugin_url = plugin.url_for(routes[item.route], **item.route_args)
+    helper.add_item(item.label, plugin_url, playable=item.playable, info=item.info, art=item.art,
+                    content=item.content, episode=item.episode)
 
 
 def show_error(error):
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""On-disk HTTP response cache for the Viaplay API"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+except ImportError:
+    from urllib import urlencode
+    from urlparse import parse_qsl, urlsplit, urlunsplit
+
+
+class ResponseCache(object):
+    """Size-bounded LRU cache of raw response bodies stored in the profile folder.
+
+    Every entry is a pair of files named after the cache key: <key>.json holds
+    the metadata (URL, family, expiry, validators) and <key>.body the raw response body.
+    The mtime of the metadata file is the last access time used for eviction.
+    The size of the folder is scanned once and then kept as a running total,
+    so storing an entry doesn't list the whole folder."""
+
+    # how long an expired entry may still be served while it is revalidated
+    max_stale = 24 * 60 * 60
+    # eviction makes room down to this share of max_size, so it isn't needed again on the next put
+    low_water = 0.9
+
+    def __init__(self, cache_dir, ttls, max_size, enabled=True):
+        """ttls maps every endpoint family to a time-to-live in seconds,
+        max_size is the upper bound of the cache folder in bytes."""
+        self.cache_dir = cache_dir
+        self.ttls = ttls
+        self.max_size = max_size
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.counter_lock = threading.Lock()
+        self.size = None  # running total of the folder size in bytes, None until scanned
+        self.size_lock = threading.Lock()
+        if self.enabled and not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    @staticmethod
+    def canonical_url(url, params=None):
+        """Return the URL with a lower case host and all query parameters
+        (including the ones passed as params, such as profileId) sorted."""
+        parts = urlsplit(url)
+        query = dict(parse_qsl(parts.query, keep_blank_values=True))
+        if params:
+            query.update((k, str(v)) for k, v in params.items())
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path,
+                           urlencode(sorted(query.items())), ''))
+
+    def key_for(self, url, params=None):
+        return hashlib.sha1(self.canonical_url(url, params).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def is_cacheable(url):
+        """Only content and EPG pages are cached. Login, stream, profile and
+        subtitle requests always go to the network."""
+        host = urlsplit(url).netloc.lower()
+        return host.startswith('content.viaplay.') or host.startswith('epg.viaplay.')
+
+    def family_for(self, url, data):
+        """Return the endpoint family of a parsed response or None if it shouldn't be cached."""
+        parts = urlsplit(url)
+        host = parts.netloc.lower()
+        if host.startswith('epg.viaplay.'):
+            return 'epg'
+        if not host.startswith('content.viaplay.') or not isinstance(data, dict):
+            return None
+        if len([x for x in parts.path.split('/') if x]) <= 1:  # root page, e.g. /xdk-se
+            # never remember a root page served to a logged out user
+            return 'navigation' if 'user' in data else None
+        if data.get('type') == 'page':
+            return 'navigation'
+        return 'products'
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + '.json', base + '.body'
+
+    def get(self, url, params=None):
+        """Return the cache entry (metadata dict with the body under 'body') or None.
+        The entry is returned even if it has expired; use is_fresh() to check."""
+        if not self.enabled:
+            return None
+        meta_path, body_path = self._paths(self.key_for(url, params))
+        try:
+            with open(meta_path, 'r') as meta_file:
+                entry = json.load(meta_file)
+            with open(body_path, 'rb') as body_file:
+                entry['body'] = body_file.read()
+        except (IOError, OSError, ValueError):
+            return None
+
+        return entry
+
+    @staticmethod
+    def is_fresh(entry):
+        return entry['expires'] > time.time()
+
+    def is_servable(self, entry):
+        return entry['expires'] + self.max_stale > time.time()
+
+    def hit(self, url, params=None):
+        """Register a cache hit and mark the entry as recently used."""
+        with self.counter_lock:
+            self.hits += 1
+        meta_path, _ = self._paths(self.key_for(url, params))
+        try:
+            os.utime(meta_path, None)
+        except OSError:
+            pass
+
+    def miss(self):
+        with self.counter_lock:
+            self.misses += 1
+
+    def put(self, url, params, body, family, response_headers=None, prefetched=False):
+        """Store a response body under the TTL of its endpoint family together
+        with the ETag/Last-Modified validators found in response_headers.
+        prefetched marks entries stored before anyone asked for them."""
+        ttl = self.ttls.get(family, 0)
+        if not self.enabled or ttl <= 0:
+            return
+        key = self.key_for(url, params)
+        meta_path, body_path = self._paths(key)
+        meta = {
+            'url': self.canonical_url(url, params),
+            'family': family,
+            'stored': time.time(),
+            'expires': time.time() + ttl
+        }
+        if prefetched:
+            meta['prefetched'] = True
+        if response_headers:
+            if response_headers.get('ETag'):
+                meta['etag'] = response_headers['ETag']
+            if response_headers.get('Last-Modified'):
+                meta['last_modified'] = response_headers['Last-Modified']
+        meta = json.dumps(meta).encode('utf-8')
+        replaced = self._stored_size(key)
+        self._write(body_path, body)
+        self._write(meta_path, meta)
+        self._account(len(body) + len(meta) - replaced)
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Return the headers needed to revalidate a stale entry."""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def refresh(self, url, params, entry):
+        """Renew the expiry of an entry the server answered 304 Not Modified for.
+        Only the metadata is rewritten, the stored body is kept as is."""
+        meta_path, _ = self._paths(self.key_for(url, params))
+        meta = dict((k, v) for k, v in entry.items() if k != 'body')
+        meta['expires'] = time.time() + self.ttls.get(meta['family'], 0)
+        self._write(meta_path, json.dumps(meta).encode('utf-8'))
+
+    def unmark_prefetched(self, url, params, entry):
+        """Clear the prefetched flag once the entry has been used, so it's only counted once."""
+        meta_path, _ = self._paths(self.key_for(url, params))
+        meta = dict((k, v) for k, v in entry.items() if k not in ('body', 'prefetched'))
+        self._write(meta_path, json.dumps(meta).encode('utf-8'))
+
+    def discard(self, url, params=None):
+        key = self.key_for(url, params)
+        size = self._stored_size(key)
+        self.discard_key(key)
+        with self.size_lock:
+            if self.size is not None:
+                self.size -= size
+
+    def clear(self):
+        if not os.path.exists(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+        with self.size_lock:
+            self.size = 0
+
+    def _stored_size(self, key):
+        """Return the size of the files of an entry, 0 if it isn't stored."""
+        size = 0
+        for path in self._paths(key):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def _account(self, delta):
+        """Add delta bytes to the running size and evict if the cache has grown too big.
+        The first call scans the folder, which already includes delta."""
+        with self.size_lock:
+            if self.size is None:
+                self.size = self._scan()[1]
+            else:
+                self.size += delta
+            full = self.size > self.max_size
+        if full:
+            self.evict()
+
+    def _scan(self):
+        """Return the size and last access time of every entry and the total size of the folder."""
+        entries = {}
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            key, ext = os.path.splitext(name)
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            size, atime = entries.get(key, (0, 0))
+            if ext == '.json':
+                atime = stat.st_mtime
+            entries[key] = (size + stat.st_size, atime)
+            total += stat.st_size
+        return entries, total
+
+    def evict(self):
+        """When the cache doesn't fit in max_size, remove the least recently used
+        entries until it fits in low_water of it."""
+        with self.size_lock:
+            entries, total = self._scan()
+            if total > self.max_size:
+                for key, (size, _) in sorted(entries.items(), key=lambda x: x[1][1]):
+                    self.discard_key(key)
+                    total -= size
+                    if total <= self.max_size * self.low_water:
+                        break
+            self.size = total
+
+    def discard_key(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        """Return the hit/miss counters of this invocation."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0
+        }
+
+    @staticmethod
+    def _write(path, data):
+        """Write atomically so a concurrent reader never sees a partial file."""
+        tmp_path = '%s.%s.tmp' % (path, threading.current_thread().ident)
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Write-behind cookie jar"""
+
+import os
+import sys
+
+if sys.version_info[0] > 2:
+    import http.cookiejar as cookielib
+else:
+    import cookielib
+
+
+class PersistentCookieJar(cookielib.LWPCookieJar):
+    """LWPCookieJar that keeps track of whether any cookie actually changed.
+    save() is a no-op for an unchanged jar and replaces the file atomically
+    otherwise, so it can be called once at the end of a plugin invocation."""
+
+    def __init__(self, filename=None, delayload=False, policy=None):
+        cookielib.LWPCookieJar.__init__(self, filename, delayload, policy)
+        self.dirty = False
+
+    def set_cookie(self, cookie):
+        with self._cookies_lock:
+            try:
+                current = self._cookies[cookie.domain][cookie.path][cookie.name]
+            except KeyError:
+                current = None
+            if current is None or (current.value, current.expires, current.secure, current.discard) != \
+                    (cookie.value, cookie.expires, cookie.secure, cookie.discard):
+                self.dirty = True
+            cookielib.LWPCookieJar.set_cookie(self, cookie)
+
+    def clear(self, domain=None, path=None, name=None):
+        cookielib.LWPCookieJar.clear(self, domain, path, name)  # raises KeyError if nothing was removed
+        self.dirty = True
+
+    def load(self, filename=None, ignore_discard=False, ignore_expires=False):
+        cookielib.LWPCookieJar.load(self, filename, ignore_discard, ignore_expires)
+        self.dirty = False
+
+    def reload(self, ignore_discard=False, ignore_expires=False):
+        """Replace the cookies in memory with the ones in the file, or drop them all
+        if there is no file. LWPCookieJar.load() would merge them instead."""
+        with self._cookies_lock:
+            cookielib.LWPCookieJar.clear(self)
+            if os.path.exists(self.filename):
+                self.load(ignore_discard=ignore_discard, ignore_expires=ignore_expires)
+            self.dirty = False
+
+    def save(self, filename=None, ignore_discard=False, ignore_expires=False):
+        """Write the jar to disk if it has changed since it was loaded or saved."""
+        with self._cookies_lock:
+            if not self.dirty:
+                return False
+            if filename is None:
+                filename = self.filename
+            tmp_filename = filename + '.tmp'
+            cookielib.LWPCookieJar.save(self, tmp_filename, ignore_discard, ignore_expires)
+            os.replace(tmp_filename, filename)
+            self.dirty = False
+            return True
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Persistent programme guide in SQLite"""
+
+import json
+import sqlite3
+import time
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS programmes (
+    channel TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    stop INTEGER NOT NULL,
+    guid TEXT,
+    product TEXT NOT NULL,
+    PRIMARY KEY (channel, start)
+);
+CREATE INDEX IF NOT EXISTS programmes_stop ON programmes (channel, stop);
+CREATE TABLE IF NOT EXISTS fetched (
+    channel TEXT NOT NULL,
+    day TEXT NOT NULL,
+    fetched INTEGER NOT NULL,
+    PRIMARY KEY (channel, day)
+);
+'''
+
+
+class EpgStore(object):
+    """Programmes of every channel, keyed by channel guid and indexed by their
+    start/stop interval, plus the time every channel and day was last downloaded.
+
+    missing() tells which channel days have to be downloaded, so a refresh only
+    fetches what is new or stale. Times are UTC epoch seconds, days are
+    YYYY-MM-DD strings and products are stored as JSON."""
+
+    def __init__(self, path, max_age=6 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self.db = sqlite3.connect(path, timeout=10)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def missing(self, channels, days):
+        """Return the (channel, day) pairs that were never fetched or are older than max_age."""
+        fresh_after = int(time.time()) - self.max_age
+        fresh = set(self.db.execute('SELECT channel, day FROM fetched WHERE fetched > ?', (fresh_after,)))
+        return [(channel, day) for channel in channels for day in days if (channel, day) not in fresh]
+
+    def store(self, channel, day, programmes):
+        """Save the programmes downloaded for a channel and day as (start, stop, guid, product) tuples.
+        They replace whatever was stored for the time they cover, in case the schedule has changed."""
+        with self.db:
+            if programmes:
+                self.db.execute('DELETE FROM programmes WHERE channel = ? AND start >= ? AND start < ?',
+                                (channel, min(x[0] for x in programmes), max(x[1] for x in programmes)))
+            self.db.executemany(
+                'INSERT OR REPLACE INTO programmes (channel, start, stop, guid, product) VALUES (?, ?, ?, ?, ?)',
+                ((channel, start, stop, guid, json.dumps(product)) for start, stop, guid, product in programmes))
+            self.db.execute('INSERT OR REPLACE INTO fetched (channel, day, fetched) VALUES (?, ?, ?)',
+                            (channel, day, int(time.time())))
+
+    def prune(self, before, today):
+        """Forget the programmes that ended before the given time and the days before today."""
+        with self.db:
+            self.db.execute('DELETE FROM programmes WHERE stop < ?', (before,))
+            self.db.execute('DELETE FROM fetched WHERE day < ?', (today,))
+
+    def programmes(self, channel, start, stop):
+        """Return the products of a channel airing at any time between start and stop, in order."""
+        rows = self.db.execute('SELECT product FROM programmes WHERE channel = ? AND stop > ? AND start < ? '
+                               'ORDER BY start', (channel, start, stop))
+        return [json.loads(product) for product, in rows]
+
+    def now_playing(self, channel, at=None):
+        """Return the product on air on a channel, or None if the store doesn't know."""
+        at = int(time.time()) if at is None else at
+        row = self.db.execute('SELECT product FROM programmes WHERE channel = ? AND stop > ? AND start <= ? '
+                              'ORDER BY start DESC LIMIT 1', (channel, at, at)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def clear(self):
+        with self.db:
+            self.db.execute('DELETE FROM programmes')
+            self.db.execute('DELETE FROM fetched')
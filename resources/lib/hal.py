@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""Single-pass index and field projection of Viaplay HAL responses"""
+
+# the fields of an epg channel page needed to find the programme on air
+EPG_NOW_PROJECTION = {
+    '_embedded': {
+        'viaplay:products': {
+            'epg': {'startTime': True, 'endTime': True},
+            'system': {'guid': True}
+        }
+    }
+}
+
+# the fields of a programme kept in the EPG store
+EPG_PROGRAMME_PROJECTION = {
+    'system': {'guid': True, 'flags': True},
+    'epg': True,
+    'content': {'title': True, 'synopsis': True, 'images': {'landscape': True}}
+}
+
+
+def project(node, spec):
+    """Prune a decoded response to the fields named in spec, dropping the rest.
+
+    spec maps a key to True to keep the whole value or to a nested spec. A '*'
+    key applies to every key not named explicitly. Lists are projected item by
+    item with the same spec."""
+    if spec is True:
+        return node
+    if isinstance(node, list):
+        return [project(x, spec) for x in node]
+    if not isinstance(node, dict):
+        return node
+
+    wildcard = spec.get('*')
+    projected = {}
+    for key, value in node.items():
+        sub_spec = spec.get(key, wildcard)
+        if sub_spec:
+            projected[key] = project(value, sub_spec)
+
+    return projected
+
+
+class Page(object):
+    """A parsed Viaplay response with its blocks, products and links indexed once.
+
+    Blocks are indexed by type, products by type and guid and links by rel,
+    so the accessors don't have to re-scan _embedded for every question asked.
+    Products are indexed on first use, a caller may only need the blocks."""
+
+    __slots__ = ('data', 'type', 'links', 'embedded', 'blocks', 'blocks_by_type', 'collections', 'block_products',
+                 '_products', '_products_by_type', '_products_by_guid', 'paging_block')
+
+    def __init__(self, data):
+        self.data = data
+        self.type = data.get('type', '')
+        self.links = data.get('_links', {})
+        self.embedded = data.get('_embedded', {})
+
+        self.blocks = self.embedded.get('viaplay:blocks', [])
+        self.blocks_by_type = {}
+        self.collections = []  # blocks with 'list' in their type
+        self.block_products = []  # products found in any of the blocks
+        self.paging_block = data
+        paging_block_found = False
+        for block in self.blocks:
+            block_type = block['type']
+            self.blocks_by_type.setdefault(block_type, []).append(block)
+            block_type = block_type.lower()
+            if 'list' in block_type:
+                self.collections.append(block)
+            if not paging_block_found and self.type == 'page' and ('list' in block_type or 'grid' in block_type):
+                self.paging_block = block
+                paging_block_found = True
+            self.block_products.extend(block.get('_embedded', {}).get('viaplay:products', []))
+        if self.type == 'product':
+            self.paging_block = self.embedded['viaplay:product']
+
+        self._products = None
+        self._products_by_type = None
+        self._products_by_guid = None
+
+    @property
+    def products(self):
+        if self._products is None:
+            if 'list' in self.type.lower():
+                self._products = self.embedded['viaplay:products']
+            elif self.type == 'tvChannel':
+                # sort out 'nobroadcast' items
+                self._products = [x for x in self.embedded['viaplay:products']
+                                  if 'nobroadcast' not in x['system']['flags']]
+            elif self.type == 'product':
+                # explicity put into list when only one product is returned
+                self._products = [self.embedded['viaplay:product']]
+            else:
+                self._products = self.block_products
+        return self._products
+
+    def index_products(self):
+        self._products_by_type = {}
+        self._products_by_guid = {}
+        for product in self.products:
+            self._products_by_type.setdefault(product.get('type'), []).append(product)
+            guid = product.get('system', {}).get('guid')
+            if guid:
+                self._products_by_guid[guid] = product
+
+    @property
+    def products_by_type(self):
+        if self._products_by_type is None:
+            self.index_products()
+        return self._products_by_type
+
+    @property
+    def products_by_guid(self):
+        if self._products_by_guid is None:
+            self.index_products()
+        return self._products_by_guid
+
+    @classmethod
+    def of(cls, data):
+        """Return data as a Page, indexing it unless it already is one."""
+        return data if isinstance(data, cls) else cls(data)
+
+    def get_blocks(self, block_type):
+        return self.blocks_by_type.get(block_type, [])
+
+    def get_products(self, product_type):
+        return self.products_by_type.get(product_type, [])
+
+    def get_product(self, guid):
+        return self.products_by_guid.get(guid)
+
+    def get_link(self, rel):
+        return self.links.get(rel)
+
+    @property
+    def seasons(self):
+        return self.get_blocks('season-list')
+
+    @property
+    def channels(self):
+        """The channels of the tvChannels blocks of a channels page."""
+        return [x['viaplay:channel'] for block in self.get_blocks('tvChannels')
+                for x in block['_embedded']['viaplay:blocks']]
+
+    @property
+    def next_page(self):
+        """The URL to the next page, False when there is no next page."""
+        links = self.paging_block.get('_links', {})
+        if 'next' in links:
+            return links['next']['href']
+        return False
@@ -8,9 +8,50 @@ import sys
 from resources.lib.kodihelper import KodiHelper
 
 
+class StreamedObject(object):
+    """A JSON object whose (key, value) members are produced one at a time."""
+
+    def __init__(self, members):
+        self.members = members
+
+
+class StreamedArray(object):
+    """A JSON array whose items are produced one at a time."""
+
+    def __init__(self, items):
+        self.items = items
+
+
+def write_json(write, value):
+    """Serialize value with write() piece by piece. The output is the same as
+    json.dumps(value) with StreamedObject/StreamedArray written as dict/list,
+    but those are never held in memory as a whole."""
+    if isinstance(value, (dict, StreamedObject)):
+        write('{')
+        for index, (key, member) in enumerate(value.items() if isinstance(value, dict) else value.members):
+            if index:
+                write(', ')
+            write(json.dumps(key))
+            write(': ')
+            write_json(write, member)
+        write('}')
+    elif isinstance(value, StreamedArray):
+        write('[')
+        for index, item in enumerate(value.items):
+            if index:
+                write(', ')
+            write_json(write, item)
+        write(']')
+    else:
+        write(json.dumps(value))
+
+
 class IPTVManager:
     """Interface to IPTV Manager"""
 
+    # seconds the EPG downloads may take, IPTV Manager gives up on us after a minute
+    epg_timeout = 30
+
     def __init__(self, port):
         """Initialize IPTV Manager object"""
         self.port = port
@@ -25,11 +66,13 @@ class IPTVManager:
         """Send the output of the wrapped function to socket"""
 
         def send(self):
-            """Decorator to send over a socket"""
+            """Decorator to send over a socket, serialized as it's written"""
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.connect(('127.0.0.1', self.port))
             try:
-                sock.sendall(json.dumps(func(self)).encode())
+                stream = sock.makefile('wb')
+                write_json(lambda chunk: stream.write(chunk.encode()), func(self))
+                stream.close()
             finally:
                 sock.close()
 
@@ -38,53 +81,69 @@ class IPTVManager:
     @via_socket
     def send_channels(self):
         """Return JSON-STREAMS formatted python datastructure to IPTV Manager"""
-        channels = list()
-
         self.authorize()
-        url = self.helper.generate_channel_url()
-        response = self.helper.vp.make_request(url=url, method='get')
-        channellist = [entry['viaplay:channel'] for entry in response['_embedded']
-                       ['viaplay:blocks'][0]['_embedded']['viaplay:blocks']]
-
-        for channel in channellist:
-            channels.append(dict(
-                id=channel.get('system', {}).get('channelGuid'),
-                name=channel.get('content', {}).get('title'),
-                preset=channel.get('content', {}).get('channelNumber'),
-                logo=channel.get('content', {}).get('images', {}).get(
-                    'fallback', {}).get('template', '').split('{')[0],
-                stream=f"plugin://plugin.video.viaplay/play?guid={channel.get('system', {}).get('channelGuid')}&url=None&tve=true",
-            ))
-
-        return dict(version=1, streams=channels)
+        lineup = self.helper.vp.get_channel_lineup(self.helper.generate_channel_url())
+
+        channels = (dict(
+            id=channel.guid,
+            name=channel.name,
+            preset=channel.number,
+            logo=channel.logo,
+            stream=f"plugin://plugin.video.viaplay/play?guid={channel.guid}&url=None&tve=true",
+        ) for channel in lineup.channels)
+
+        return dict(version=1, streams=StreamedArray(channels))
 
     @via_socket
     def send_epg(self):
-        """Return JSON-EPG formatted python data structure to IPTV Manager"""
-        from collections import defaultdict
-        epgs = defaultdict(list)
+        """Return JSON-EPG formatted python data structure to IPTV Manager.
+        The programmes are read and serialized one channel at a time."""
+        from collections import OrderedDict
 
         self.authorize()
-        url = self.helper.generate_channel_url()
-        response = self.helper.vp.make_request(url=url, method='get')
-        channels = [entry['viaplay:channel'] for entry in response['_embedded']
-                    ['viaplay:blocks'][0]['_embedded']['viaplay:blocks']]
-
-        for channel in channels:
-            guid = channel.get('system', {}).get('channelGuid')
-            tv_events = channel.get('_embedded', {}).get('viaplay:products')
-
-            for event in tv_events:
-                epgs[guid].append(dict(
-                    start=event.get('epg', {}).get('startTime'),
-                    stop=event.get('epg', {}).get('endTime'),
-                    title=event.get('content', {}).get('title'),
-                    description=event.get('content', {}).get('synopsis'),
-                    image=event.get('content', {}).get('images', {}).get(
-                        'landscape', {}).get('template', '').split('{')[0],
-                    # stream=f"plugin://plugin.video.viaplay/play?guid={event.get('system', {}).get('guid')}-{self.helper.get_country_code().upper()}&url=None&tve=true",
-                    # subtitle=?,
-                    # genre=?,
-                ))
-
-        return dict(version=1, epg=epgs)
+        lineup = self.helper.vp.get_channel_lineup(self.helper.generate_channel_url())
+
+        channels_by_guid = OrderedDict()
+        for channel in lineup.channels:
+            channels_by_guid.setdefault(channel.guid, []).append(channel)
+
+        days = self.helper.vp.get_int_setting('epg_days', 1)
+        if days > 0:
+            self.helper.vp.refresh_epg(list(channels_by_guid), days=days, timeout=self.epg_timeout)
+
+        def epgs():
+            for guid, guid_channels in channels_by_guid.items():
+                tv_events = self.helper.vp.get_programmes(guid, days) if days > 0 else []
+                if not tv_events:
+                    # fall back to the few programmes embedded in the channels page
+                    tv_events = self.unique_programmes(x for channel in guid_channels for x in channel.programmes)
+                if tv_events:
+                    yield guid, [self.epg_entry(event) for event in tv_events]
+
+        return dict(version=1, epg=StreamedObject(epgs()))
+
+    @staticmethod
+    def unique_programmes(programmes):
+        """Return the programmes without the repeats of channels sharing a guid."""
+        seen = set()
+        unique = []
+        for programme in programmes:
+            key = (programme.get('system', {}).get('guid'), programme.get('epg', {}).get('startTime'))
+            if key not in seen:
+                seen.add(key)
+                unique.append(programme)
+        return unique
+
+    @staticmethod
+    def epg_entry(event):
+        return dict(
+            start=event.get('epg', {}).get('startTime'),
+            stop=event.get('epg', {}).get('endTime'),
+            title=event.get('content', {}).get('title'),
+            description=event.get('content', {}).get('synopsis'),
+            image=event.get('content', {}).get('images', {}).get(
+                'landscape', {}).get('template', '').split('{')[0],
+            # stream=f"plugin://plugin.video.viaplay/play?guid={event.get('system', {}).get('guid')}-{self.helper.get_country_code().upper()}&url=None&tve=true",
+            # subtitle=?,
+            # genre=?,
+        )
@@ -1,21 +1,24 @@
 import urllib
 import sys
-
-if sys.version_info[0] > 2:
-    from .viaplay import Viaplay
-else:
-    from viaplay import Viaplay
+import time
 
 import xbmc
 import xbmcvfs
 import xbmcgui
 import xbmcplugin
-import inputstreamhelper
 from xbmcaddon import Addon
 
+if sys.version_info[0] > 2:
+    from .metrics import metrics
+    from .settings import Settings
+else:
+    from metrics import metrics
+    from settings import Settings
+
 
 class KodiHelper(object):
     def __init__(self, base_url=None, handle=None):
+        self.settings = Settings()
         addon = self.get_addon()
         self.base_url = base_url
         self.handle = handle
@@ -31,60 +34,57 @@ class KodiHelper(object):
         self.logging_prefix = '[%s-%s]' % (self.addon_name, self.addon_version)
         if not xbmcvfs.exists(self.addon_profile):
             xbmcvfs.mkdir(self.addon_profile)
-        if self.get_setting('first_run'):
-            self.get_addon().openSettings()
-            self.set_setting('first_run', 'false')
-        self.vp = Viaplay(self.addon_profile, self.get_country_code(), True)
+        self._vp = None
+        # directory listing, committed in one go by eod()
+        self.items = []
+        self.content = None
+        self.sort_methods = []
+
+    @property
+    def vp(self):
+        """The Viaplay instance. It's created on first use, so routes that never
+        talk to Viaplay don't import the HTTP stack or open the first run settings."""
+        if self._vp is None:
+            if self.get_setting('first_run'):
+                self.get_addon().openSettings()
+                self.set_setting('first_run', 'false')
+            if sys.version_info[0] > 2:
+                from .viaplay import Viaplay
+            else:
+                from viaplay import Viaplay
+            self._vp = Viaplay(self.addon_profile, self.get_country_code(), self.get_setting('debug_logging'),
+                               use_service=True, settings=self.settings)
+        return self._vp
+
+    def dump_requests(self):
+        """Write the last requests to the log, e.g. after an error."""
+        if self._vp is not None:
+            self._vp.logger.dump()
+
+    def close(self):
+        """Persist what's left to persist at the end of the invocation."""
+        if self._vp is not None:
+            self._vp.save_cookies()
 
     def get_addon(self):
-        """Returns a fresh addon instance."""
-        return Addon()
+        """Returns the addon instance of the settings snapshot."""
+        return self.settings.addon
 
     def get_setting(self, setting_id):
-        addon = self.get_addon()
-        setting = addon.getSetting(setting_id)
-        if setting == 'true':
-            return True
-        elif setting == 'false':
-            return False
-        else:
-            return setting
+        return self.settings.get(setting_id)
 
     def set_setting(self, key, value):
-        return self.get_addon().setSetting(key, value)
+        return self.settings.set(key, value)
 
     def log(self, string):
         msg = '%s: %s' % (self.logging_prefix, string)
         xbmc.log(msg=msg, level=xbmc.LOGDEBUG)
 
     def get_country_code(self):
-        country_id = self.get_setting('site')
-        if country_id == '0':
-            country_code = 'se'
-        elif country_id == '1':
-            country_code = 'dk'
-        elif country_id == '2':
-            country_code = 'no'
-        elif country_id == '3':
-            country_code = 'fi'
-        elif country_id == '4':
-            country_code = 'pl'
-        elif country_id == '5':
-            country_code = 'lt'
-        elif country_id == '6':
-            country_code = 'nl'
-        elif country_id == '7':
-            country_code = 'ee'
-        elif country_id == '8':
-            country_code = 'gb'
-
-        return country_code
+        return self.settings.country_code
 
     def get_tld(self):
-        country_code = self.get_country_code()
-        if country_code == "nl" or country_code == "gb":
-            return "com"
-        return country_code
+        return self.settings.tld
 
     def capitalize(self, string):
         return string[0].upper()+string[1:]
@@ -230,7 +230,7 @@ class KodiHelper(object):
             return None
 
     def add_item(self, title, url, folder=True, playable=False, info=None, art=None, content=False, episode=False):
-        addon = self.get_addon()
+        started = time.time()
         listitem = xbmcgui.ListItem(label=title)
 
         if playable:
@@ -240,23 +240,36 @@ class KodiHelper(object):
             listitem.setArt(art)
         else:
             art = {
-                'icon': addon.getAddonInfo('icon'),
-                'fanart': addon.getAddonInfo('fanart')
+                'icon': self.settings.get_info('icon'),
+                'fanart': self.settings.get_info('fanart')
             }
             listitem.setArt(art)
         if info:
             listitem.setInfo('Video', info)
         if content:
-            xbmcplugin.setContent(self.handle, content)
-
-        xbmcplugin.addDirectoryItem(self.handle, url, listitem, folder)
+            self.content = content
+        if episode and xbmcplugin.SORT_METHOD_EPISODE not in self.sort_methods:
+            self.sort_methods.append(xbmcplugin.SORT_METHOD_EPISODE)
 
-        if episode:
-            xbmcplugin.addSortMethod(handle=self.handle, sortMethod=xbmcplugin.SORT_METHOD_EPISODE)
+        self.items.append((url, listitem, folder))
+        metrics.count('items')
+        metrics.add_time('add_item', time.time() - started)
 
     def eod(self):
-        """Tell Kodi that the end of the directory listing is reached."""
-        xbmcplugin.endOfDirectory(self.handle, cacheToDisc=False)
+        """Add the collected items to Kodi in one call and tell Kodi that the end
+        of the directory listing is reached. Content type and sort methods are set once."""
+        with metrics.timer('eod'):
+            if self.content:
+                xbmcplugin.setContent(self.handle, self.content)
+            for sort_method in self.sort_methods:
+                xbmcplugin.addSortMethod(handle=self.handle, sortMethod=sort_method)
+            if self.items:
+                xbmcplugin.addDirectoryItems(self.handle, self.items, len(self.items))
+            # start the next listing of the invocation afresh
+            self.items = []
+            self.content = None
+            self.sort_methods = []
+            xbmcplugin.endOfDirectory(self.handle, cacheToDisc=False)
 
     def play(self, guid=None, url=None, pincode=None, tve='false'):
         if url and url != 'None':
@@ -291,6 +304,7 @@ class KodiHelper(object):
             else:
                 raise
 
+        import inputstreamhelper
         ia_helper = inputstreamhelper.Helper('mpd', drm='widevine')
         if ia_helper.check_inputstream():
             playitem = xbmcgui.ListItem(path=stream['mpd_url'])
@@ -314,16 +328,4 @@ class KodiHelper(object):
         ia_addon.openSettings()
 
     def generate_channel_url(self):
-        country_id = self.get_setting('site')
-        if country_id == '0':
-            chann = 'kanaler'
-        elif country_id == '1':
-            chann = 'kanaler'
-        elif country_id == '2':
-            chann = 'kanaler'
-        elif country_id == '3':
-            chann = 'channels'
-        elif country_id == '4':
-            chann = 'channels'
-
-        return f'https://content.viaplay.{self.get_tld()}/xdk-{self.get_country_code()}/{chann}'
+        return self.vp.get_channel_url()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Channel lineup snapshot shared by the channels listing, IPTV Manager and the M3U export"""
+
+import json
+import os
+import threading
+import time
+
+
+class Channel(object):
+    """One channel of the lineup with the programmes embedded in the channels page."""
+
+    __slots__ = ('guid', 'name', 'number', 'logo', 'station_logo', 'epg_guid', 'href', 'programmes')
+
+    def __init__(self, guid, name, number, logo, station_logo, epg_guid, href, programmes):
+        self.guid = guid
+        self.name = name
+        self.number = number
+        self.logo = logo
+        self.station_logo = station_logo
+        self.epg_guid = epg_guid
+        self.href = href
+        self.programmes = programmes
+
+    @classmethod
+    def from_page(cls, channel, project_programme):
+        """Return the Channel of a viaplay:channel block. project_programme prunes the embedded products."""
+        content = channel.get('content', {})
+        images = content.get('images', {})
+        logo = images.get('fallback') or images.get('logo') or {}
+        products = channel.get('_embedded', {}).get('viaplay:products', [])
+
+        station_logo = None
+        epg_guid = None
+        for product in products:
+            if station_logo is None and 'station' in product:
+                station_logo = product['station'].get('images', {}).get('fallbackImage', {}).get('template')
+            if epg_guid is None and product.get('epg', {}).get('channelGuids'):
+                epg_guid = product['epg']['channelGuids'][0]
+
+        guid = channel.get('system', {}).get('channelGuid')
+        return cls(guid, content.get('title'), content.get('channelNumber'),
+                   logo.get('template', '').split('{')[0], station_logo.split('{')[0] if station_logo else None,
+                   epg_guid or guid, channel.get('_links', {}).get('self', {}).get('href'),
+                   [project_programme(x) for x in products])
+
+    def to_dict(self):
+        return dict((x, getattr(self, x)) for x in self.__slots__)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class ChannelLineup(object):
+    """The channels of a channels page, all of its pages merged, as downloaded at a
+    point in time. Saved next to the other profile files, so the plugin, IPTV Manager
+    calls and the M3U export share one download per TTL window."""
+
+    def __init__(self, url, channels, next_page=False, fetched=None):
+        self.url = url
+        self.channels = channels
+        self.next_page = next_page
+        self.fetched = time.time() if fetched is None else fetched
+
+    def is_fresh(self, ttl):
+        return time.time() - self.fetched < ttl
+
+    def save(self, path):
+        data = {
+            'url': self.url,
+            'next_page': self.next_page,
+            'fetched': self.fetched,
+            'channels': [x.to_dict() for x in self.channels]
+        }
+        tmp_path = '%s.%s.tmp' % (path, threading.current_thread().ident)
+        with open(tmp_path, 'w') as lineup_file:
+            json.dump(data, lineup_file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Return the saved lineup, or None if there is none or it can't be read."""
+        try:
+            with open(path) as lineup_file:
+                data = json.load(lineup_file)
+            return cls(data['url'], [Channel.from_dict(x) for x in data['channels']], data['next_page'],
+                       data['fetched'])
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
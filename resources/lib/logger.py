@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Leveled request logging with redaction and a ring buffer of recent requests"""
+
+import re
+import time
+from collections import deque
+
+import xbmc
+
+DEBUG = 0
+INFO = 1
+WARNING = 2
+ERROR = 3
+
+KODI_LEVELS = {
+    DEBUG: xbmc.LOGDEBUG,
+    INFO: xbmc.LOGINFO,
+    WARNING: xbmc.LOGWARNING,
+    ERROR: xbmc.LOGERROR
+}
+
+# extra bytes redacted past the cut, so a credential straddling it is still recognised
+REDACT_MARGIN = 256
+
+# credentials that must never end up in kodi.log, as JSON, dict repr, query string or header
+REDACTED_FIELDS = ('accessToken', 'deviceToken', 'userCode', 'pgPin', 'authorization', 'cookie')
+REDACT_PATTERN = re.compile(
+    r'''(["']?(?:%s)["']?\s*[:=]\s*)("[^"]*"|'[^']*'|[^"'&,;\s}]+)''' % '|'.join(REDACTED_FIELDS),
+    re.IGNORECASE)
+
+
+def redact_match(match):
+    value = match.group(2)
+    if value[0] in '"\'':
+        return '%s%s***%s' % (match.group(1), value[0], value[0])
+    return '%s***' % match.group(1)
+
+
+def redact(text):
+    """Mask the values of credential fields in text."""
+    return REDACT_PATTERN.sub(redact_match, text)
+
+
+class Logger(object):
+    """Logs messages at or above a level. Messages are only formatted when
+    they are actually emitted, so debug logging costs next to nothing when
+    it's turned off. Response bodies are cut to body_limit bytes and every
+    emitted message is redacted.
+
+    The last history requests are kept in memory regardless of the level,
+    so they can be dumped to the log when something goes wrong."""
+
+    def __init__(self, prefix, level=INFO, body_limit=1024, history=20, sink=None):
+        self.prefix = prefix
+        self.level = level
+        self.body_limit = body_limit
+        self.history = deque(maxlen=history)
+        self.sink = sink or self.kodi_sink
+
+    @staticmethod
+    def kodi_sink(message, level):
+        """Write message to kodi.log at the Kodi level of level."""
+        xbmc.log(message, KODI_LEVELS[level])
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def log(self, level, message, *args):
+        if not self.enabled(level):
+            return
+        if args:
+            message = message % args
+        self.sink('%s: %s' % (self.prefix, redact(message)), level)
+
+    def debug(self, message, *args):
+        self.log(DEBUG, message, *args)
+
+    def info(self, message, *args):
+        self.log(INFO, message, *args)
+
+    def warning(self, message, *args):
+        self.log(WARNING, message, *args)
+
+    def error(self, message, *args):
+        self.log(ERROR, message, *args)
+
+    def truncate(self, body):
+        """Return at most body_limit characters of a redacted response body."""
+        if body is None:
+            return ''
+        size = len(body)
+        body = body[:self.body_limit + REDACT_MARGIN]
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', 'replace')
+        body = redact(body)[:self.body_limit]
+        if size > self.body_limit:
+            body += '... (%s bytes)' % size
+        return body
+
+    def record(self, method, url, status, body, elapsed):
+        """Remember a request. Only the start of the body is kept."""
+        kept = body[:self.body_limit + REDACT_MARGIN] if body else body
+        self.history.append((time.time(), method, url, status, kept, len(body) if body else 0, elapsed))
+        if self.enabled(DEBUG):
+            self.debug('%s %s -> %s (%s bytes, %.0f ms)', method.upper(), url, status, len(body) if body else 0,
+                       elapsed * 1000)
+            self.debug('Response: %s', self.truncate(body))
+
+    def dump(self, level=ERROR):
+        """Write the recent requests to the log, e.g. after an error."""
+        if not self.history:
+            return
+        self.log(level, 'Last %s requests:', len(self.history))
+        for timestamp, method, url, status, body, size, elapsed in self.history:
+            self.log(level, '%s %s %s -> %s (%s bytes, %.0f ms): %s',
+                     time.strftime('%H:%M:%S', time.localtime(timestamp)), method.upper(), url, status, size,
+                     elapsed * 1000, self.truncate(body))
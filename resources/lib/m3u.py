@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Incremental M3U playlist export of the channel lineup"""
+
+import hashlib
+import json
+import os
+import re
+
+import xbmc
+import xbmcvfs
+
+# the PVR client that reads the playlist
+PVR_CLIENT = 'pvr.iptvsimple'
+
+# channel name in the station logo file name, e.g. .../replace-Tv3Sport_xxx.png
+LOGO_TITLE = re.compile(r'replace-(.*?)_.*\.png')
+CAMEL_CASE = re.compile(r'(\w)([A-Z])')
+
+ENTRY = '#EXTINF:-1 tvg-id="%s" tvg-name="%s" tvg-logo="%s" group-title="Viasat",%s\n' \
+        'plugin://plugin.video.viaplay/play?guid=%s&url=None&tve=true\n'
+
+
+def channel_title(channel, country_code):
+    image = channel.station_logo or channel.logo
+    match = LOGO_TITLE.search(image) if image else None
+    if match:
+        title = CAMEL_CASE.sub(r'\1 \2', match.group(1))
+    else:
+        title = channel.name
+    return '%s %s' % (title, country_code.upper())
+
+
+def playlist_entries(channels, country_code):
+    yield '#EXTM3U\n'
+    for channel in channels:
+        title = channel_title(channel, country_code)
+        yield ENTRY % (channel.epg_guid, title, channel.station_logo or channel.logo, title, channel.epg_guid)
+
+
+def reload_pvr(addon_id=PVR_CLIENT):
+    """Make the PVR client read the playlist again by disabling and enabling it,
+    if it is enabled. Return True if it was reloaded."""
+    def rpc(method, **params):
+        request = {'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params}
+        try:
+            return json.loads(xbmc.executeJSONRPC(json.dumps(request))).get('result')
+        except ValueError:
+            return None
+
+    details = rpc('Addons.GetAddonDetails', addonid=addon_id, properties=['enabled'])
+    if not details or not details.get('addon', {}).get('enabled'):
+        return False
+    rpc('Addons.SetAddonEnabled', addonid=addon_id, enabled=False)
+    rpc('Addons.SetAddonEnabled', addonid=addon_id, enabled=True)
+    return True
+
+
+class M3UWriter(object):
+    """Writes the playlist entry by entry to a temporary file next to the target,
+    which then replaces it. The entries are hashed first, and nothing is written
+    when the hash is the one of the last export, kept in state_file, so IPTV
+    clients only see a change when there is one."""
+
+    def __init__(self, target, state_file):
+        self.target = target
+        self.state_file = state_file
+
+    def last_hash(self):
+        try:
+            with open(self.state_file) as state:
+                data = json.load(state)
+        except (IOError, OSError, ValueError):
+            return None
+        return data.get('sha1') if data.get('target') == self.target else None
+
+    @staticmethod
+    def digest(entries):
+        sha1 = hashlib.sha1()
+        for entry in entries:
+            sha1.update(entry.encode('utf-8'))
+        return sha1.hexdigest()
+
+    def write(self, entries):
+        """Write the playlist. entries is a function returning its entries, called once
+        to hash them and once more to write them if they changed.
+        Return True if the playlist changed, False if it was left alone."""
+        digest = self.digest(entries())
+        if digest == self.last_hash() and xbmcvfs.exists(self.target):
+            return False
+
+        tmp_target = self.target + '.tmp'
+        tmp_file = xbmcvfs.File(tmp_target, 'wb')
+        try:
+            for entry in entries():
+                tmp_file.write(entry.encode('utf-8'))
+        finally:
+            tmp_file.close()
+
+        if xbmcvfs.exists(self.target):
+            xbmcvfs.delete(self.target)
+        xbmcvfs.rename(tmp_target, self.target)
+        with open(self.state_file, 'w') as state:
+            json.dump({'target': self.target, 'sha1': digest}, state)
+        return True
+
+
+def export(vp, channel_url, target, country_code):
+    """Export the channel lineup to target and reload the PVR client when it changed.
+    Return True if the playlist changed."""
+    lineup = vp.get_channel_lineup(channel_url)
+    writer = M3UWriter(target, os.path.join(vp.settings_folder, 'm3u.json'))
+    changed = writer.write(lambda: playlist_entries(lineup.channels, country_code))
+    if changed:
+        reload_pvr()
+    return changed
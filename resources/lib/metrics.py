@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Per-invocation performance counters written as JSON lines"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Metrics(object):
+    """Counters and timers collected during one plugin invocation.
+
+    Viaplay counts requests, bytes, latency, JSON decoding and cache lookups,
+    KodiHelper counts list items and the time spent handing them to Kodi and
+    addon.run() times the route. write() appends everything as one JSON line
+    to a file that is rotated when it grows past max_size."""
+
+    max_size = 512 * 1024
+    backups = 2
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.counters = {}
+            self.timers = {}
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, name):
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.time() - started)
+
+    def add_request(self, size, elapsed, server_elapsed=None):
+        """Record a request sent over the network. server_elapsed is the time until
+        the response headers arrived, the rest of elapsed was spent reading the body."""
+        with self.lock:
+            self.counters['requests'] = self.counters.get('requests', 0) + 1
+            self.counters['bytes'] = self.counters.get('bytes', 0) + size
+            self.timers['request'] = self.timers.get('request', 0.0) + elapsed
+            if server_elapsed is not None:
+                self.timers['request_wait'] = self.timers.get('request_wait', 0.0) + server_elapsed
+
+    def summary(self, route=None):
+        with self.lock:
+            summary = {
+                'time': int(self.started),
+                'route': route,
+                'total_ms': int((time.time() - self.started) * 1000)
+            }
+            summary.update(self.counters)
+            for name, seconds in self.timers.items():
+                summary['%s_ms' % name] = int(seconds * 1000)
+        return summary
+
+    def write(self, path, route=None):
+        """Append the summary of this invocation to path, rotating the file when it's full."""
+        line = json.dumps(self.summary(route), sort_keys=True) + '\n'
+        try:
+            if os.path.getsize(path) + len(line) > self.max_size:
+                self.rotate(path)
+        except OSError:
+            pass
+        with open(path, 'a') as metrics_file:
+            metrics_file.write(line)
+
+    def rotate(self, path):
+        for number in range(self.backups - 1, 0, -1):
+            backup = '%s.%s' % (path, number)
+            if os.path.exists(backup):
+                os.replace(backup, '%s.%s' % (path, number + 1))
+        os.replace(path, '%s.1' % path)
+
+
+# shared by everything running in this invocation
+metrics = Metrics()
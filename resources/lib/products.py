@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""Projection of Viaplay product JSON into compact list item records"""
+
+from datetime import datetime
+
+# image name -> artwork keys it fills in
+ART_KEYS = {
+    'landscape': ('thumb', 'banner'),
+    'hero169': ('fanart',),
+    'coverart23': ('poster',),
+    'coverart169': ('cover',),
+    'boxart': ('thumb',)
+}
+
+
+def strip_template(template):
+    """Get rid of the URL template, e.g. {?width,height}."""
+    return template.partition('{')[0]
+
+
+def map_art(images, content_type):
+    """Return the Kodi artwork dict for the 'images' of a product."""
+    artwork = {}
+    for name, image in images.items():
+        keys = ART_KEYS.get(name)
+        if keys is None:
+            continue
+        image_url = strip_template(image['template'])
+        for key in keys:
+            if key == 'poster' and content_type == 'sport':
+                continue
+            artwork[key] = image_url
+
+    return artwork
+
+
+def landscape_art(images):
+    image_url = strip_template(images['landscape']['template']) if 'landscape' in images else None
+    return {
+        'thumb': image_url,
+        'fanart': image_url
+    }
+
+
+def coloring(text, meaning):
+    """Return the text wrapped in appropriate color markup."""
+    if meaning == 'live':
+        color = 'FF03F12F'
+    elif meaning == 'upcoming':
+        color = 'FFF16C00'
+    elif meaning == 'archive':
+        color = 'FFFF0EE0'
+    elif meaning == 'no_broadcast':
+        color = 'FFFF3333'
+    colored_text = '[COLOR=%s]%s[/COLOR]' % (color, text)
+    return colored_text
+
+
+class ProductItem(object):
+    """One product projected to what a directory listing needs.
+    route/route_args name the plugin route the item leads to."""
+
+    __slots__ = ('type', 'guid', 'label', 'info', 'art', 'route', 'route_args', 'playable', 'content', 'episode')
+
+    def __init__(self, product_type, guid, label, info, art, route, route_args, playable=False, content=False,
+                 episode=False):
+        self.type = product_type
+        self.guid = guid
+        self.label = label
+        self.info = info
+        self.art = art
+        self.route = route
+        self.route_args = route_args
+        self.playable = playable
+        self.content = content
+        self.episode = episode
+
+
+class ProductMapper(object):
+    """Maps products of a page into ProductItems, one pass per product."""
+
+    def __init__(self, vp, language, country_code, hide_previous=False):
+        self.vp = vp
+        self.language = language
+        self.guid_suffix = '-%s' % country_code.upper()
+        self.hide_previous = hide_previous
+        self.now = datetime.now()
+        self.today = self.now.date()
+        self.mappers = {
+            'movie': self.map_movie,
+            'series': self.map_series,
+            'episode': self.map_episode,
+            'sport': self.map_sports_event,
+            'sportSeries': self.map_sports_series,
+            'tvEvent': self.map_tv_event,
+            'clip': self.map_clip
+        }
+
+    def supports(self, product_type):
+        return product_type in self.mappers
+
+    def map(self, product):
+        """Return the ProductItem for a product, or None if it should be hidden."""
+        return self.mappers[product['type']](product)
+
+    @staticmethod
+    def genres(product):
+        return ', '.join(x['title'] for x in product['_links']['viaplay:genres'])
+
+    @staticmethod
+    def credits(details, no_director=None):
+        """Return the info shared by movies, series and episodes."""
+        people = details.get('people')
+        imdb = details.get('imdb')
+        production = details.get('production')
+        return {
+            'year': production.get('year') if production is not None else None,
+            'cast': people.get('actors', []) if people is not None else [],
+            'director': ', '.join(people.get('directors', [])) if people is not None else no_director,
+            'mpaa': details.get('parentalRating'),
+            'rating': float(imdb.get('rating')) if imdb is not None else None,
+            'votes': str(imdb.get('votes')) if imdb is not None else None,
+            'code': imdb.get('id') if imdb is not None else None
+        }
+
+    def start_time(self, start_time_obj):
+        if self.today == start_time_obj.date():
+            return '{0} {1}'.format(self.language(30027), start_time_obj.strftime('%H:%M'))
+        return start_time_obj.strftime('%Y-%m-%d %H:%M')
+
+    def upcoming_dialog(self, start_time):
+        return {
+            'dialog_type': 'ok',
+            'heading': self.language(30017),
+            'message': self.language(30016).format(start_time).encode('utf-8')
+        }
+
+    def map_movie(self, movie):
+        if movie['system'].get('guid'):
+            guid = movie['system']['guid']
+            url = None
+        else:
+            guid = None
+            url = movie['_links']['self']['href']
+
+        details = movie['content']
+        duration = details.get('duration')
+        info = self.credits(details, no_director=[])
+        info.update({
+            'mediatype': 'movie',
+            'title': details['title'],
+            'plot': details.get('synopsis'),
+            'genre': self.genres(movie),
+            'duration': int(duration.get('milliseconds')) // 1000 if duration is not None else None
+        })
+
+        return ProductItem('movie', guid, info['title'], info, map_art(details['images'], 'movie'),
+                           'play', {'guid': guid, 'url': url, 'tve': 'false'}, playable=True, content='movies')
+
+    def map_series(self, show):
+        details = show['content']
+        series = details['series']
+        info = self.credits(details)
+        info.update({
+            'mediatype': 'tvshow',
+            'title': series['title'],
+            'tvshowtitle': series['title'],
+            'plot': details['synopsis'] if details.get('synopsis') else series.get('synopsis'),
+            'genre': self.genres(show),
+            'season': int(series['seasons']) if series.get('seasons') else None
+        })
+
+        return ProductItem('series', show['system'].get('guid'), info['title'], info,
+                           map_art(details['images'], 'series'), 'seasons_page',
+                           {'url': show['_links']['viaplay:page']['href']}, content='tvshows')
+
+    def map_episode(self, episode):
+        guid = episode['system']['guid']
+        details = episode['content']
+        series = details['series']
+        info = self.credits(details)
+        info.update({
+            'mediatype': 'episode',
+            'title': details.get('title'),
+            'tvshowtitle': series.get('title'),
+            'plot': details['synopsis'] if details.get('synopsis') else series.get('synopsis'),
+            'duration': details['duration']['milliseconds'] // 1000 if 'duration' in details else None,
+            'genre': self.genres(episode),
+            'season': int(series['season'].get('seasonNumber')),
+            'episode': int(series.get('episodeNumber'))
+        })
+        label = series['episodeTitle'] if series.get('episodeTitle') else details.get('title')
+
+        return ProductItem('episode', guid, label, info, map_art(details['images'], 'episode'),
+                           'play', {'guid': guid, 'url': None, 'tve': 'false'}, playable=True,
+                           content='episodes', episode=True)
+
+    def map_sports_event(self, event):
+        event_date = self.vp.parse_datetime(event['epg']['start'], localize=True)
+        event_status = self.vp.get_event_status(event)
+        start_time = self.start_time(event_date)
+        guid = event['system']['guid'] + self.guid_suffix
+
+        if event_status != 'upcoming':
+            route, route_args, playable = 'play', {'guid': guid, 'url': None, 'tve': 'false'}, True
+        else:
+            route, route_args, playable = 'dialog', self.upcoming_dialog(start_time), False
+
+        details = event['content']
+        format_title = details['format']['title']
+        original_title = details.get('originalTitle')
+
+        plot = ' {0}\n'.format(details.get('synopsis'))
+        if format_title.lower() == 'ultra hd':
+            plot += '{0}: {1}.\n'.format(self.language(30068), 'Ultra HD')
+            format_title = '4K'
+        more_info = f'{format_title} | {original_title}' if original_title is not None else format_title
+        plot += '{0}: {1}.\n'.format(self.language(30069), more_info)
+
+        title = details.get('title')
+        info = {
+            'mediatype': 'video',
+            'title': title,
+            'plot': plot,
+            'year': int(details['production'].get('year')),
+            'genre': format_title,
+        }
+        label = '[B]{0}:[/B] {1}'.format(coloring(start_time, event_status), title)
+
+        return ProductItem('sport', guid, label, info, map_art(details['images'], 'sport'),
+                           route, route_args, playable=playable, content='episodes')
+
+    def map_sports_series(self, event):
+        if event.get('epg'):
+            event_date = self.vp.parse_datetime(event['epg']['start'], localize=True)
+        else:
+            event_date = self.vp.parse_datetime(event['system']['availability']['start'], localize=True)
+        event_status = self.vp.get_event_status(event)
+        start_time = self.start_time(event_date)
+
+        if event_status != 'upcoming':
+            route, route_args = 'sport_series', {'url': event['_links']['viaplay:page']['href']}
+        else:
+            route, route_args = 'dialog', self.upcoming_dialog(start_time)
+
+        details = event['content']
+        title = details.get('title') or details.get('series', {}).get('title')
+        info = {
+            'mediatype': 'video',
+            'title': title,
+            'plot': details.get('synopsis'),
+            'year': details['production'].get('year'),
+            'genre': details['format'].get('title') if details.get('format') else '',
+        }
+        label = '[B]{0}:[/B] {1}'.format(coloring(start_time, event_status), title)
+
+        return ProductItem('sportSeries', event['system'].get('guid'), label, info,
+                           map_art(details['images'], 'sport'), route, route_args, content='episodes')
+
+    def map_tv_event(self, event):
+        start_time_obj = self.vp.parse_datetime(event['epg']['startTime'], localize=True)
+        end_time_obj = self.vp.parse_datetime(event['epg']['endTime'], localize=True)
+
+        if self.hide_previous and end_time_obj < self.now:
+            return None
+        # hide non-available catchup items
+        if self.now > self.vp.parse_datetime(event['system']['catchupAvailability']['end'], localize=True):
+            return None
+
+        event_status = self.vp.get_event_status(event)
+        start_time = self.start_time(start_time_obj)
+        guid = event['system']['guid'] + self.guid_suffix
+
+        if event_status != 'upcoming':
+            route, route_args, playable = 'play', {'guid': guid, 'url': None, 'tve': 'true'}, True
+        else:
+            route, route_args, playable = 'dialog', self.upcoming_dialog(start_time), False
+
+        details = event['content']
+        title = details.get('title')
+        info = {
+            'mediatype': 'video',
+            'title': title,
+            'plot': details.get('synopsis'),
+            'year': details['production'].get('year'),
+        }
+        label = '[B]{0}:[/B] {1}'.format(coloring(start_time, event_status), title)
+
+        return ProductItem('tvEvent', guid, label, info, landscape_art(details['images']),
+                           route, route_args, playable=playable, content='episodes')
+
+    def map_clip(self, event):
+        guid = event['system']['guid']
+        details = event['content']
+        title = details.get('title')
+        info = {
+            'mediatype': 'video',
+            'title': title,
+            'plot': details.get('synopsis'),
+            'year': details['production'].get('year'),
+        }
+
+        return ProductItem('clip', guid, '{0}'.format(title), info, landscape_art(details['images']),
+                           'play', {'guid': guid, 'url': None, 'tve': 'false'}, playable=True, content='episodes')
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Opt-in cProfile / tracemalloc capture of a plugin route"""
+
+import cProfile
+import os
+import re
+import time
+
+
+class RouteProfiler(object):
+    """Context manager that profiles the code it wraps and writes
+    <route>-<time>.pstats (and <route>-<time>.alloc.txt with the top
+    allocations when memory is set) into folder. Only the newest keep
+    captures of every route are kept."""
+
+    top_allocations = 30
+
+    def __init__(self, folder, route, memory=False, keep=5):
+        self.folder = folder
+        self.name = re.sub(r'[^\w-]+', '_', route.strip('/')) or 'root'
+        self.memory = memory
+        self.keep = keep
+        self.profiler = cProfile.Profile()
+        self.tracemalloc = None
+
+    def __enter__(self):
+        if self.memory:
+            import tracemalloc
+            self.tracemalloc = tracemalloc
+            tracemalloc.start()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.disable()
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        prefix = os.path.join(self.folder, '%s-%s' % (self.name, self.timestamp()))
+        self.profiler.dump_stats(prefix + '.pstats')
+        if self.tracemalloc:
+            snapshot = self.tracemalloc.take_snapshot()
+            current, peak = self.tracemalloc.get_traced_memory()
+            self.tracemalloc.stop()
+            self.write_allocations(prefix + '.alloc.txt', snapshot, current, peak)
+        self.prune()
+        return False
+
+    @staticmethod
+    def timestamp():
+        """The local time with milliseconds, so routes profiled within a second don't overwrite each other."""
+        now = time.time()
+        return '%s%03d' % (time.strftime('%Y%m%d-%H%M%S', time.localtime(now)), int(now * 1000) % 1000)
+
+    def write_allocations(self, path, snapshot, current, peak):
+        with open(path, 'w') as report:
+            report.write('current: %s KiB, peak: %s KiB\n\n' % (current // 1024, peak // 1024))
+            for stat in snapshot.statistics('lineno')[:self.top_allocations]:
+                report.write('%s\n' % stat)
+
+    def prune(self):
+        """Remove all but the newest keep captures of this route."""
+        for suffix in ('.pstats', '.alloc.txt'):
+            captures = sorted(x for x in os.listdir(self.folder)
+                              if x.endswith(suffix) and x.rsplit('-', 2)[0] == self.name)
+            for capture in captures[:-self.keep]:
+                os.remove(os.path.join(self.folder, capture))
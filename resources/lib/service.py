@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Resident background service holding a warm Viaplay session
+
+The service keeps one long-lived Viaplay instance with a pooled HTTP session
+and serves the plugin's HTTP requests over a local socket, so a directory
+listing does not need to set up new TLS connections. The plugin falls back
+to its own session whenever the service is not running."""
+
+import json
+import socket
+import sys
+import threading
+import time
+import uuid
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+import requests
+from requests.structures import CaseInsensitiveDict
+import xbmc
+import xbmcgui
+import xbmcvfs
+
+if sys.version_info[0] > 2:
+    from . import m3u
+    from .settings import Settings
+    from .viaplay import Viaplay
+else:
+    import m3u
+    from settings import Settings
+    from viaplay import Viaplay
+
+ADDRESS_PROPERTY = 'plugin.video.viaplay.service'
+
+
+class ServiceUnavailable(Exception):
+    """The service is not running or couldn't handle the request."""
+
+
+class ServiceResponse(object):
+    """The parts of requests.Response used by Viaplay, as returned by the service."""
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+
+
+class ServiceClient(object):
+    """Sends HTTP requests through the resident service."""
+
+    Unavailable = ServiceUnavailable
+    timeout = 60
+
+    def __init__(self):
+        self.address = xbmcgui.Window(10000).getProperty(ADDRESS_PROPERTY)
+
+    def available(self):
+        return bool(self.address)
+
+    def request(self, method, url, params=None, payload=None, headers=None):
+        """Return a ServiceResponse. Network errors are raised as the
+        requests exceptions the plugin would have seen in-process."""
+        if not self.address:
+            raise ServiceUnavailable('Service is not running.')
+        port, token = self.address.split(':')
+        message = {
+            'token': token,
+            'method': method,
+            'url': url,
+            'params': params,
+            'payload': payload,
+            'headers': headers
+        }
+
+        try:
+            sock = socket.create_connection(('127.0.0.1', int(port)), timeout=self.timeout)
+        except (socket.error, ValueError) as error:
+            raise ServiceUnavailable(error)
+        try:
+            stream = sock.makefile('rwb')
+            stream.write(json.dumps(message).encode('utf-8') + b'\n')
+            stream.flush()
+            header = json.loads(stream.readline().decode('utf-8'))
+            if header.get('error') == 'connection':
+                raise requests.exceptions.ConnectionError(header['message'])
+            elif header.get('error') == 'timeout':
+                raise requests.exceptions.Timeout(header['message'])
+            elif header.get('error'):
+                raise ServiceUnavailable(header['message'])
+            content = stream.read(header['length'])
+        except (socket.error, ValueError) as error:
+            raise ServiceUnavailable(error)
+        finally:
+            sock.close()
+
+        return ServiceResponse(header['status'], header['headers'], content)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Performs one HTTP request on behalf of a plugin invocation."""
+
+    def handle(self):
+        try:
+            message = json.loads(self.rfile.readline().decode('utf-8'))
+        except ValueError:
+            return
+        if message.get('token') != self.server.token:
+            return
+
+        vp = self.server.vp
+        try:
+            vp.reload_cookies()
+            req = vp.http_request(message['method'], message['url'], params=message['params'],
+                                  payload=message['payload'], headers=message['headers'])
+        except requests.exceptions.Timeout as error:
+            header = {'error': 'timeout', 'message': str(error)}
+        except requests.exceptions.ConnectionError as error:
+            header = {'error': 'connection', 'message': str(error)}
+        except Exception as error:
+            header = {'error': 'internal', 'message': str(error)}
+        else:
+            vp.save_cookies()
+            header = {'status': req.status_code, 'headers': dict(req.headers), 'length': len(req.content)}
+
+        self.wfile.write(json.dumps(header).encode('utf-8') + b'\n')
+        if 'length' in header:
+            self.wfile.write(req.content)
+
+
+class ServiceServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+
+    def __init__(self, vp):
+        socketserver.TCPServer.__init__(self, ('127.0.0.1', 0), RequestHandler)
+        self.vp = vp
+        self.token = uuid.uuid4().hex
+
+
+class ViaplayService(xbmc.Monitor):
+    # seconds between checks for scheduled work
+    tick = 60
+
+    def __init__(self):
+        xbmc.Monitor.__init__(self)
+        self.settings = Settings()
+        self.vp = self.create_viaplay()
+        self.server = None
+        self.m3u_exported = 0
+
+    def create_viaplay(self):
+        return Viaplay(xbmcvfs.translatePath(self.settings.get_info('profile')), settings=self.settings)
+
+    def log(self, string):
+        xbmc.log(msg='[Viaplay service]: %s' % string, level=xbmc.LOGDEBUG)
+
+    def start(self):
+        if self.vp.get_setting('service_enabled') is False:
+            self.log('Disabled in settings.')
+            return
+        self.server = ServiceServer(self.vp)
+        threading.Thread(target=self.server.serve_forever).start()
+        address = '%s:%s' % (self.server.server_address[1], self.server.token)
+        xbmcgui.Window(10000).setProperty(ADDRESS_PROPERTY, address)
+        self.log('Listening on port %s' % self.server.server_address[1])
+
+    def stop(self):
+        xbmcgui.Window(10000).clearProperty(ADDRESS_PROPERTY)
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.vp.save_cookies()
+
+    def on_tick(self):
+        """Export the M3U playlist when the interval set in the settings has passed."""
+        interval = self.vp.get_int_setting('m3u_interval') * 3600
+        if interval <= 0 or time.time() - self.m3u_exported < interval:
+            return
+        self.m3u_exported = time.time()
+        self.export_m3u()
+
+    def export_m3u(self):
+        file_name = self.vp.get_setting('fname')
+        path = self.vp.get_setting('path')
+        if not file_name or not path:
+            return
+        try:
+            self.vp.validate_session()
+            changed = m3u.export(self.vp, self.vp.get_channel_url(), path + file_name, self.vp.get_country_code())
+        except Exception as error:
+            self.log('M3U export failed: %s' % error)
+            return
+        finally:
+            self.vp.save_cookies()
+        self.log('M3U playlist %s' % ('written' if changed else 'unchanged, not rewritten'))
+
+    def onSettingsChanged(self):
+        self.settings.invalidate()
+        # the country, its URLs and the device key are derived from the site setting when Viaplay is created
+        self.vp.save_cookies()
+        self.vp = self.create_viaplay()
+        if self.server:
+            self.server.vp = self.vp
+        enabled = self.vp.get_setting('service_enabled') is not False
+        if enabled and not self.server:
+            self.start()
+        elif not enabled and self.server:
+            self.stop()
+
+
+def run():
+    service = ViaplayService()
+    service.start()
+    while not service.waitForAbort(service.tick):
+        service.on_tick()
+    service.stop()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Add-on settings snapshot shared by KodiHelper and Viaplay"""
+
+from xbmcaddon import Addon
+
+
+class Settings(object):
+    """Reads every setting from Kodi at most once per invocation.
+
+    Values are cached on first access and the derived country code, TLD and
+    device key are computed once. set() and invalidate() drop the cache so a
+    changed setting is read again."""
+
+    # indexed by the 'site' setting
+    COUNTRY_CODES = ['se', 'dk', 'no', 'fi', 'pl', 'lt', 'nl', 'ee', 'gb']
+
+    def __init__(self):
+        self.addon = Addon()
+        self.values = {}
+        self.info = {}
+        self.derive()
+
+    def get(self, setting_id):
+        """Return the setting, converting 'true'/'false' to booleans."""
+        try:
+            return self.values[setting_id]
+        except KeyError:
+            pass
+        setting = self.addon.getSetting(setting_id)
+        if setting == 'true':
+            setting = True
+        elif setting == 'false':
+            setting = False
+        self.values[setting_id] = setting
+        return setting
+
+    def set(self, key, value):
+        result = self.addon.setSetting(key, value)
+        self.invalidate()
+        return result
+
+    def get_info(self, key):
+        """Return (cached) add-on info such as 'path', 'profile' or 'icon'."""
+        if key not in self.info:
+            self.info[key] = self.addon.getAddonInfo(key)
+        return self.info[key]
+
+    def invalidate(self):
+        """Forget all cached values, e.g. after the settings were changed."""
+        self.addon = Addon()
+        self.values = {}
+        self.derive()
+
+    def derive(self):
+        site = self.get('site')
+        try:
+            self.country_code = self.COUNTRY_CODES[int(site)]
+        except (IndexError, ValueError):
+            self.country_code = self.COUNTRY_CODES[0]
+        self.tld = self.get_tld_for(self.country_code)
+        self.device_key = 'xdk-%s' % self.country_code
+
+    @staticmethod
+    def get_tld_for(country_code):
+        if country_code == "nl" or country_code == "gb":
+            return "com"
+        return country_code
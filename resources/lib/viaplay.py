@@ -6,28 +6,54 @@ import sys
 import os
 
 if sys.version_info[0] > 2:
-    import http.cookiejar as cookielib
     import html
 else:
-    import cookielib
     import HTMLParser
 
 import calendar
 import re
 import json
+import threading
+import time
 import uuid
-from collections import OrderedDict
 from datetime import datetime, timedelta
 
-import iso8601
-import requests
 import xbmc
 import xbmcvfs
 import xbmcgui
 import xbmcplugin
-from xbmcaddon import Addon
+
+if sys.version_info[0] > 2:
+    from .cache import ResponseCache
+    from .cookies import PersistentCookieJar
+    from .epgstore import EpgStore
+    from .hal import EPG_NOW_PROJECTION, EPG_PROGRAMME_PROJECTION, Page, project
+    from .lineup import Channel, ChannelLineup
+    from .logger import DEBUG, INFO, Logger, redact
+    from .metrics import metrics
+    from .settings import Settings
+else:
+    from cache import ResponseCache
+    from cookies import PersistentCookieJar
+    from epgstore import EpgStore
+    from hal import EPG_NOW_PROJECTION, EPG_PROGRAMME_PROJECTION, Page, project
+    from lineup import Channel, ChannelLineup
+    from logger import DEBUG, INFO, Logger, redact
+    from metrics import metrics
+    from settings import Settings
+
+
+def network_errors():
+    """Return the requests exceptions raised when the network is unavailable.
+    requests is imported on first use, so invocations served from the cache don't load it."""
+    import requests
+    return requests.exceptions.ConnectionError, requests.exceptions.Timeout
+
 
 class Viaplay(object):
+    # budget for merging several pages into one listing
+    listing_item_limit = 2000
+    listing_time_budget = 15
 
     class ViaplayError(Exception):
         def __init__(self, value):
@@ -36,79 +62,107 @@ class Viaplay(object):
         def __str__(self):
             return repr(self.value)
 
-    def __init__(self, settings_folder, country, debug=False):
-        addon = self.get_addon()
+    def __init__(self, settings_folder, country=None, debug=False, use_service=False, settings=None):
+        self.settings = settings or Settings()
         self.debug = debug
-        self.country = country
-        self.tld = self.get_tld_for(country)
+        self.logger = Logger('[Viaplay]', level=DEBUG if debug else INFO,
+                             body_limit=self.get_int_setting('log_body_limit', 1024))
+        self.country = country or self.get_country_code()
+        self.tld = self.get_tld_for(self.country)
         self.settings_folder = settings_folder
         if sys.version_info[0] > 2:
-            self.addon_path = xbmcvfs.translatePath(addon.getAddonInfo('path'))
-            self.addon_profile = xbmcvfs.translatePath(addon.getAddonInfo('profile'))
+            self.addon_path = xbmcvfs.translatePath(self.settings.get_info('path'))
+            self.addon_profile = xbmcvfs.translatePath(self.settings.get_info('profile'))
         else:
-            self.addon_path = xbmc.translatePath(addon.getAddonInfo('path'))
-            self.addon_profile = xbmc.translatePath(addon.getAddonInfo('profile'))
-        self.cookie_jar = cookielib.LWPCookieJar(os.path.join(self.settings_folder, 'cookie_file'))
+            self.addon_path = xbmc.translatePath(self.settings.get_info('path'))
+            self.addon_profile = xbmc.translatePath(self.settings.get_info('profile'))
+        self.cookie_jar = PersistentCookieJar(os.path.join(self.settings_folder, 'cookie_file'))
         #self.replace_cookies = self.replace_cookies() ### workaround to switch country sites
         self.tempdir = os.path.join(settings_folder, 'tmp')
         if not os.path.exists(self.tempdir):
             os.makedirs(self.tempdir)
         self.deviceid_file = os.path.join(settings_folder, 'deviceId')
-        self.http_session = requests.Session()
+        self.session_file = os.path.join(settings_folder, 'session')
+        self.prefetch_file = os.path.join(settings_folder, 'prefetch.json')
+        self.epg_store_file = os.path.join(settings_folder, 'epg.db')
+        self._epg_store = None
+        self.lineups = {}
+        # hidden setting, responses are saved as replayable fixtures
+        self.recordings_dir = os.path.join(settings_folder, 'recordings') if self.get_setting('record_responses') else None
+        self.session_lock = threading.Lock()
+        self.user_data = None
+        self.session_validated = 0
         self.device_key = 'xdk-%s' % self.country
         self.base_url = 'https://content.viaplay.{0}/{1}'.format(self.tld, self.device_key)
         self.login_api = 'https://login.viaplay.%s/api' % self.tld
         self.profile_url = 'https://viaplay.mtg-api.com'
-        try:
-            self.cookie_jar.load(ignore_discard=True, ignore_expires=True)
-        except IOError:
-            pass
-        self.http_session.cookies = self.cookie_jar
+        self.cache = ResponseCache(
+            os.path.join(settings_folder, 'cache'),
+            ttls={
+                'navigation': self.get_minutes_setting('cache_ttl_navigation'),
+                'products': self.get_minutes_setting('cache_ttl_products'),
+                'epg': self.get_minutes_setting('cache_ttl_epg')
+            },
+            max_size=self.get_int_setting('cache_size', 20) * 1024 * 1024,
+            enabled=self.get_setting('cache_enabled') is not False
+        )
+        self.cookie_mtime = None
+        self.prefetch_stats_lock = threading.Lock()
+        self._http_session = None
+        self.http_session_lock = threading.Lock()
+        # the client is created with the first request, the service module imports requests
+        self.use_service = use_service and self.get_setting('service_enabled') is not False
+        self.service_client = None
+
+    @property
+    def epg_store(self):
+        """The programme guide database, opened on first use."""
+        if self._epg_store is None:
+            self._epg_store = EpgStore(self.epg_store_file)
+        return self._epg_store
+
+    @property
+    def http_session(self):
+        """The requests session, created together with loading the cookies on first use.
+        Invocations served from the cache or by the service never need it."""
+        with self.http_session_lock:
+            if self._http_session is None:
+                import requests
+                self.reload_cookies()
+                session = requests.Session()
+                session.cookies = self.cookie_jar
+                # keep a connection per worker alive for get_many()
+                pool_size = max(10, self.get_int_setting('max_workers', 4))
+                adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount('https://', adapter)
+                self._http_session = session
+        return self._http_session
 
     def get_addon(self):
-        """Returns a fresh addon instance."""
-        return Addon()
+        """Returns the addon instance of the settings snapshot."""
+        return self.settings.addon
 
     def get_setting(self, setting_id):
-        addon = self.get_addon()
-        setting = addon.getSetting(setting_id)
-        if setting == 'true':
-            return True
-        elif setting == 'false':
-            return False
-        else:
-            return setting
+        return self.settings.get(setting_id)
+
+    def get_int_setting(self, setting_id, default=0):
+        try:
+            return int(self.get_setting(setting_id))
+        except (TypeError, ValueError):
+            return default
+
+    def get_minutes_setting(self, setting_id):
+        """Return a setting given in minutes as seconds."""
+        return self.get_int_setting(setting_id) * 60
 
     def get_country_code(self):
-        country_id = self.get_setting('site')
-        if country_id == '0':
-            country_code = 'se'
-        elif country_id == '1':
-            country_code = 'dk'
-        elif country_id == '2':
-            country_code = 'no'
-        elif country_id == '3':
-            country_code = 'fi'
-        elif country_id == '4':
-            country_code = 'pl'
-        elif country_id == '5':
-            country_code = 'lt'
-        elif country_id == '6':
-            country_code = 'nl'
-        elif country_id == '7':
-            country_code = 'ee'
-        elif country_id == '8':
-            country_code = 'gb'
-
-        return country_code
-    
+        return self.settings.country_code
+
     def get_tld(self):
-        return self.get_tld_for(self.get_country_code())
-    
+        return self.settings.tld
+
     def get_tld_for(self, country_code):
-        if country_code == "nl" or country_code == "gb":
-            return "com"
-        return country_code
+        return self.settings.get_tld_for(country_code)
 
     def replace_cookies(self):
         cookie_file = os.path.join(self.addon_profile, 'cookie_file')
@@ -126,17 +180,9 @@ class Viaplay(object):
             w.write(cookies)
             w.close()
 
-    def log(self, string):
-        if self.debug:
-            try:
-                print('[Viaplay]: %s' % string)
-            except UnicodeEncodeError:
-                # we can't anticipate everything in unicode they might throw at
-                # us, but we can handle a simple BOM
-                bom = unicode(codecs.BOM_UTF8, 'utf8')
-                print('[Viaplay]: %s' % string.replace(bom, ''))
-            except:
-                pass
+    def log(self, string, *args):
+        """Log a debug message, formatted with args only if debug logging is on."""
+        self.logger.debug(string, *args)
 
     def parse_url(self, url):
         """Sometimes, Viaplay adds some weird templated stuff to the URL
@@ -144,13 +190,32 @@ class Viaplay(object):
         template = r'\{.+?\}'
         result = re.search(template, str(url))
         if result:
-            self.log('Unparsed URL: {0}'.format(url))
+            self.log('Unparsed URL: %s', url)
             url = re.sub(template, '', url)
 
         return url
 
-    def make_request(self, url, method, params=None, payload=None, headers=None):
-        """Make an HTTP request. Return the response."""
+    def make_request(self, url, method, params=None, payload=None, headers=None, stale_while_revalidate=False,
+                     projection=None):
+        """Make an HTTP request. Return the response.
+        With stale_while_revalidate an expired cache entry is returned right away
+        and refreshed in a background thread for the next visit.
+        With a projection (see hal.project) only the named fields of the response are kept."""
+        params = self.request_params(params)
+        requested = time.time()
+        try:
+            data = self._make_request(url, method, params=params, payload=payload, headers=headers,
+                                      stale_while_revalidate=stale_while_revalidate)
+        except self.ViaplayError:
+            self.validate_session(force=True, validated_after=requested)
+            data = self._make_request(url, method, params=params, payload=payload, headers=headers)
+
+        if projection:
+            data = project(data, projection)
+        return data
+
+    def request_params(self, params=None):
+        """Return the query parameters with the selected profile added."""
         if params == None:
             params = {}
 
@@ -158,40 +223,251 @@ class Viaplay(object):
         if pid:
             params['profileId'] = pid
 
-        try:
-            return self._make_request(url, method, params=params, payload=payload, headers=headers)
-        except self.ViaplayError:
-            self.validate_session()
-            return self._make_request(url, method, params=params, payload=payload, headers=headers)
-
-    def _make_request(self, url, method, params=None, payload=None, headers=None):
+        return params
+
+    def get_many(self, urls, params=None, return_exceptions=False, timeout=None):
+        """GET several URLs concurrently over the shared session, using at most
+        the 'parallel requests' setting worth of threads. Return the parsed responses
+        in the order of urls. With return_exceptions a failed request leaves its
+        exception in the list instead of raising it.
+        Requests not finished within timeout seconds fail with requests.exceptions.Timeout."""
+        from concurrent.futures import ThreadPoolExecutor, wait
+
+        workers = max(1, min(self.get_int_setting('max_workers', 4), len(urls)))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = [executor.submit(self.make_request, url, 'get', params=dict(params or {})) for url in urls]
+        _, not_done = wait(futures, timeout=timeout)
+        for future in not_done:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+        results = []
+        for future in futures:
+            try:
+                if future in not_done:
+                    raise network_errors()[1]('Not finished within %s seconds' % timeout)
+                results.append(future.result())
+            except Exception as error:
+                if not return_exceptions:
+                    raise
+                self.logger.warning('Request failed: %s', error)
+                results.append(error)
+
+        return results
+
+    def _make_request(self, url, method, params=None, payload=None, headers=None, stale_while_revalidate=False):
         """Helper. Make an HTTP request. Return the response."""
         url = self.parse_url(url)
-        self.log('Request URL: %s' % url)
-        self.log('Method: %s' % method)
+        self.log('Request: %s %s', method.upper(), url)
         if params:
-            self.log('Params: %s' % params)
+            self.log('Params: %s', params)
         if payload:
-            self.log('Payload: %s' % payload)
+            self.log('Payload: %s', payload)
         if headers:
-            self.log('Headers: %s' % headers)
+            self.log('Headers: %s', headers)
+
+        entry = None
+        cacheable = method == 'get' and self.cache.enabled and self.cache.is_cacheable(url)
+        if cacheable:
+            entry = self.cache.get(url, params)
+            if entry and self.cache.is_fresh(entry):
+                self.cache.hit(url, params)
+                self.log('Cache hit: %s', url)
+                metrics.count('cache_hits')
+                if entry.get('prefetched'):
+                    self.cache.unmark_prefetched(url, params, entry)
+                    self.update_prefetch_stats(hits=1)
+                return self.parse_response(entry['body'])
+            if entry and stale_while_revalidate and self.get_setting('cache_swr') is not False \
+                    and self.cache.is_servable(entry):
+                self.cache.hit(url, params)
+                self.log('Stale cache hit, revalidating in background: %s', url)
+                metrics.count('cache_stale_hits')
+                threading.Thread(target=self._revalidate, args=(url, params, headers, entry)).start()
+                return self.parse_response(entry['body'])
+            self.cache.miss()
+            metrics.count('cache_misses')
+
+        try:
+            return self._send(url, method, params, payload, headers, entry, cacheable)
+        except network_errors():
+            if entry:  # offline, fall back to whatever we have
+                self.logger.warning('Network unavailable, using cached response: %s', url)
+                metrics.count('cache_offline_hits')
+                return self.parse_response(entry['body'])
+            raise
+
+    def _send(self, url, method, params, payload, headers, entry=None, cacheable=False, prefetched=False):
+        """Helper. Send the request over the network, update the cache and return the parsed response."""
+        if entry:  # stale, ask the server if it has changed
+            conditional_headers = self.cache.conditional_headers(entry)
+            if conditional_headers:
+                headers = dict(headers or {}, **conditional_headers)
+
+        started = time.time()
+        req = self.http_request(method, url, params=params, payload=payload, headers=headers)
+        elapsed = time.time() - started
+        server_elapsed = req.elapsed.total_seconds() if getattr(req, 'elapsed', None) else None
+        metrics.add_request(len(req.content), elapsed, server_elapsed)
+        self.logger.record(method, url, req.status_code, req.content, elapsed)
+        if self.recordings_dir:
+            self.record_response(method, url, params, req, elapsed)
+
+        if entry and req.status_code == 304:
+            self.log('Not modified, refreshing cache entry: %s', url)
+            self.cache.refresh(url, params, entry)
+            return self.parse_response(entry['body'])
+
+        data = self.parse_response(req.content)
+        if cacheable and req.status_code == 200:
+            family = self.cache.family_for(url, data)
+            if family:
+                self.cache.put(url, params, req.content, family, req.headers, prefetched=prefetched)
+
+        return data
+
+    def record_response(self, method, url, params, req, elapsed):
+        """Save a response with credentials redacted, so it can be replayed offline."""
+        if not os.path.exists(self.recordings_dir):
+            os.makedirs(self.recordings_dir)
+        recording = {
+            'method': method,
+            'url': redact(self.cache.canonical_url(url, params)),
+            'status': req.status_code,
+            'headers': dict((k, v) for k, v in req.headers.items()
+                            if k.lower() in ('content-type', 'etag', 'last-modified', 'cache-control')),
+            'elapsed_ms': int(elapsed * 1000),
+            'body': redact(req.content.decode('utf-8', 'replace'))
+        }
+        file_name = '%s-%s.json' % (method, self.cache.key_for(url, params))
+        try:
+            with open(os.path.join(self.recordings_dir, file_name), 'w') as recording_file:
+                json.dump(recording, recording_file)
+        except (IOError, OSError) as error:
+            self.logger.warning('Failed to record response: %s', error)
+
+    def prefetch(self, urls):
+        """Download URLs into the response cache on a background thread, e.g. the
+        next page of a listing that has just been rendered."""
+        if not self.cache.enabled or not urls:
+            return None
+        thread = threading.Thread(target=self._prefetch_many, args=(urls,))
+        thread.start()
+        return thread
+
+    def _prefetch_many(self, urls):
+        from concurrent.futures import ThreadPoolExecutor
+
+        workers = max(1, min(self.get_int_setting('max_workers', 4), len(urls)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(self._prefetch, urls))
+
+    def _prefetch(self, url):
+        """Background thread target of prefetch(). Gives up as soon as Kodi requests an abort."""
+        if xbmc.Monitor().abortRequested():
+            return
+        url = self.parse_url(url)
+        params = self.request_params()
+        if not self.cache.is_cacheable(url):
+            return
+        entry = self.cache.get(url, params)
+        if entry and self.cache.is_fresh(entry):
+            return
+
+        try:
+            self._send(url, 'get', params, None, None, entry, cacheable=True, prefetched=True)
+        except Exception as error:
+            self.log('Prefetch failed for %s: %s', url, error)
+            return
+        finally:
+            self.save_cookies()
+        if not xbmc.Monitor().abortRequested():
+            self.update_prefetch_stats(issued=1)
+
+    def update_prefetch_stats(self, issued=0, hits=0):
+        """Count prefetched pages and how many of them were used, across invocations.
+        Called from the prefetch threads, so the read-modify-write is serialized and
+        the file is replaced atomically."""
+        with self.prefetch_stats_lock:
+            try:
+                with open(self.prefetch_file, 'r') as stats_file:
+                    stats = json.load(stats_file)
+            except (IOError, ValueError):
+                stats = {'issued': 0, 'hits': 0}
+            stats['issued'] += issued
+            stats['hits'] += hits
+            tmp_file = '%s.%s.tmp' % (self.prefetch_file, threading.current_thread().ident)
+            with open(tmp_file, 'w') as stats_file:
+                json.dump(stats, stats_file)
+            os.replace(tmp_file, self.prefetch_file)
+
+        hit_rate = float(stats['hits']) / stats['issued'] if stats['issued'] else 0.0
+        self.log('Prefetch: %s issued, %s used, hit rate %.0f%%', stats['issued'], stats['hits'], hit_rate * 100)
+
+    def http_request(self, method, url, params=None, payload=None, headers=None):
+        """Perform the HTTP request through the background service when it is
+        running, otherwise with our own session. Return the response."""
+        if self.use_service and self.service_client is None:
+            if sys.version_info[0] > 2:
+                from .service import ServiceClient
+            else:
+                from service import ServiceClient
+            self.service_client = ServiceClient()
+        if self.use_service and self.service_client.available():
+            try:
+                return self.service_client.request(method, url, params=params, payload=payload, headers=headers)
+            except self.service_client.Unavailable as error:
+                self.logger.warning('Service unavailable, sending request in-process: %s', error)
+                self.use_service = False
 
         if method == 'get':
-            req = self.http_session.get(url, params=params, headers=headers)
+            return self.http_session.get(url, params=params, headers=headers)
         elif method == 'put':
-            req = self.http_session.put(url, params=params, data=payload, headers=headers)
+            return self.http_session.put(url, params=params, data=payload, headers=headers)
         else:  # post
-            req = self.http_session.post(url, params=params, data=payload, headers=headers)
-        self.log('Response code: %s' % req.status_code)
-        self.log('Response: %s' % req.content)
-        self.cookie_jar.save(ignore_discard=True, ignore_expires=False)
+            return self.http_session.post(url, params=params, data=payload, headers=headers)
 
-        return self.parse_response(req.content)
+    def _revalidate(self, url, params, headers, entry):
+        """Background thread target. Refresh a stale cache entry and optionally
+        refresh the container when the content has changed."""
+        try:
+            self._send(url, 'get', params, None, headers, entry, True)
+        except Exception as error:
+            self.logger.warning('Background revalidation failed for %s: %s', url, error)
+            return
+        finally:
+            self.save_cookies()
+
+        updated = self.cache.get(url, params)
+        if updated and updated['body'] != entry['body']:
+            self.log('Content changed: %s', url)
+            if self.get_setting('cache_swr_refresh'):
+                xbmc.executebuiltin('Container.Refresh')
+
+    def save_cookies(self):
+        """Write the cookie jar to disk if any cookie has changed. Called once at the end of an invocation."""
+        if self.cookie_jar.save(ignore_discard=True, ignore_expires=False):
+            self.cookie_mtime = os.path.getmtime(self.cookie_jar.filename)
+            self.log('Cookies saved.')
+
+    def reload_cookies(self):
+        """(Re)load the cookie jar if the file was changed or removed by another process."""
+        try:
+            mtime = os.path.getmtime(self.cookie_jar.filename)
+        except OSError:
+            mtime = None
+        if mtime != self.cookie_mtime:
+            try:
+                self.cookie_jar.reload(ignore_discard=True, ignore_expires=True)
+                self.cookie_mtime = mtime
+            except IOError:
+                pass
 
     def parse_response(self, response):
         """Try to load JSON data into dict and raise potential errors."""
         try:
-            response = json.loads(response, object_pairs_hook=OrderedDict)  # keep the key order
+            with metrics.timer('decode'):
+                response = json.loads(response)
             if 'success' in response and not response['success']:  # raise ViaplayError when 'success' is False
                 raise self.ViaplayError(response['name'])
 
@@ -220,17 +496,57 @@ class Viaplay(object):
         }
 
         self._make_request(url=url, method='get', params=params)
-        self.validate_session()  # we need this to validate the new cookies
+        self.validate_session(force=True)  # we need this to validate the new cookies
         return True
 
-    def validate_session(self):
-        """Check if the session is valid."""
-        url = self.login_api + '/persistentLogin/v1'
-        params = {
-            'deviceKey': self.device_key
-        }
-        self._make_request(url=url, method='get', params=params)
-        return True
+    def validate_session(self, force=False, validated_after=None):
+        """Check if the session is valid. A session validated within the
+        session_ttl setting is trusted without asking the server again.
+        A forced check is skipped if another thread validated the session
+        after the validated_after timestamp. A failed check forgets the session."""
+        with self.session_lock:
+            if not force and self.get_session():
+                return True
+            if validated_after and self.session_validated > validated_after:
+                return True
+
+            url = self.login_api + '/persistentLogin/v1'
+            params = {
+                'deviceKey': self.device_key
+            }
+            try:
+                data = self._make_request(url=url, method='get', params=params)
+            except self.ViaplayError:
+                # don't let authorize() trust the cached session of a login that failed
+                self.invalidate_session()
+                raise
+            self.save_session(data['userData'])
+            return True
+
+    def get_session(self):
+        """Return the cached userData if it was validated recently enough, otherwise None."""
+        try:
+            with open(self.session_file, 'r') as session_file:
+                session = json.load(session_file)
+        except (IOError, ValueError):
+            return None
+
+        if time.time() - session['validated'] > self.get_minutes_setting('session_ttl'):
+            return None
+        self.user_data = session['userData']
+        return self.user_data
+
+    def save_session(self, user_data):
+        self.user_data = user_data
+        self.session_validated = time.time()
+        with open(self.session_file, 'w') as session_file:
+            json.dump({'userData': user_data, 'validated': time.time()}, session_file)
+
+    def invalidate_session(self):
+        """Forget the cached session so the next validate_session() asks the server."""
+        self.user_data = None
+        if os.path.exists(self.session_file):
+            os.remove(self.session_file)
 
     def log_out(self):
         """Log out from Viaplay."""
@@ -241,9 +557,14 @@ class Viaplay(object):
 
         res = self.make_request(url=url, method='get', params=params)
         if res:
+            self.cache.clear()
+            self.clear_lineups()
+            self.invalidate_session()
+            self.cookie_jar.clear()
             cookie_file = os.path.join(self.settings_folder, 'cookie_file')
             if os.path.exists(cookie_file):
                 os.remove(cookie_file)
+            self.cookie_mtime = None
 
             xbmc.executebuiltin('Container.Update')
 
@@ -251,25 +572,100 @@ class Viaplay(object):
             xbmc.executebuiltin("ActivateWindow(Home)")
 
 
+    def get_epg_url(self, channel_guid, date=None):
+        """Return the URL of the programmes of a channel, optionally of a given day."""
+        url = 'https://epg.viaplay.{c1}/xdk-{c2}/channel/{guid}/'.format(c1=self.get_tld(), c2=self.get_country_code(),
+                                                                         guid=channel_guid)
+        if date:
+            url += '?date=%s' % date.strftime('%Y-%m-%d')
+        return url
+
+    def get_epg(self, channel_guids, days=1, timeout=None):
+        """Return a dict with the programmes of the next days of every channel (see refresh_epg)."""
+        self.refresh_epg(channel_guids, days, timeout)
+        epg = {}
+        for channel_guid in channel_guids:
+            programmes = self.get_programmes(channel_guid, days)
+            if programmes:
+                epg[channel_guid] = programmes
+
+        return epg
+
+    def refresh_epg(self, channel_guids, days=1, timeout=None):
+        """Bring the EPG store up to date for the next days of every channel.
+        Only the channel days missing from the store or gone stale are downloaded,
+        concurrently; the ones that fail or don't finish within timeout seconds are
+        served from what the store already has."""
+        store = self.epg_store
+        today = datetime.now().date()
+        dates = dict((day.strftime('%Y-%m-%d'), day) for day in (today + timedelta(days=x) for x in range(days)))
+        missing = store.missing(channel_guids, sorted(dates))
+        if missing:
+            urls = [self.get_epg_url(channel_guid, dates[day]) for channel_guid, day in missing]
+            responses = self.get_many(urls, return_exceptions=True, timeout=timeout)
+            stored = 0
+            for (channel_guid, day), data in zip(missing, responses):
+                if isinstance(data, Exception):
+                    continue
+                if not isinstance(data, dict):  # not JSON, e.g. an error page
+                    self.logger.warning('EPG: unexpected response for %s on %s', channel_guid, day)
+                    continue
+                products = data.get('_embedded', {}).get('viaplay:products', [])
+                store.store(channel_guid, day, [x for x in (self.epg_programme(x) for x in products) if x])
+                stored += 1
+            self.log('EPG: refreshed %s of %s missing channel days, %s in total', stored, len(missing),
+                     len(channel_guids) * days)
+
+        store.prune(int(time.time()), today.strftime('%Y-%m-%d'))
+
+    def get_programmes(self, channel_guid, days=1):
+        """Return the programmes of a channel from now until the end of the days, as kept in the EPG store."""
+        stop = int(time.mktime((datetime.now().date() + timedelta(days=days)).timetuple()))
+        return self.epg_store.programmes(channel_guid, int(time.time()), stop)
+
+    def epg_programme(self, product):
+        """Return a product of an EPG page as the (start, stop, guid, product) tuple kept in the EPG store."""
+        epg = product.get('epg', {})
+        if not epg.get('startTime') or not epg.get('endTime'):
+            return None
+        start = calendar.timegm(self.parse_datetime(epg['startTime']).utctimetuple())
+        stop = calendar.timegm(self.parse_datetime(epg['endTime']).utctimetuple())
+        return start, stop, product.get('system', {}).get('guid'), self.project_programme(product)
+
+    @staticmethod
+    def project_programme(product):
+        """Return the fields of a programme kept in the EPG store and the channel lineup."""
+        return project(product, EPG_PROGRAMME_PROJECTION)
+
+    def get_now_playing(self, channel_guid):
+        """Return the programme on air on a channel according to the EPG store, None if it isn't known."""
+        if self._epg_store is None and not os.path.exists(self.epg_store_file):
+            return None
+        return self.epg_store.now_playing(channel_guid)
+
     def get_stream(self, guid, pincode=None, tve='false'):
         """Return a dict with the stream URL:s and available subtitle URL:s."""
         stream = {}
 
         if 'ch-' in guid:
             country_code = self.get_country_code()
-            tld = self.get_tld()
-            url = 'https://epg.viaplay.{c1}/xdk-{c2}/channel/{guid}/'.format(c1=tld, c2=country_code,guid=guid)
-            response = self.make_request(url=url, method='get')['_embedded']['viaplay:products']
+            now_playing = self.get_now_playing(guid)
+            if now_playing:
+                guid = now_playing['system']['guid'] + '-' + country_code.upper()
+            else:
+                url = self.get_epg_url(guid)
+                response = self.make_request(url=url, method='get',
+                                             projection=EPG_NOW_PROJECTION)['_embedded']['viaplay:products']
 
-            for i in response:
-                start_time_obj = self.parse_datetime(i['epg']['startTime'], localize=True)
-                end_time_obj = self.parse_datetime(i['epg']['endTime'], localize=True)
+                for i in response:
+                    start_time_obj = self.parse_datetime(i['epg']['startTime'], localize=True)
+                    end_time_obj = self.parse_datetime(i['epg']['endTime'], localize=True)
 
-                now = datetime.now()
-                date_today = now.date()
+                    now = datetime.now()
+                    date_today = now.date()
 
-                if start_time_obj <= now <= end_time_obj:
-                    guid = i['system']['guid'] + '-' + country_code.upper()
+                    if start_time_obj <= now <= end_time_obj:
+                        guid = i['system']['guid'] + '-' + country_code.upper()
 
         #url = 'https://play.viaplay.%s/api/stream/byguid' % self.tld
         url = 'https://play.viaplay.%s/api/stream/bymediaguid' % self.tld
@@ -316,20 +712,17 @@ class Viaplay(object):
         return stream
 
     def get_user_id(self):
-        url = self.login_api + '/persistentLogin/v1'
-        params = {
-            'deviceKey': self.device_key
-        }
-        data = self.make_request(url=url, method='get', params=params)
-        return {'id': data['userData']['userId'], 'token': data['userData']['accessToken']}
+        self.validate_session()
+        return {'id': self.user_data['userId'], 'token': self.user_data['accessToken']}
 
     def get_profiles(self):
-        url = self.profile_url + f'/user-profiles/users/{self.get_user_id()["id"]}/profiles/'
+        user = self.get_user_id()
+        url = self.profile_url + f'/user-profiles/users/{user["id"]}/profiles/'
         params = {
             'language': 'en'
         }
         headers = {
-            'authorization': f'MTG-AT {self.get_user_id()["token"]}'
+            'authorization': f'MTG-AT {user["token"]}'
         }
         data = self.make_request(url=url, method='get', params=params, headers=headers)
 
@@ -373,33 +766,25 @@ class Viaplay(object):
 
         return pages
 
-    def get_collections(self, url):
-        """Return all available collections."""
-        data = self.make_request(url=url, method='get')
-        # return all blocks (collections) with 'list' in type
+    def get_page(self, url, params=None, stale_while_revalidate=False):
+        """Return the response of url as an indexed Page."""
+        return Page(self.make_request(url, method='get', params=params, stale_while_revalidate=stale_while_revalidate))
 
-        return [x for x in data['_embedded']['viaplay:blocks'] if 'list' in x['type'].lower()]
+    def get_collections(self, url, stale_while_revalidate=False):
+        """Return all available collections."""
+        # all blocks (collections) with 'list' in type
+        return self.get_page(url, stale_while_revalidate=stale_while_revalidate).collections
 
-    def get_products(self, url, filter_event=False, search_query=None):
-        """Return a dict containing the products and next page if available."""
+    def get_products(self, url, filter_event=False, search_query=None, stale_while_revalidate=False, pages=1):
+        """Return a dict containing the products and next page if available.
+        With pages > 1 the following pages are merged into the list, pages=0 loads the whole collection."""
         if search_query:
             params = {'query': search_query}
         else:
             params = None
-        data = self.make_request(url, method='get', params=params)
-
-        if 'list' in data['type'].lower():
-            products = data['_embedded']['viaplay:products']
-        elif data['type'] == 'tvChannel':
-            # sort out 'nobroadcast' items
-            products = [x for x in data['_embedded']['viaplay:products'] if 'nobroadcast' not in x['system']['flags']]
-        elif data['type'] == 'product':
-            # explicity put into list when only one product is returned
-            products = [data['_embedded']['viaplay:product']]
-        else:
-            # try to collect all products found in viaplay:blocks
-            products = [p for x in data['_embedded']['viaplay:blocks'] if 'viaplay:products' in x['_embedded'] for p in x['_embedded']['viaplay:products']]
+        page = self.get_page(url, params=params, stale_while_revalidate=stale_while_revalidate)
 
+        products, next_page = self.merge_pages(page, 'products', pages, stale_while_revalidate)
 
         if filter_event:
             # filter out and only return products with event_status in filter_event
@@ -407,31 +792,159 @@ class Viaplay(object):
 
         products_dict = {
             'products': products,
-            'next_page': self.get_next_page(data)
+            'next_page': next_page
         }
 
         return products_dict
 
+    def get_channel_url(self):
+        """Return the URL of the channels page of the selected site."""
+        country_id = self.get_setting('site')
+        if country_id in ('0', '1', '2'):
+            chann = 'kanaler'
+        else:
+            chann = 'channels'
+
+        return f'https://content.viaplay.{self.get_tld()}/xdk-{self.get_country_code()}/{chann}'
+
     def get_channels(self, url):
-        data = self.make_request(url, method='get')
-        channels_block = data['_embedded']['viaplay:blocks'][0]['_embedded']['viaplay:blocks']
-        channels = [x['viaplay:channel'] for x in channels_block]
+        """Return a dict with the Channels of a channels page and the next page if available."""
+        lineup = self.get_channel_lineup(url)
         channels_dict = {
-            'channels': channels,
-            'next_page': self.get_next_page(data)
+            'channels': lineup.channels,
+            'next_page': lineup.next_page
         }
 
         return channels_dict
 
+    def clear_lineups(self):
+        """Forget the saved channel lineups, they depend on the subscription."""
+        self.lineups = {}
+        for file_name in os.listdir(self.settings_folder):
+            if file_name.startswith('lineup-') and file_name.endswith('.json'):
+                os.remove(os.path.join(self.settings_folder, file_name))
+
+    def get_channel_lineup(self, url):
+        """Return the ChannelLineup of a channels page. It's downloaded at most once
+        per EPG cache TTL and shared by every consumer and invocation until then.
+        Lineups are kept per profile, and not at all when the cache is disabled."""
+        if not self.cache.enabled:
+            return self.download_lineup(url)
+
+        ttl = self.get_minutes_setting('cache_ttl_epg')
+        key = self.cache.key_for(url, self.request_params())
+        lineup = self.lineups.get(key)
+        if lineup and lineup.is_fresh(ttl):
+            return lineup
+
+        path = os.path.join(self.settings_folder, 'lineup-%s.json' % key)
+        lineup = ChannelLineup.load(path)
+        if not lineup or not lineup.is_fresh(ttl):
+            try:
+                downloaded = self.download_lineup(url)
+            except network_errors():
+                if not lineup:
+                    raise
+                self.logger.warning('Network unavailable, using saved channel lineup: %s', url)
+            else:
+                lineup = downloaded
+                try:
+                    lineup.save(path)
+                except (IOError, OSError) as error:
+                    self.logger.warning('Failed to save channel lineup: %s', error)
+
+        self.lineups[key] = lineup
+        return lineup
+
+    def download_lineup(self, url):
+        """Download all pages of a channels page into a ChannelLineup."""
+        channels, next_page = self.merge_pages(self.get_page(url), 'channels', pages=0)
+        return ChannelLineup(url, [Channel.from_page(x, self.project_programme) for x in channels], next_page)
+
+    def merge_pages(self, page, items_attr, pages=1, stale_while_revalidate=False):
+        """Follow the 'next' links of a Page and merge the items found in the items_attr
+        attribute of every page. Stops after pages pages (0 for all of them), listing_item_limit
+        items or listing_time_budget seconds. Return the items and the URL of the next unread page.
+
+        Pages are fetched concurrently when their URLs can be derived from the next link,
+        i.e. it carries a page number and the page count is known. Merging stops at the
+        first of them that fails or doesn't arrive in time, which is then the next page."""
+        items = list(getattr(page, items_attr))
+        next_page = page.next_page
+        deadline = time.time() + self.listing_time_budget
+        remaining = pages - 1 if pages > 0 else None
+
+        while next_page and remaining != 0 and len(items) < self.listing_item_limit and time.time() < deadline:
+            urls = self.predict_pages(next_page, page, remaining, merged=len(items))
+            if len(urls) > 1:
+                results = self.get_many(urls, return_exceptions=True, timeout=max(0, deadline - time.time()))
+            else:
+                results = [self.make_request(next_page, 'get', stale_while_revalidate=stale_while_revalidate)]
+            read = 0
+            for url, data in zip(urls, results):
+                if isinstance(data, Exception):
+                    # the pages after a failed one would leave a gap, continue from here next time
+                    next_page = url
+                    break
+                page = Page(data)
+                items.extend(getattr(page, items_attr))
+                next_page = page.next_page
+                read += 1
+            if read < len(urls):
+                break
+            if remaining is not None:
+                remaining -= read
+
+        return items, next_page
+
+    def predict_pages(self, next_page, page, remaining=None, merged=0):
+        """Return the URLs of the following pages derived from the next link,
+        or only the next link if they can't be derived. No more pages are
+        predicted than remaining, or than needed to reach listing_item_limit
+        with merged items already read."""
+        block = page.paging_block
+        page_count = block.get('pageCount')
+        match = re.search(r'([?&]pageNumber=)(\d+)', next_page)
+        if not match or not page_count:
+            return [next_page]
+
+        first = int(match.group(2))
+        last = int(page_count)
+        if remaining is not None:
+            last = min(last, first + remaining - 1)
+        per_page = block.get('productsPerPage') or len(block.get('_embedded', {}).get('viaplay:products', [])) or 1
+        needed = max(1, -(-(self.listing_item_limit - merged) // per_page))
+        last = max(first, min(last, first + needed - 1))
+
+        return [next_page[:match.start(2)] + str(number) + next_page[match.end(2):] for number in range(first, last + 1)]
+
     def get_seasons(self, url):
         """Return all available series seasons."""
-        data = self.make_request(url=url, method='get')
-        return [x for x in data['_embedded']['viaplay:blocks'] if x['type'] == 'season-list']
+        return self.get_page(url).seasons
+
+    def get_all_episodes(self, url):
+        """Return the episodes of all seasons of a series, sorted by season and episode.
+        The seasons are fetched concurrently, each one with all of its pages."""
+        seasons = self.get_seasons(url)
+        seasons_data = self.get_many([x['_links']['self']['href'] for x in seasons])
+        episodes = []
+        for data in seasons_data:
+            products, _ = self.merge_pages(Page(data), 'products', pages=0)
+            episodes.extend(x for x in products if x['type'] == 'episode')
+
+        return sorted(episodes, key=self.episode_order)
+
+    @staticmethod
+    def episode_order(episode):
+        series = episode['content'].get('series', {})
+        try:
+            return int(series['season']['seasonNumber']), int(series['episodeNumber'])
+        except (KeyError, TypeError, ValueError):
+            return 0, 0
 
     def get_sport_series(self, url):
         """Return all available sport series."""
-        data = self.make_request(url=url, method='get')
-        return [p for x in data['_embedded']['viaplay:blocks'] if 'viaplay:products' in x['_embedded'] for p in x['_embedded']['viaplay:products']]
+        return self.get_page(url).block_products
 
     def download_subtitles(self, suburls):
         """Download the SAMI subtitles, decode the HTML entities and save to temp directory.
@@ -526,22 +1039,11 @@ class Viaplay(object):
 
     def get_next_page(self, data):
         """Return the URL to the next page. Returns False when there is no next page."""
-        if data['type'] == 'page':  # multiple blocks in _embedded, find the right one
-            for block in data['_embedded']['viaplay:blocks']:
-                if 'list' in block['type'].lower() or 'grid' in block['type'].lower():
-                    data = block
-                    break
-        elif data['type'] == 'product':
-            data = data['_embedded']['viaplay:product']
-
-        if 'next' in data['_links']:
-            next_page_url = data['_links']['next']['href']
-            return next_page_url
-
-        return False
+        return Page.of(data).next_page
 
     def parse_datetime(self, iso8601_string, localize=False):
         """Parse ISO8601 string to datetime object."""
+        import iso8601
         datetime_obj = iso8601.parse_date(iso8601_string)
         if localize:
             return self.utc_to_local(datetime_obj)
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+from resources.lib import service
+
+if __name__ == '__main__':
+    service.run()
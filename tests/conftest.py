@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Shared fixtures. The Kodi modules come from Kodistubs, which only provide
+signatures, so the few calls the add-on depends on are answered here."""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from tests.kodi import KodiEnvironment  # noqa: E402
+
+
+@pytest.fixture
+def kodi(tmp_path, monkeypatch):
+    """A Kodi environment with an empty profile folder and default settings."""
+    environment = KodiEnvironment(str(tmp_path / 'profile'))
+    environment.install(monkeypatch)
+    return environment
+
+
+@pytest.fixture
+def stub():
+    """A running stub of the Viaplay API without fixtures."""
+    from tests.stubserver import StubServer
+    with StubServer() as server:
+        yield server
+
+
+@pytest.fixture
+def vp(kodi, stub):
+    """A Viaplay instance for viaplay.se talking to the stub server."""
+    from resources.lib.settings import Settings
+    from resources.lib.viaplay import Viaplay
+    from tests.stubserver import route_to
+    viaplay = Viaplay(kodi.profile, 'se', settings=Settings())
+    route_to(viaplay, stub)
+    return viaplay
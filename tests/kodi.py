@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Kodistubs answers for the add-on: settings, add-on info, paths and xbmcplugin call counts
+
+Importing it also makes the stand-ins in tests/stubs importable, for the Kodi
+modules that are add-ons rather than part of Kodistubs: routing and
+inputstreamhelper. Installed ones come first on sys.path."""
+
+import os
+import sys
+import xml.etree.ElementTree as ElementTree
+
+import xbmc
+import xbmcaddon
+import xbmcgui
+import xbmcplugin
+import xbmcvfs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDON_ID = 'plugin.video.viaplay'
+STUBS = os.path.join(ROOT, 'tests', 'stubs')
+
+if STUBS not in sys.path:
+    sys.path.append(STUBS)
+
+
+def default_settings():
+    """Return the defaults of resources/settings.xml."""
+    tree = ElementTree.parse(os.path.join(ROOT, 'resources', 'settings.xml'))
+    return dict((x.get('id'), x.get('default', '')) for x in tree.iter('setting') if x.get('id'))
+
+
+class KodiEnvironment(object):
+    """Patches Kodistubs so Settings, KodiHelper, Viaplay and the routes can run.
+
+    settings starts from the defaults of settings.xml (with first_run off),
+    plugin_calls counts the xbmcplugin functions called per name and
+    directory holds the items passed to xbmcplugin.addDirectoryItems."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        if not os.path.exists(profile):
+            os.makedirs(profile)
+        self.settings = default_settings()
+        self.settings['first_run'] = 'false'
+        self.properties = {}
+        self.plugin_calls = {}
+        self.directory = []
+
+    def install(self, monkeypatch):
+        environment = self
+        info = {
+            'id': ADDON_ID,
+            'name': 'Viaplay',
+            'version': 'test',
+            'path': ROOT,
+            'profile': self.profile,
+            'icon': os.path.join(ROOT, 'icon.png'),
+            'fanart': os.path.join(ROOT, 'fanart.jpg')
+        }
+        monkeypatch.setattr(xbmcaddon.Addon, 'getSetting', lambda self, key: environment.settings.get(key, ''))
+        monkeypatch.setattr(xbmcaddon.Addon, 'setSetting',
+                            lambda self, key, value: environment.settings.__setitem__(key, value))
+        monkeypatch.setattr(xbmcaddon.Addon, 'getAddonInfo', lambda self, key: info.get(key, ''))
+        monkeypatch.setattr(xbmcaddon.Addon, 'getLocalizedString', lambda self, string_id: 'string %s' % string_id)
+        monkeypatch.setattr(xbmcvfs, 'translatePath', lambda path: path)
+        monkeypatch.setattr(xbmc, 'translatePath', lambda path: path, raising=False)
+        monkeypatch.setattr(xbmc.Monitor, 'abortRequested', lambda self: False)
+        monkeypatch.setattr(xbmcgui.Window, 'getProperty', lambda self, key: environment.properties.get(key, ''))
+        monkeypatch.setattr(xbmcgui.Window, 'setProperty',
+                            lambda self, key, value: environment.properties.__setitem__(key, value))
+        monkeypatch.setattr(xbmcgui.Window, 'clearProperty', lambda self, key: environment.properties.pop(key, None))
+        for name in ('addDirectoryItem', 'addDirectoryItems', 'endOfDirectory', 'setContent', 'addSortMethod',
+                     'setResolvedUrl'):
+            monkeypatch.setattr(xbmcplugin, name, self.counting(name, getattr(xbmcplugin, name)))
+
+    def counting(self, name, function):
+        def call(*args, **kwargs):
+            self.plugin_calls[name] = self.plugin_calls.get(name, 0) + 1
+            if name == 'addDirectoryItems':
+                items = kwargs.get('items', args[1] if len(args) > 1 else [])
+                self.directory.extend(items)
+            return function(*args, **kwargs)
+        return call
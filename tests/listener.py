@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Local socket standing in for the one IPTV Manager listens on"""
+
+import hashlib
+import socket
+import threading
+
+
+class Listener(object):
+    """A local socket like the one IPTV Manager listens on. Keeps the received
+    bytes, or only their count and hash when keep is off."""
+
+    def __init__(self, keep=True):
+        self.keep = keep
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(1)
+        self.port = self.sock.getsockname()[1]
+        self.received = []
+        self.size = 0
+        self.sha1 = hashlib.sha1()
+        self.thread = threading.Thread(target=self.receive, daemon=True)
+        self.thread.start()
+
+    def receive(self):
+        conn, _ = self.sock.accept()
+        try:
+            while True:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    break
+                self.size += len(chunk)
+                self.sha1.update(chunk)
+                if self.keep:
+                    self.received.append(chunk)
+        finally:
+            conn.close()
+            self.sock.close()
+
+    def join(self):
+        self.thread.join(10)
+        return b''.join(self.received)
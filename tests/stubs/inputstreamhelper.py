@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""Stand-in for script.module.inputstreamhelper: InputStream Adaptive is always there"""
+
+
+class Helper(object):
+    def __init__(self, protocol, drm=None):
+        self.protocol = protocol
+        self.drm = drm
+
+    def check_inputstream(self):
+        return True
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Stand-in for script.module.routing, enough of its Plugin for the add-on's routes
+
+Routes are matched on the path of sys.argv[0], <name> parts of a rule become
+keyword arguments, and url_for() puts the remaining arguments in the query
+string the way the real module does."""
+
+import re
+import sys
+
+try:
+    from urllib.parse import parse_qs, urlencode, urlsplit
+except ImportError:
+    from urllib import urlencode
+    from urlparse import parse_qs, urlsplit
+
+import xbmcaddon
+
+
+class RoutingError(Exception):
+    pass
+
+
+class UrlRule(object):
+    def __init__(self, rule):
+        self.rule = rule
+        self.keywords = re.findall(r'<([^>]+)>', rule)
+        self.regex = re.compile('^%s/?$' % re.sub(r'<([^>]+)>', r'(?P<\1>[^/]+)', rule.rstrip('/')))
+
+    def match(self, path):
+        found = self.regex.match(path)
+        return found.groupdict() if found else None
+
+    def make_path(self, **kwargs):
+        path = self.rule
+        for keyword in self.keywords:
+            path = path.replace('<%s>' % keyword, str(kwargs.pop(keyword)))
+        return path, kwargs
+
+
+class Plugin(object):
+    def __init__(self, base_url=None):
+        self.base_url = base_url or 'plugin://' + xbmcaddon.Addon().getAddonInfo('id')
+        self.rules = {}
+        self.path = urlsplit(sys.argv[0]).path or '/'
+        self.args = {}
+        self.handle = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else -1
+
+    def route(self, rule):
+        def decorator(func):
+            self.rules.setdefault(func, []).append(UrlRule(rule))
+            return func
+        return decorator
+
+    def url_for(self, func, *args, **kwargs):
+        for rule in self.rules.get(func, []):
+            if len(rule.keywords) == len(args):
+                path, query = rule.make_path(**dict(zip(rule.keywords, args), **kwargs))
+                return self.base_url + path + ('?' + urlencode(query) if query else '')
+        raise RoutingError('No known paths to "%s" with args %s' % (func.__name__, args))
+
+    def url_for_path(self, path):
+        return self.base_url + path
+
+    def run(self, argv=None):
+        argv = argv or sys.argv
+        self.path = urlsplit(argv[0]).path or '/'
+        self.args = parse_qs(argv[2].lstrip('?')) if len(argv) > 2 else {}
+        self.handle = int(argv[1]) if len(argv) > 1 and argv[1].isdigit() else -1
+        self.redirect(self.path)
+
+    def redirect(self, path):
+        for func, rules in self.rules.items():
+            for rule in rules:
+                kwargs = rule.match(path)
+                if kwargs is not None:
+                    return func(**kwargs)
+        raise RoutingError('No route to path "%s"' % path)
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for the Viaplay API serving recorded responses over http.server
+
+Fixtures use the format Viaplay.record_response() writes to the recordings
+folder: method, url, status, headers, elapsed_ms and body. Requests are
+matched on method and canonical URL, ignoring profileId. StubAdapter sends
+the https:// requests of a requests session to the server instead, route_all()
+those of every session."""
+
+import json
+import os
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+
+def fixture_key(method, url):
+    """Return the lookup key of a request: method and canonical URL without profileId."""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != 'profileId')
+    return method.lower(), urlunsplit(('https', parts.netloc.lower(), parts.path, urlencode(query), ''))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.answer('get')
+
+    def do_POST(self):
+        self.answer('post')
+
+    def do_PUT(self):
+        self.answer('put')
+
+    def answer(self, method):
+        server = self.server.stub
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        url = 'https://' + self.path.lstrip('/')
+        fixture = server.fixtures.get(fixture_key(method, url))
+        server.log(method, url, dict(self.headers.items()))
+
+        latency = server.latency
+        if latency == 'recorded':
+            latency = fixture.get('elapsed_ms', 0) / 1000.0 if fixture else 0
+        if latency:
+            time.sleep(latency)
+
+        if fixture is None:
+            status, headers, body = 404, {'Content-Type': 'application/json'}, b'{"success": false, "name": "NotFound"}'
+        else:
+            status, headers, body = fixture['status'], dict(fixture.get('headers', {})), fixture['body']
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            etag = headers.get('ETag')
+            last_modified = headers.get('Last-Modified')
+            if (etag and self.headers.get('If-None-Match') == etag) or \
+                    (last_modified and self.headers.get('If-Modified-Since') == last_modified):
+                status, body = 304, b''
+
+        self.send_response(status)
+        for name, value in headers.items():
+            if name.lower() not in ('content-length', 'transfer-encoding', 'content-encoding'):
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        server.count_bytes(len(body))
+
+
+class StubServer(object):
+    """Serves fixtures on 127.0.0.1. latency is added to every response, in seconds,
+    or 'recorded' to replay the latency stored in each fixture."""
+
+    def __init__(self, latency=0):
+        self.fixtures = {}
+        self.latency = latency
+        self.requests = []
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.httpd = None
+
+    def add(self, url, body, status=200, headers=None, method='get', elapsed_ms=0):
+        """Serve body for url. A dict or list body is sent as JSON."""
+        if not isinstance(body, (bytes, str)):
+            body = json.dumps(body)
+        headers = dict(headers or {})
+        headers.setdefault('Content-Type', 'application/json')
+        self.fixtures[fixture_key(method, url)] = {
+            'status': status,
+            'headers': headers,
+            'body': body,
+            'elapsed_ms': elapsed_ms
+        }
+
+    def load(self, folder):
+        """Serve every recording in folder."""
+        for name in sorted(os.listdir(folder)):
+            if name.endswith('.json'):
+                with open(os.path.join(folder, name)) as recording_file:
+                    recording = json.load(recording_file)
+                self.add(recording['url'], recording['body'], recording['status'], recording.get('headers'),
+                         recording.get('method', 'get'), recording.get('elapsed_ms', 0))
+
+    def log(self, method, url, headers):
+        with self.lock:
+            self.requests.append((method, url, headers))
+
+    def count_bytes(self, size):
+        with self.lock:
+            self.bytes_sent += size
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = []
+            self.bytes_sent = 0
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class StubAdapter(requests.adapters.HTTPAdapter):
+    """Transport adapter that sends https://host/path to http://127.0.0.1:port/host/path."""
+
+    def __init__(self, server, *args, **kwargs):
+        self.server = server
+        requests.adapters.HTTPAdapter.__init__(self, *args, **kwargs)
+
+    def send(self, request, **kwargs):
+        # a copy, so cookies are still extracted for the original host
+        request = request.copy()
+        parts = urlsplit(request.url)
+        request.url = urlunsplit(('http', '127.0.0.1:%s' % self.server.port, '/' + parts.netloc + parts.path,
+                                  parts.query, ''))
+        return requests.adapters.HTTPAdapter.send(self, request, **kwargs)
+
+
+def route_to(vp, server):
+    """Send the HTTP requests of a Viaplay instance to the stub server."""
+    vp.http_session.mount('https://', StubAdapter(server))
+
+
+def route_all(monkeypatch, server):
+    """Send the https:// requests of every requests session to the stub server,
+    including sessions created later, e.g. inside a plugin route."""
+    adapter = StubAdapter(server)
+    get_adapter = requests.Session.get_adapter
+
+    def stub_adapter(session, url):
+        if url.lower().startswith('https://'):
+            return adapter
+        return get_adapter(session, url)
+
+    monkeypatch.setattr(requests.Session, 'get_adapter', stub_adapter)
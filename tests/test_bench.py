@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""The offline benchmark harness"""
+
+import json
+
+from bench import fixtures, report
+from bench.routes import ROUTES, RouteBench
+
+
+def results(**cases):
+    return {'cases': cases}
+
+
+def test_counts_may_not_grow():
+    baseline = results(root={'driver': 'plugin', 'requests': 1, 'xbmcplugin.addDirectoryItems': 1})
+
+    assert report.compare(results(root={'driver': 'plugin', 'requests': 1, 'xbmcplugin.addDirectoryItems': 1}),
+                          baseline) == []
+    assert report.compare(results(root={'driver': 'plugin', 'requests': 2, 'xbmcplugin.addDirectoryItems': 1}),
+                          baseline) == ['root: requests is 2, baseline 1']
+
+
+def test_times_and_memory_have_a_tolerance():
+    baseline = results(root={'wall_ms': 100, 'peak_kib': 1000, 'bytes': 1000})
+
+    assert report.compare(results(root={'wall_ms': 140, 'peak_kib': 1200, 'bytes': 1040}), baseline) == []
+    assert len(report.compare(results(root={'wall_ms': 160, 'peak_kib': 1300, 'bytes': 1100}), baseline)) == 3
+    assert report.compare(results(root={'wall_ms': 160}), baseline, check_time=False) == []
+    assert report.compare(results(root={'wall_ms': 4}), results(root={'wall_ms': 1})) == []
+
+
+def test_skipped_and_other_drivers_are_not_compared():
+    baseline = results(root={'skipped': 'no routing'}, iptv_epg={'driver': 'direct', 'requests': 1})
+
+    assert report.compare(results(root={'driver': 'plugin', 'requests': 9},
+                                  iptv_epg={'driver': 'plugin', 'requests': 9}), baseline) == []
+
+
+def test_every_route_runs(stub):
+    fixtures.serve(stub, fixtures.Sizes(page_count=2, per_page=10, collections=2, channels=3, programmes=6))
+    bench = RouteBench(stub)
+    try:
+        cases = dict((x.name, bench.run(x, repeat=1)) for x in ROUTES)
+    finally:
+        bench.close()
+
+    for name, result in cases.items():
+        assert 'skipped' not in result, name
+        assert result['driver'] == 'plugin', name
+        assert result['requests'] > 0, name
+    assert cases['root']['items'] > 0
+    # a page of products and the next page item
+    assert cases['list_products']['items'] == 11
+    assert cases['play']['xbmcplugin.setResolvedUrl'] >= 1
+    assert cases['iptv_epg']['requests'] == 4
+    assert cases['iptv_epg']['socket_bytes'] > 0
+    assert cases['iptv_epg']['peak_kib'] > 0
+
+
+def test_unchecked_metrics_are_not_compared():
+    baseline = results(iptv_epg={'socket_bytes': 100})
+    current = results(iptv_epg={'socket_bytes': 200})
+
+    assert report.compare(current, baseline) != []
+    current['unchecked'] = ['socket_bytes']
+    assert report.compare(current, baseline) == []
+
+
+def test_kodihelper_starts_without_the_http_stack(stub, tmp_path):
+    from bench.routes import Route
+    from bench.startup import Case, measure
+
+    result = measure(Case(Route('kodihelper', '/'), helper_only=True), str(tmp_path), stub.port, repeat=1)
+
+    assert result['requests_imported'] == 0
+    assert result['viaplay_imported'] == 0
+    assert result['http_session'] == 0
+
+
+def test_cached_listings_start_without_requests(stub, tmp_path):
+    from bench.startup import all_cases, measure
+
+    fixtures.serve(stub, fixtures.Sizes(page_count=1, per_page=10))
+    case = [x for x in all_cases() if x.name == 'list_products_cached'][0]
+    result = measure(case, str(tmp_path), stub.port, repeat=1)
+
+    assert result['driver'] == 'plugin'
+    assert result['viaplay_imported'] == 1
+    assert result['requests_imported'] == 0
+
+
+def test_a_large_listing_is_committed_at_once(tmp_path):
+    from bench.listing import render_case
+
+    result = render_case([fixtures.episode(x) for x in range(300)], str(tmp_path), repeat=1)
+
+    assert result['items'] == 300
+    assert result['xbmcplugin.addDirectoryItems'] == 1
+    assert result['xbmcplugin.addSortMethod'] == 1
+    assert result['xbmcplugin.setContent'] == 1
+    assert 'xbmcplugin.addDirectoryItem' not in result
+
+
+def test_mappers_read_recorded_pages(tmp_path):
+    from bench.mappers import load_page
+
+    page = fixtures.list_page(fixtures.LIST_URL, 1, 1, 6)
+    recording = tmp_path / 'get-page.json'
+    recording.write_text(json.dumps({'url': fixtures.LIST_URL, 'status': 200, 'body': json.dumps(page)}))
+    plain = tmp_path / 'page.json'
+    plain.write_text(json.dumps(page))
+
+    assert [x['type'] for x in load_page(str(recording))] == ['movie', 'series', 'movie', 'series', 'episode', 'sport']
+    assert load_page(str(plain)) == load_page(str(recording))
+
+
+def test_projected_epg_pages_keep_the_least_memory():
+    from datetime import datetime
+
+    from bench.decode import EPG_STORE_PROJECTION, decode_page
+
+    body = json.dumps(fixtures.epg_page(fixtures.channel_guid(0), datetime.utcnow(), 200))
+    result = decode_page(body, {'projected': EPG_STORE_PROJECTION}, repeat=1)
+
+    assert result['bytes'] == len(body)
+    assert result['projected_kept_kib'] < result['dict_kept_kib'] < result['ordered_kept_kib']
+
+
+def test_the_mapper_lists_what_the_code_before_it_did(tmp_path):
+    from bench import legacy
+    from bench.listing import kodi_environment
+    from bench.routes import PLUGIN
+    from resources.lib.kodihelper import KodiHelper
+    from resources.lib.products import ProductMapper
+
+    with kodi_environment(str(tmp_path / 'profile')):
+        helper = KodiHelper(PLUGIN + '/list_products', 1)
+        calls = []
+        helper.add_item = lambda *args, **kwargs: calls.append((args, kwargs))
+        legacy.bind(helper)
+        mapper = ProductMapper(helper.vp, helper.language, helper.get_country_code(),
+                               helper.get_setting('previous_channels'))
+        products = fixtures.all_products(70)
+        for product in products:
+            legacy.ADD_FUNCTIONS[product['type']](product)
+        before, calls[:] = calls[:], []
+        for product in products:
+            legacy.add_product(mapper.map(product))
+
+    def normalized(call):
+        (title, url), kwargs = call[0][:2], dict(call[1])
+        kwargs.pop('folder', None)
+        return title, url, dict((k, v) for k, v in kwargs.items() if v)
+
+    assert set(x['type'] for x in products) == set(legacy.ADD_FUNCTIONS)
+    assert [normalized(x) for x in calls] == [normalized(x) for x in before]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import os
+
+from resources.lib.cache import ResponseCache
+
+URL = 'https://content.viaplay.se/xdk-se/serier/samtliga'
+
+
+def folder_size(folder):
+    return sum(os.path.getsize(os.path.join(folder, x)) for x in os.listdir(folder))
+
+
+def test_put_and_get(tmp_path):
+    cache = ResponseCache(str(tmp_path), {'products': 60}, max_size=1024 * 1024)
+    cache.put(URL, {'profileId': 'p1'}, b'{"type": "list"}', 'products', {'ETag': '"v1"'})
+
+    entry = cache.get(URL, {'profileId': 'p1'})
+    assert entry['body'] == b'{"type": "list"}'
+    assert entry['etag'] == '"v1"'
+    assert cache.is_fresh(entry)
+    assert cache.get(URL, {'profileId': 'p2'}) is None
+
+
+def test_running_size_matches_folder(tmp_path):
+    cache = ResponseCache(str(tmp_path), {'products': 60}, max_size=1024 * 1024)
+    for number in range(20):
+        cache.put('%s?page=%s' % (URL, number), None, b'x' * 100, 'products')
+    cache.put('%s?page=3' % URL, None, b'x' * 500, 'products')  # replaces an entry
+    cache.discard('%s?page=4' % URL)
+
+    assert cache.size == folder_size(str(tmp_path))
+
+
+def test_put_does_not_scan_the_folder_every_time(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), {'products': 60}, max_size=50000)
+    scans = []
+    listdir = os.listdir
+    monkeypatch.setattr(os, 'listdir', lambda path: scans.append(path) or listdir(path))
+
+    for number in range(500):
+        cache.put('%s?page=%s' % (URL, number), None, b'x' * 400, 'products')
+
+    monkeypatch.setattr(os, 'listdir', listdir)
+    assert len(scans) < 50
+    assert folder_size(str(tmp_path)) <= cache.max_size
+    assert cache.size == folder_size(str(tmp_path))
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), {'products': 60}, max_size=3000)
+    for number in range(5):
+        cache.put('%s?page=%s' % (URL, number), None, b'x' * 400, 'products')
+        os.utime(cache._paths(cache.key_for('%s?page=%s' % (URL, number)))[0], (number, number))
+    cache.put('%s?page=5' % URL, None, b'x' * 400, 'products')
+
+    assert cache.get('%s?page=0' % URL) is None
+    assert cache.get('%s?page=5' % URL) is not None
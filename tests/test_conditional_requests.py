@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Revalidation of cached responses with ETag / Last-Modified"""
+
+import json
+
+URL = 'https://content.viaplay.se/xdk-se/serier/samtliga'
+BODY = {'type': 'vod-list', '_embedded': {'viaplay:products': []}, '_links': {}}
+VALIDATORS = {'ETag': '"v1"', 'Last-Modified': 'Sat, 17 Oct 2026 10:00:00 GMT'}
+
+
+def expire(vp, url, expires=0):
+    """Make the cache entry of url stale: expired at expires, 0 is too long ago to be served stale."""
+    entry = vp.cache.get(url)
+    meta_path, _ = vp.cache._paths(vp.cache.key_for(url))
+    meta = dict((k, v) for k, v in entry.items() if k != 'body')
+    meta['expires'] = expires
+    vp.cache._write(meta_path, json.dumps(meta).encode('utf-8'))
+
+
+def test_200_stores_validators(vp, stub):
+    stub.add(URL, BODY, headers=VALIDATORS)
+
+    assert vp.make_request(URL, 'get') == BODY
+
+    entry = vp.cache.get(URL)
+    assert entry['etag'] == '"v1"'
+    assert entry['last_modified'] == 'Sat, 17 Oct 2026 10:00:00 GMT'
+    assert json.loads(entry['body'].decode('utf-8')) == BODY
+
+
+def test_fresh_entry_is_served_without_request(vp, stub):
+    stub.add(URL, BODY, headers=VALIDATORS)
+    vp.make_request(URL, 'get')
+    stub.reset_counters()
+
+    assert vp.make_request(URL, 'get') == BODY
+    assert stub.requests == []
+
+
+def test_stale_entry_sends_validators_and_304_refreshes_it(vp, stub):
+    stub.add(URL, BODY, headers=VALIDATORS)
+    vp.make_request(URL, 'get')
+    expire(vp, URL)
+    stub.reset_counters()
+
+    assert vp.make_request(URL, 'get') == BODY
+
+    (_, _, headers), = stub.requests
+    assert headers['If-None-Match'] == '"v1"'
+    assert headers['If-Modified-Since'] == 'Sat, 17 Oct 2026 10:00:00 GMT'
+    assert stub.bytes_sent == 0  # 304 without body
+    entry = vp.cache.get(URL)
+    assert vp.cache.is_fresh(entry)
+    assert json.loads(entry['body'].decode('utf-8')) == BODY
+
+
+def test_changed_content_replaces_entry(vp, stub):
+    stub.add(URL, BODY, headers=VALIDATORS)
+    vp.make_request(URL, 'get')
+    expire(vp, URL)
+    changed = dict(BODY, title='changed')
+    stub.add(URL, changed, headers={'ETag': '"v2"'})
+
+    assert vp.make_request(URL, 'get') == changed
+    assert vp.cache.get(URL)['etag'] == '"v2"'
+
+
+def test_uncacheable_hosts_always_hit_the_network(vp, stub):
+    url = 'https://login.viaplay.se/api/persistentLogin/v1'
+    stub.add(url, {'success': True, 'userData': {}}, headers=VALIDATORS)
+    vp.make_request(url, 'get')
+    vp.make_request(url, 'get')
+
+    assert len(stub.requests) == 2
+    assert 'If-None-Match' not in stub.requests[1][2]
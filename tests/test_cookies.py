@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""The cookie jar is written once per change, atomically, and never for unchanged cookies"""
+
+import os
+
+import pytest
+from requests.cookies import create_cookie
+
+URL = 'https://login.viaplay.se/api/persistentLogin/v1'
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """Record the files os.replace() moves into place."""
+    replaced = []
+    replace = os.replace
+
+    def counting_replace(source, target):
+        replaced.append((source, target))
+        return replace(source, target)
+
+    monkeypatch.setattr(os, 'replace', counting_replace)
+    return replaced
+
+
+def cookie_writes(vp, writes):
+    return [x for x in writes if x[1] == vp.cookie_jar.filename]
+
+
+def respond_with_cookie(vp, stub, value):
+    stub.add(URL, {'success': True}, headers={'Set-Cookie': 'session=%s; Domain=.viaplay.se; Path=/; '
+                                                            'Expires=Wed, 01 Jan 2031 00:00:00 GMT' % value})
+    vp.make_request(URL, 'get')
+    return vp.save_cookies()
+
+
+def test_new_cookie_is_written_once_atomically(vp, stub, writes):
+    respond_with_cookie(vp, stub, 'one')
+
+    (source, target), = cookie_writes(vp, writes)
+    assert source.endswith('.tmp')
+    assert not os.path.exists(source)
+    with open(target) as cookie_file:
+        assert 'session=one;' in cookie_file.read()
+
+
+def test_unchanged_cookie_is_not_written(vp, stub, writes):
+    respond_with_cookie(vp, stub, 'one')
+    respond_with_cookie(vp, stub, 'one')
+    respond_with_cookie(vp, stub, 'one')
+
+    assert len(cookie_writes(vp, writes)) == 1
+
+
+def test_changed_cookie_is_written_once(vp, stub, writes):
+    respond_with_cookie(vp, stub, 'one')
+    respond_with_cookie(vp, stub, 'two')
+
+    assert len(cookie_writes(vp, writes)) == 2
+    vp.save_cookies()
+    assert len(cookie_writes(vp, writes)) == 2
+
+
+def test_load_does_not_mark_the_jar_dirty(vp, stub, writes):
+    respond_with_cookie(vp, stub, 'one')
+    vp.cookie_jar.load(ignore_discard=True, ignore_expires=True)
+
+    assert not vp.cookie_jar.dirty
+    vp.save_cookies()
+    assert len(cookie_writes(vp, writes)) == 1
+
+
+def other_process(vp):
+    """Return a second Viaplay instance on the same profile, like the service."""
+    from resources.lib.viaplay import Viaplay
+    other = Viaplay(vp.settings_folder, 'se', settings=vp.settings)
+    other.reload_cookies()
+    return other
+
+
+def bump_mtime(path):
+    mtime = os.path.getmtime(path) + 10
+    os.utime(path, (mtime, mtime))
+
+
+def cookie_names(vp):
+    return sorted(x.name for x in vp.cookie_jar)
+
+
+def test_reload_replaces_the_cookies_in_memory(vp):
+    vp.cookie_jar.set_cookie(create_cookie('first', '1', domain='.viaplay.se'))
+    vp.save_cookies()
+    other = other_process(vp)
+    assert cookie_names(other) == ['first']
+
+    vp.cookie_jar.clear()
+    vp.cookie_jar.set_cookie(create_cookie('second', '2', domain='.viaplay.se'))
+    vp.save_cookies()
+    bump_mtime(vp.cookie_jar.filename)
+    other.reload_cookies()
+
+    assert cookie_names(other) == ['second']
+    assert not other.cookie_jar.dirty
+
+
+def test_removed_cookie_file_empties_the_jar(vp):
+    vp.cookie_jar.set_cookie(create_cookie('first', '1', domain='.viaplay.se'))
+    vp.save_cookies()
+    other = other_process(vp)
+
+    os.remove(vp.cookie_jar.filename)
+    other.reload_cookies()
+
+    assert cookie_names(other) == []
+    other.save_cookies()
+    assert not os.path.exists(vp.cookie_jar.filename)
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""Refreshing the EPG store from the per channel epg endpoint"""
+
+from datetime import datetime
+
+from bench import fixtures
+from resources.lib.logger import DEBUG
+
+
+def test_only_the_stored_channel_days_are_counted(vp, stub):
+    today = datetime.now().date()
+    stub.add(vp.get_epg_url('tv3', today), fixtures.epg_page('tv3', today, 24))
+    stub.add(vp.get_epg_url('tv6', today), '<html>Service Unavailable</html>', headers={'Content-Type': 'text/html'})
+    lines = []
+    vp.logger.level = DEBUG
+    vp.logger.sink = lambda message, level: lines.append(message)
+
+    vp.refresh_epg(['tv3', 'tv6'], days=1)
+
+    assert '[Viaplay]: EPG: refreshed 1 of 2 missing channel days, 2 in total' in lines
+    assert any('unexpected response for tv6' in x for x in lines)
+    # the day that failed is downloaded again next time, the stored one isn't
+    assert vp.epg_store.missing(['tv3', 'tv6'], [today.strftime('%Y-%m-%d')]) == [('tv6', today.strftime('%Y-%m-%d'))]
+    assert len(vp.get_programmes('tv3')) > 0
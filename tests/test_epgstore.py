@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""The SQLite programme guide: what to download, upserts, pruning and lookups"""
+
+import time
+
+import pytest
+
+from resources.lib.epgstore import EpgStore
+
+HOUR = 3600
+# 2026-10-17 00:00 UTC
+MIDNIGHT = 1792195200
+
+
+def programme(start, hours=1, title=None):
+    stop = start + hours * HOUR
+    guid = 'p-%s' % start
+    return start, stop, guid, {'system': {'guid': guid}, 'content': {'title': title or guid}}
+
+
+def titles(products):
+    return [x['content']['title'] for x in products]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [MIDNIGHT + 12 * HOUR]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    epg_store = EpgStore(str(tmp_path / 'epg.db'), max_age=6 * HOUR)
+    yield epg_store
+    epg_store.close()
+
+
+def test_missing_lists_the_days_never_fetched_or_stale(store, clock):
+    days = ['2026-10-17', '2026-10-18']
+    assert store.missing(['tv3', 'tv6'], days) == [('tv3', '2026-10-17'), ('tv3', '2026-10-18'),
+                                                   ('tv6', '2026-10-17'), ('tv6', '2026-10-18')]
+
+    store.store('tv3', '2026-10-17', [programme(MIDNIGHT)])
+    store.store('tv6', '2026-10-17', [])
+    clock[0] += 3 * HOUR
+    store.store('tv3', '2026-10-18', [programme(MIDNIGHT + 24 * HOUR)])
+    assert store.missing(['tv3', 'tv6'], days) == [('tv6', '2026-10-18')]
+
+    # the first two are older than max_age now, the last one isn't
+    clock[0] += 4 * HOUR
+    assert store.missing(['tv3', 'tv6'], days) == [('tv3', '2026-10-17'), ('tv6', '2026-10-17'),
+                                                   ('tv6', '2026-10-18')]
+
+
+def test_store_replaces_programmes_on_channel_and_start(store):
+    store.store('tv3', '2026-10-17', [programme(MIDNIGHT + x * HOUR) for x in range(4)])
+    store.store('tv6', '2026-10-17', [programme(MIDNIGHT)])
+
+    # the schedule changed: a new title at 01:00 and a two hour programme at 02:00 replacing 02:00 and 03:00
+    store.store('tv3', '2026-10-17', [programme(MIDNIGHT + HOUR, title='new'), programme(MIDNIGHT + 2 * HOUR, 2)])
+
+    assert titles(store.programmes('tv3', MIDNIGHT, MIDNIGHT + 24 * HOUR)) == \
+        ['p-%s' % MIDNIGHT, 'new', 'p-%s' % (MIDNIGHT + 2 * HOUR)]
+    assert titles(store.programmes('tv6', MIDNIGHT, MIDNIGHT + 24 * HOUR)) == ['p-%s' % MIDNIGHT]
+    assert store.db.execute('SELECT COUNT(*) FROM programmes').fetchone()[0] == 4
+
+
+def test_prune_forgets_past_programmes_and_days(store):
+    store.store('tv3', '2026-10-16', [programme(MIDNIGHT - 2 * HOUR), programme(MIDNIGHT - HOUR, 2)])
+    store.store('tv3', '2026-10-17', [programme(MIDNIGHT + HOUR)])
+
+    store.prune(MIDNIGHT, '2026-10-17')
+
+    # the programme running across midnight is kept until it has ended
+    assert titles(store.programmes('tv3', 0, MIDNIGHT + 24 * HOUR)) == \
+        ['p-%s' % (MIDNIGHT - HOUR), 'p-%s' % (MIDNIGHT + HOUR)]
+    assert store.missing(['tv3'], ['2026-10-16', '2026-10-17']) == [('tv3', '2026-10-16')]
+
+
+def test_now_playing_at_the_boundaries(store):
+    store.store('tv3', '2026-10-17', [programme(MIDNIGHT), programme(MIDNIGHT + HOUR), programme(MIDNIGHT + 3 * HOUR)])
+
+    assert store.now_playing('tv3', MIDNIGHT - 1) is None
+    assert titles([store.now_playing('tv3', MIDNIGHT)]) == ['p-%s' % MIDNIGHT]
+    assert titles([store.now_playing('tv3', MIDNIGHT + HOUR - 1)]) == ['p-%s' % MIDNIGHT]
+    # a programme's stop is the next one's start, which is on air then
+    assert titles([store.now_playing('tv3', MIDNIGHT + HOUR)]) == ['p-%s' % (MIDNIGHT + HOUR)]
+    # nothing in the gap between 02:00 and 03:00
+    assert store.now_playing('tv3', MIDNIGHT + 2 * HOUR) is None
+    assert store.now_playing('tv6', MIDNIGHT) is None
+
+
+def test_now_playing_defaults_to_the_current_time(store, clock):
+    store.store('tv3', '2026-10-17', [programme(MIDNIGHT + 12 * HOUR)])
+
+    assert titles([store.now_playing('tv3')]) == ['p-%s' % (MIDNIGHT + 12 * HOUR)]
+    clock[0] += HOUR
+    assert store.now_playing('tv3') is None
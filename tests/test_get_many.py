@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Concurrent GETs: results in order and a deadline for the slow ones"""
+
+import time
+
+import pytest
+import requests
+
+FAST = 'https://content.viaplay.se/xdk-se/serier/samtliga'
+SLOW = 'https://content.viaplay.se/xdk-se/film/samtliga'
+BODY = {'type': 'vod-list', '_embedded': {'viaplay:products': []}, '_links': {}}
+
+
+@pytest.fixture
+def slow_endpoint(stub):
+    """FAST answers at once, SLOW after a second."""
+    stub.latency = 'recorded'
+    stub.add(FAST, dict(BODY, title='fast'))
+    stub.add(SLOW, dict(BODY, title='slow'), elapsed_ms=1000)
+    return stub
+
+
+def test_results_are_in_the_order_of_the_urls(vp, slow_endpoint):
+    # the slow one is asked first and finishes last
+    slow, fast = vp.get_many([SLOW, FAST])
+
+    assert fast['title'] == 'fast'
+    assert slow['title'] == 'slow'
+
+
+def test_requests_missing_the_deadline_time_out(vp, slow_endpoint):
+    started = time.time()
+    fast, slow = vp.get_many([FAST, SLOW], return_exceptions=True, timeout=0.3)
+
+    # the slow request is left behind, not waited for
+    assert time.time() - started < 1
+    assert fast['title'] == 'fast'
+    assert isinstance(slow, requests.exceptions.Timeout)
+
+
+def test_a_missed_deadline_raises_without_return_exceptions(vp, slow_endpoint):
+    with pytest.raises(requests.exceptions.Timeout):
+        vp.get_many([FAST, SLOW], timeout=0.3)
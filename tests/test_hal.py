@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Indexing of Viaplay HAL responses"""
+
+import json
+import os
+
+from resources.lib.hal import Page, project
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'hal')
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name + '.json')) as fixture_file:
+        return json.load(fixture_file)
+
+
+def guids(products):
+    return [x['system']['guid'] for x in products]
+
+
+def test_page_indexes_blocks_and_products():
+    page = Page(fixture('page'))
+
+    assert page.type == 'page'
+    assert [x['type'] for x in page.blocks] == ['dynamic', 'list-featurebox', 'list']
+    assert [x['type'] for x in page.collections] == ['list-featurebox', 'list']
+    assert page.get_blocks('list') == [page.blocks[2]]
+    assert page.get_blocks('season-list') == []
+    assert guids(page.products) == ['hero-1', 'series-1', 'movie-1', 'series-2']
+    assert guids(page.get_products('series')) == ['hero-1', 'series-1', 'series-2']
+    assert page.get_product('movie-1')['type'] == 'movie'
+    assert page.get_product('missing') is None
+    assert page.get_link('viaplay:sections')[0]['title'] == 'Alla'
+
+
+def test_page_pages_through_its_first_list_block():
+    page = Page(fixture('page'))
+
+    assert page.paging_block is page.blocks[1]
+    assert page.next_page == 'https://content.viaplay.se/xdk-se/serier/samtliga?pageNumber=2'
+
+
+def test_page_without_list_block_pages_through_itself():
+    data = fixture('page')
+    data['_embedded']['viaplay:blocks'] = data['_embedded']['viaplay:blocks'][:1]
+    page = Page(data)
+
+    assert page.paging_block is data
+    assert page.next_page is False
+
+
+def test_product_page():
+    page = Page(fixture('product'))
+
+    assert guids(page.products) == ['movie-1']
+    assert page.get_product('movie-1') is page.data['_embedded']['viaplay:product']
+    assert guids(page.block_products) == ['related-1']
+    assert page.paging_block is page.products[0]
+    assert page.next_page is False
+
+
+def test_tv_channel_drops_nobroadcast():
+    page = Page(fixture('tvchannel'))
+
+    assert guids(page.products) == ['programme-1', 'programme-2']
+    assert page.get_product('nobroadcast-1') is None
+    assert page.next_page is False
+
+
+def test_list_page():
+    page = Page(fixture('list'))
+
+    assert guids(page.products) == ['series-1', 'series-2']
+    assert page.blocks == []
+    assert page.paging_block is page.data
+    assert page.next_page == 'https://content.viaplay.se/xdk-se/serier/samtliga?pageNumber=2'
+
+
+def test_last_list_page_has_no_next_page():
+    data = fixture('list')
+    del data['_links']['next']
+
+    assert Page(data).next_page is False
+
+
+def test_paging_block_without_links_has_no_next_page():
+    data = fixture('list')
+    del data['_links']
+
+    assert Page(data).next_page is False
+
+
+def test_channels():
+    page = Page(fixture('channels'))
+
+    assert [x['system']['channelGuid'] for x in page.channels] == ['tv3', 'tv6']
+    assert page.next_page is False
+
+
+def test_channels_come_from_the_tv_channels_block():
+    data = fixture('channels')
+    data['_embedded']['viaplay:blocks'].insert(0, {'type': 'dynamic', '_embedded': {'viaplay:blocks': [{}]}})
+
+    assert [x['system']['channelGuid'] for x in Page(data).channels] == ['tv3', 'tv6']
+
+
+def test_list_page_of_collections_only_needs_no_products():
+    data = fixture('page')
+    data['type'] = 'section-list'
+    page = Page(data)
+
+    assert [x['type'] for x in page.collections] == ['list-featurebox', 'list']
+    assert page.next_page is False
+
+
+def test_of_does_not_index_twice():
+    page = Page(fixture('list'))
+
+    assert Page.of(page) is page
+    assert Page.of(fixture('list')).products == page.products
+
+
+def test_project():
+    product = fixture('tvchannel')['_embedded']['viaplay:products'][0]
+    product['content'] = {'title': 'News', 'images': {'landscape': {'url': 'x'}, 'boxart': {'url': 'y'}}}
+
+    assert project(product, {'system': {'guid': True}, 'content': {'images': {'landscape': True}}}) == {
+        'system': {'guid': 'programme-1'},
+        'content': {'images': {'landscape': {'url': 'x'}}}
+    }
+    assert project([product], {'*': True, 'content': False}) == [{'type': 'episode', 'system': product['system']}]
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Streaming the IPTV Manager JSON to its socket"""
+
+import hashlib
+import json
+import tracemalloc
+
+from resources.lib.iptvmanager import IPTVManager, StreamedArray, StreamedObject
+from tests.listener import Listener
+
+send_to_socket = IPTVManager.via_socket
+
+
+def send(payload, listener):
+    """Send payload the way IPTVManager.send_channels/send_epg do."""
+    sender = type('Sender', (object,), {'port': listener.port, 'send': send_to_socket(lambda self: payload)})
+    sender().send()
+    return listener.join()
+
+
+def channel(number):
+    return {
+        'id': 'channel-%s' % number,
+        'name': u'Kanal %s – ÅÄÖ' % number,
+        'preset': number,
+        'logo': None,
+        'stream': 'plugin://plugin.video.viaplay/play?guid=channel-%s&url=None&tve=true' % number,
+    }
+
+
+def programme(number):
+    return {
+        'start': '2026-10-17T%02d:00:00Z' % (number % 24),
+        'stop': '2026-10-17T%02d:59:00Z' % (number % 24),
+        'title': u'Programme "%s"\n' % number,
+        'description': u'Descrição %s' % number * 3,
+        'image': '',
+        'rating': number / 10.0,
+        'live': number % 2 == 0,
+    }
+
+
+def test_streamed_channels_match_json_dumps():
+    channels = [channel(x) for x in range(50)]
+
+    received = send(dict(version=1, streams=StreamedArray(iter(channels))), Listener())
+
+    assert received == json.dumps(dict(version=1, streams=channels)).encode()
+
+
+def test_streamed_epg_matches_json_dumps():
+    epg = [('channel-%s' % x, [programme(x * 10 + y) for y in range(10)]) for x in range(20)]
+    epg.append(('empty', []))
+
+    received = send(dict(version=1, epg=StreamedObject(iter(epg))), Listener())
+
+    assert received == json.dumps(dict(version=1, epg=dict(epg))).encode()
+
+
+def test_empty_payload_matches_json_dumps():
+    received = send(dict(version=1, streams=StreamedArray(iter([]))), Listener())
+
+    assert received == json.dumps(dict(version=1, streams=[])).encode()
+
+
+def test_peak_memory_is_bounded_by_one_channel():
+    count = 2000
+    programmes_per_channel = 20
+
+    def epgs():
+        for x in range(count):
+            yield 'channel-%s' % x, [programme(x + y) for y in range(programmes_per_channel)]
+
+    listener = Listener(keep=False)
+    tracemalloc.start()
+    try:
+        send(dict(version=1, epg=StreamedObject(epgs())), listener)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    expected = json.dumps(dict(version=1, epg=dict(epgs()))).encode()
+    assert listener.size == len(expected)
+    assert listener.sha1.hexdigest() == hashlib.sha1(expected).hexdigest()
+    # the whole document is several MB, streaming holds little more than a channel and the socket buffers
+    assert len(expected) > 5 * 1024 * 1024
+    assert peak < len(expected) // 10
+
+
+class LineupHelper(object):
+    """The KodiHelper of IPTVManager for a lineup, with the programmes of the EPG store."""
+
+    def __init__(self, channels, stored, days):
+        lineup = type('Lineup', (object,), {'channels': channels})
+        self.vp = type('Viaplay', (object,), {
+            'get_channel_lineup': lambda vp, url: lineup,
+            'get_int_setting': lambda vp, name, default=None: days,
+            'refresh_epg': lambda vp, guids, days, timeout: None,
+            'get_programmes': lambda vp, guid, days: stored.get(guid, [])
+        })()
+
+    def authorize(self):
+        return True
+
+    def generate_channel_url(self):
+        return 'https://content.viaplay.se/xdk-se/kanaler'
+
+
+def shared_guid_epg(stored, days):
+    """Return the EPG sent for two lineup channels sharing the guid tv3, e.g. an HD and an SD variant."""
+    from resources.lib.lineup import Channel
+
+    def tv_event(number):
+        return {'system': {'guid': 'tv3-%s' % number},
+                'epg': {'startTime': '2026-10-17T%02d:00:00Z' % number, 'endTime': '2026-10-17T%02d:59:00Z' % number},
+                'content': {'title': 'Programme %s' % number}}
+
+    embedded = [tv_event(x) for x in range(2)]
+    channels = [Channel('tv3', name, 3, None, None, 'tv3', None, list(embedded)) for name in ('TV3', 'TV3 HD')]
+    listener = Listener()
+    manager = IPTVManager(listener.port)
+    manager.helper = LineupHelper(channels, dict((k, [tv_event(x) for x in v]) for k, v in stored.items()), days)
+    manager.send_epg()
+    return json.loads(listener.join().decode())['epg']
+
+
+def test_channels_sharing_a_guid_send_their_programmes_once(kodi):
+    assert [x['title'] for x in shared_guid_epg({'tv3': range(5)}, days=1)['tv3']] == \
+        ['Programme %s' % x for x in range(5)]
+
+
+def test_embedded_programmes_of_channels_sharing_a_guid_are_sent_once(kodi):
+    assert [x['title'] for x in shared_guid_epg({}, days=0)['tv3']] == ['Programme 0', 'Programme 1']
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""Directory listings committed by KodiHelper.eod()"""
+
+import xbmcplugin
+
+from resources.lib.kodihelper import KodiHelper
+
+
+def test_a_listing_sets_content_and_sort_methods_once(kodi):
+    helper = KodiHelper('plugin://plugin.video.viaplay/', 1)
+    for number in range(50):
+        helper.add_item('Episode %s' % number, 'plugin://plugin.video.viaplay/play?guid=%s' % number,
+                        playable=True, content='episodes', episode=True)
+    helper.eod()
+
+    assert kodi.plugin_calls == {'setContent': 1, 'addSortMethod': 1, 'addDirectoryItems': 1, 'endOfDirectory': 1}
+    assert len(kodi.directory) == 50
+
+
+def test_the_next_listing_starts_afresh(kodi, monkeypatch):
+    contents = []
+    monkeypatch.setattr(xbmcplugin, 'setContent', lambda handle, content: contents.append(content))
+    helper = KodiHelper('plugin://plugin.video.viaplay/', 1)
+    helper.add_item('Episode', 'plugin://plugin.video.viaplay/play?guid=1', content='episodes', episode=True)
+    helper.eod()
+    helper.add_item('Channels', 'plugin://plugin.video.viaplay/channels')
+    helper.eod()
+
+    assert contents == ['episodes']
+    assert kodi.plugin_calls['addSortMethod'] == 1
+    assert kodi.plugin_calls['addDirectoryItems'] == 2
+    assert len(kodi.directory) == 2
+    assert (helper.items, helper.content, helper.sort_methods) == ([], None, [])
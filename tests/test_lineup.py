@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""The channel lineup snapshot shared by the channel consumers"""
+
+import json
+import os
+
+from resources.lib.settings import Settings
+from resources.lib.viaplay import Viaplay
+from tests.stubserver import route_to
+
+URL = 'https://content.viaplay.se/xdk-se/kanaler'
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'hal', 'channels.json')
+
+
+def serve_channels(stub):
+    with open(FIXTURE) as fixture_file:
+        stub.add(URL, json.load(fixture_file))
+
+
+def lineup_files(kodi):
+    return sorted(x for x in os.listdir(kodi.profile) if x.startswith('lineup-'))
+
+
+def other_invocation(kodi, stub):
+    viaplay = Viaplay(kodi.profile, 'se', settings=Settings())
+    route_to(viaplay, stub)
+    return viaplay
+
+
+def test_lineup_is_downloaded_once(kodi, vp, stub):
+    serve_channels(stub)
+
+    lineup = vp.get_channel_lineup(URL)
+    assert [x.guid for x in lineup.channels] == ['tv3', 'tv6']
+    assert vp.get_channel_lineup(URL) is lineup
+    assert [x.name for x in other_invocation(kodi, stub).get_channel_lineup(URL).channels] == ['TV3', 'TV6']
+    assert len(stub.requests) == 1
+    assert len(lineup_files(kodi)) == 1
+
+
+def test_lineup_is_kept_per_profile(kodi, vp, stub):
+    serve_channels(stub)
+    vp.get_channel_lineup(URL)
+
+    vp.settings.set('profile_id', 'other-profile')
+    vp.get_channel_lineup(URL)
+
+    assert len(stub.requests) == 2
+    assert 'profileId=other-profile' in stub.requests[1][1]
+    assert len(lineup_files(kodi)) == 2
+
+
+def test_lineup_is_not_kept_without_cache(kodi, stub):
+    kodi.settings['cache_enabled'] = 'false'
+    serve_channels(stub)
+    viaplay = other_invocation(kodi, stub)
+
+    viaplay.get_channel_lineup(URL)
+    viaplay.get_channel_lineup(URL)
+
+    assert len(stub.requests) == 2
+    assert viaplay.lineups == {}
+    assert lineup_files(kodi) == []
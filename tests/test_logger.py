@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Leveled logging, redaction and the ring buffer of recent requests"""
+
+import json
+
+import xbmc
+
+from resources.lib.logger import DEBUG, ERROR, INFO, Logger, redact
+
+
+def collecting_logger(**kwargs):
+    lines = []
+    logger = Logger('[Test]', sink=lambda message, level: lines.append((level, message)), **kwargs)
+    return logger, lines
+
+
+def test_credentials_are_redacted_in_every_notation():
+    assert redact(json.dumps({'accessToken': 'secret', 'title': 'Movie'})) == \
+        '{"accessToken": "***", "title": "Movie"}'
+    assert redact(str({'deviceToken': 'secret'})) == "{'deviceToken': '***'}"
+    assert redact('https://login.viaplay.se/api/device/code?userCode=ABC123&deviceKey=xdk-se') == \
+        'https://login.viaplay.se/api/device/code?userCode=***&deviceKey=xdk-se'
+    assert redact('Authorization: Bearer-secret') == 'Authorization: ***'
+    assert redact('pgPin=1234; title=Movie') == 'pgPin=***; title=Movie'
+    assert redact('nothing to hide') == 'nothing to hide'
+
+
+def test_a_credential_across_the_body_limit_is_still_redacted():
+    logger, _ = collecting_logger(body_limit=20)
+    body = json.dumps({'padding': 'x' * 5, 'accessToken': 'secret-secret-secret'})
+
+    truncated = logger.truncate(body.encode('utf-8'))
+    assert 'secret' not in truncated
+    assert truncated.endswith('... (%s bytes)' % len(body))
+
+
+def test_messages_below_the_level_are_not_formatted():
+    logger, lines = collecting_logger(level=INFO)
+
+    class Unformattable(object):
+        def __str__(self):
+            raise AssertionError('formatted a debug message')
+
+    logger.debug('%s', Unformattable())
+    logger.info('%s requests', 3)
+    assert lines == [(INFO, '[Test]: 3 requests')]
+
+
+def test_the_ring_buffer_keeps_the_last_requests_at_any_level():
+    logger, lines = collecting_logger(level=ERROR, history=3, body_limit=10)
+    for number in range(5):
+        logger.record('get', 'https://content.viaplay.se/%s' % number, 200, b'{"accessToken": "secret"}', 0.1)
+    assert lines == []
+
+    logger.dump()
+    assert lines[0] == (ERROR, '[Test]: Last 3 requests:')
+    assert [x[1].split()[3] for x in lines[1:]] == ['https://content.viaplay.se/%s' % x for x in (2, 3, 4)]
+    assert all('secret' not in x[1] for x in lines)
+
+
+def test_messages_go_to_kodi_log_at_their_level(monkeypatch):
+    logged = []
+    monkeypatch.setattr(xbmc, 'log', lambda message, level: logged.append((level, message)))
+    logger = Logger('[Test]', level=DEBUG)
+
+    logger.debug('debug')
+    logger.info('info')
+    logger.warning('warning')
+    logger.error('error')
+    assert logged == [(xbmc.LOGDEBUG, '[Test]: debug'), (xbmc.LOGINFO, '[Test]: info'),
+                      (xbmc.LOGWARNING, '[Test]: warning'), (xbmc.LOGERROR, '[Test]: error')]
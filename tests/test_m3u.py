@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""The M3U export: change detection, PVR reload and the headless export"""
+
+import importlib
+import json
+import os
+import sys
+
+import pytest
+import xbmc
+import xbmcvfs
+
+from resources.lib import m3u
+from tests.test_lineup import URL, serve_channels
+
+
+class LocalFile(object):
+    """xbmcvfs.File on the local file system, counting the files opened."""
+    opened = []
+
+    def __init__(self, path, mode='r'):
+        LocalFile.opened.append(path)
+        self.file = open(path, mode)
+
+    def write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+
+@pytest.fixture
+def local_vfs(monkeypatch):
+    LocalFile.opened = []
+    monkeypatch.setattr(xbmcvfs, 'File', LocalFile)
+    monkeypatch.setattr(xbmcvfs, 'exists', os.path.exists)
+    monkeypatch.setattr(xbmcvfs, 'delete', os.remove)
+    monkeypatch.setattr(xbmcvfs, 'rename', os.rename)
+    return LocalFile
+
+
+@pytest.fixture
+def pvr(monkeypatch):
+    """A PVR client answering JSON-RPC, enabled, with the calls it got."""
+    client = {'enabled': True, 'calls': []}
+
+    def execute(request):
+        request = json.loads(request)
+        client['calls'].append((request['method'], request['params'].get('enabled')))
+        if request['method'] == 'Addons.GetAddonDetails':
+            return json.dumps({'result': {'addon': {'addonid': m3u.PVR_CLIENT, 'enabled': client['enabled']}}})
+        return json.dumps({'result': 'OK'})
+
+    monkeypatch.setattr(xbmc, 'executeJSONRPC', execute)
+    return client
+
+
+def test_an_unchanged_lineup_opens_no_file(vp, stub, tmp_path, local_vfs, pvr):
+    serve_channels(stub)
+    target = str(tmp_path / 'viaplay.m3u')
+
+    assert m3u.export(vp, URL, target, 'se') is True
+    with open(target) as playlist:
+        assert playlist.read() == ''.join(m3u.playlist_entries(vp.get_channel_lineup(URL).channels, 'se'))
+    assert local_vfs.opened == [target + '.tmp']
+
+    assert m3u.export(vp, URL, target, 'se') is False
+    assert local_vfs.opened == [target + '.tmp']
+    assert not os.path.exists(target + '.tmp')
+
+
+def test_the_pvr_client_is_reloaded_when_the_playlist_changed(vp, stub, tmp_path, local_vfs, pvr):
+    serve_channels(stub)
+    target = str(tmp_path / 'viaplay.m3u')
+
+    m3u.export(vp, URL, target, 'se')
+    assert pvr['calls'] == [('Addons.GetAddonDetails', None), ('Addons.SetAddonEnabled', False),
+                            ('Addons.SetAddonEnabled', True)]
+
+    pvr['calls'] = []
+    m3u.export(vp, URL, target, 'se')
+    assert pvr['calls'] == []
+
+
+def test_a_disabled_pvr_client_is_left_alone(pvr):
+    pvr['enabled'] = False
+
+    assert m3u.reload_pvr() is False
+    assert pvr['calls'] == [('Addons.GetAddonDetails', None)]
+
+
+def test_a_headless_export_never_asks_to_log_in(kodi, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['plugin://plugin.video.viaplay/', '-1', '?action=BUILD_M3U&headless=true'])
+    sys.modules.pop('resources.lib.addon', None)
+    addon = importlib.import_module('resources.lib.addon')
+    vp = addon.helper.vp
+    logged = []
+
+    def validate_session(*args, **kwargs):
+        raise vp.ViaplayError('PersistentLoginError')
+
+    def authorize():
+        raise AssertionError('a headless export asked to log in')
+
+    monkeypatch.setattr(vp, 'validate_session', validate_session)
+    monkeypatch.setattr(addon.helper, 'authorize', authorize)
+    monkeypatch.setattr(addon.helper, 'log', logged.append)
+    monkeypatch.setattr(addon.plugin, 'run', lambda *args: pytest.fail('a headless export ran a route'))
+
+    addon.run()
+    assert logged == ['Not logged in, M3U export skipped: PersistentLoginError']
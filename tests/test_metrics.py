@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Per-invocation metrics: one JSON line per invocation and the rotation of the file"""
+
+import json
+import os
+
+from resources.lib.metrics import Metrics
+
+
+def read_lines(path):
+    with open(path) as metrics_file:
+        return [json.loads(x) for x in metrics_file]
+
+
+def test_every_invocation_appends_one_json_line(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    metrics = Metrics()
+
+    metrics.add_request(1000, 0.25, 0.1)
+    metrics.add_request(500, 0.25)
+    metrics.count('cache_hits')
+    metrics.add_time('decode', 0.05)
+    metrics.write(path, '/list_products')
+    metrics.reset()
+    metrics.count('cache_hits', 3)
+    metrics.write(path, '/')
+
+    first, second = read_lines(path)
+    assert first['route'] == '/list_products'
+    assert (first['requests'], first['bytes'], first['cache_hits']) == (2, 1500, 1)
+    assert (first['request_ms'], first['request_wait_ms'], first['decode_ms']) == (500, 100, 50)
+    assert second['route'] == '/'
+    assert second['cache_hits'] == 3
+    assert 'requests' not in second
+
+
+def test_a_full_file_is_rotated_keeping_the_backups(tmp_path, monkeypatch):
+    path = str(tmp_path / 'metrics.jsonl')
+    metrics = Metrics()
+    metrics.count('invocation')
+    line_size = len(json.dumps(metrics.summary('/'), sort_keys=True)) + 1
+    metrics.reset()
+    # two lines fit in a file, three don't
+    monkeypatch.setattr(metrics, 'max_size', int(line_size * 2.5))
+
+    for number in range(7):
+        metrics.count('invocation')
+        metrics.write(path, '/')
+
+    assert [x['invocation'] for x in read_lines(path)] == [7]
+    assert [x['invocation'] for x in read_lines(path + '.1')] == [5, 6]
+    assert [x['invocation'] for x in read_lines(path + '.2')] == [3, 4]
+    assert not os.path.exists(path + '.3')
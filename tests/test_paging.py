@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Merging the pages of a listing"""
+
+import time
+
+from resources.lib.hal import Page
+
+URL = 'https://content.viaplay.se/xdk-se/serier/samtliga?pageNumber=%s'
+PAGE_COUNT = 5
+PER_PAGE = 10
+
+
+def list_page(number):
+    links = {'self': {'href': URL % number}}
+    if number < PAGE_COUNT:
+        links['next'] = {'href': URL % (number + 1)}
+    return {
+        'type': 'vod-list',
+        'pageCount': PAGE_COUNT,
+        'productsPerPage': PER_PAGE,
+        '_links': links,
+        '_embedded': {'viaplay:products': [{'type': 'series', 'system': {'guid': 'p%s-%s' % (number, x)}}
+                                           for x in range(PER_PAGE)]}
+    }
+
+
+def serve_pages(stub, skip=()):
+    for number in range(1, PAGE_COUNT + 1):
+        if number not in skip:
+            stub.add(URL % number, list_page(number))
+
+
+def guids(products):
+    return [x['system']['guid'] for x in products]
+
+
+def test_all_pages_are_merged(vp, stub):
+    serve_pages(stub)
+
+    items, next_page = vp.merge_pages(Page(list_page(1)), 'products', pages=0)
+
+    assert len(items) == PAGE_COUNT * PER_PAGE
+    assert len(set(guids(items))) == PAGE_COUNT * PER_PAGE
+    assert next_page is False
+
+
+def test_pages_limit(vp, stub):
+    serve_pages(stub)
+
+    items, next_page = vp.merge_pages(Page(list_page(1)), 'products', pages=2)
+
+    assert len(items) == 2 * PER_PAGE
+    assert next_page == URL % 3
+
+
+def test_merging_stops_at_the_first_failed_page(vp, stub):
+    serve_pages(stub, skip=(3,))
+
+    items, next_page = vp.merge_pages(Page(list_page(1)), 'products', pages=0)
+
+    assert guids(items) == guids(list_page(1)['_embedded']['viaplay:products'] +
+                                 list_page(2)['_embedded']['viaplay:products'])
+    assert next_page == URL % 3
+
+
+def test_merging_stops_at_the_time_budget(vp, stub):
+    serve_pages(stub)
+    stub.latency = 2
+    vp.listing_time_budget = 0.3
+
+    started = time.time()
+    items, next_page = vp.merge_pages(Page(list_page(1)), 'products', pages=0)
+
+    assert time.time() - started < 1.5
+    assert len(items) == PER_PAGE
+    assert next_page == URL % 2
+
+
+def test_prediction_counts_merged_items(vp):
+    vp.listing_item_limit = 25
+    page = Page(list_page(1))
+
+    assert vp.predict_pages(URL % 2, page) == [URL % 2, URL % 3, URL % 4]
+    assert vp.predict_pages(URL % 2, page, merged=10) == [URL % 2, URL % 3]
+    assert vp.predict_pages(URL % 2, page, merged=20) == [URL % 2]
+    assert vp.predict_pages(URL % 2, page, remaining=1) == [URL % 2]
+
+
+def test_item_limit_is_not_overshot(vp, stub):
+    serve_pages(stub)
+    vp.listing_item_limit = 25
+
+    items, next_page = vp.merge_pages(Page(list_page(1)), 'products', pages=0)
+
+    assert len(items) == 30
+    assert next_page == URL % 4
+    assert len(stub.requests) == 2
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""Prefetch statistics shared by the prefetch threads"""
+
+import json
+import os
+import threading
+
+
+def test_concurrent_updates_are_all_counted(vp):
+    def update():
+        for _ in range(25):
+            vp.update_prefetch_stats(issued=1, hits=1)
+
+    threads = [threading.Thread(target=update) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(vp.prefetch_file) as stats_file:
+        assert json.load(stats_file) == {'issued': 200, 'hits': 200}
+    assert [x for x in os.listdir(vp.settings_folder) if x.endswith('.tmp')] == []
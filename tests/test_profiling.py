@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Route profiles: a capture per invocation, the newest ones kept"""
+
+import os
+import time
+
+import pytest
+
+from resources.lib.profiling import RouteProfiler
+
+# 2026-10-17 12:00:00 UTC
+NOON = 1792238400
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [NOON + 0.0015]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    return now
+
+
+def profile(folder, route, clock, **kwargs):
+    with RouteProfiler(folder, route, **kwargs):
+        sum(range(100))
+    clock[0] += 0.2
+
+
+def test_routes_profiled_within_a_second_are_all_kept(tmp_path, clock):
+    folder = str(tmp_path)
+    for _ in range(3):
+        profile(folder, '/list_products', clock, memory=True)
+
+    captures = sorted(os.listdir(folder))
+    assert len([x for x in captures if x.endswith('.pstats')]) == 3
+    assert len([x for x in captures if x.endswith('.alloc.txt')]) == 3
+
+
+def test_only_the_newest_captures_of_a_route_are_kept(tmp_path, clock):
+    folder = str(tmp_path)
+    for _ in range(4):
+        profile(folder, '/list_products', clock, keep=2)
+    profile(folder, '/', clock, keep=2)
+
+    captures = sorted(os.listdir(folder))
+    # the last two of the four, at .401 and .601 seconds
+    assert [x[:len('list_products-')] for x in captures[:2]] == ['list_products-'] * 2
+    assert [x[-len('401.pstats'):-len('.pstats')] for x in captures[:2]] == ['401', '601']
+    assert captures[2].startswith('root-')
+    assert len(captures) == 3
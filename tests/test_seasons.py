@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""The all_episodes route: every season, all of its pages, in season and episode order"""
+
+import sys
+
+try:
+    from urllib.parse import parse_qs, urlsplit
+except ImportError:
+    from urlparse import parse_qs, urlsplit
+
+from bench import fixtures
+from bench.routes import Route, prepare_profile, run_plugin
+from tests.stubserver import route_all
+
+SERIES_URL = fixtures.CONTENT + '/serier/series'
+
+
+def season_url(number):
+    return '%s/sasong-%s' % (SERIES_URL, number)
+
+
+def season_page(number, page, page_count, episodes):
+    url = season_url(number)
+    page_links = {'self': {'href': '%s?pageNumber=%s' % (url, page)}}
+    if page < page_count:
+        page_links['next'] = {'href': '%s?pageNumber=%s' % (url, page + 1)}
+    return {
+        'type': 'season-list',
+        'pageCount': page_count,
+        'productsPerPage': len(episodes),
+        'currentPage': page,
+        '_links': page_links,
+        '_embedded': {'viaplay:products': episodes}
+    }
+
+
+def serve_series(stub):
+    """A series of two seasons, listed last season first. Season 1 has two pages
+    with the later episodes on the first one, season 2 also lists a clip."""
+    seasons = [{'type': 'season-list', 'title': str(x), '_links': {'self': {'href': season_url(x)}}}
+               for x in (2, 1)]
+    stub.add(SERIES_URL, {'type': 'page', '_links': {}, '_embedded': {'viaplay:blocks': seasons}})
+    stub.add(season_url(2), season_page(2, 1, 1, [fixtures.episode(21), fixtures.clip(0), fixtures.episode(20)]))
+    stub.add(season_url(1), season_page(1, 1, 2, [fixtures.episode(x) for x in range(5, 10)]))
+    stub.add(season_url(1) + '?pageNumber=2', season_page(1, 2, 2, [fixtures.episode(x) for x in range(5)]))
+
+
+def test_all_episodes_lists_every_season_in_order(kodi, stub, monkeypatch):
+    serve_series(stub)
+    prepare_profile(kodi.profile)
+    route_all(monkeypatch, stub)
+    monkeypatch.setattr(sys, 'argv', sys.argv)
+
+    run_plugin(Route('all_episodes', '/all_episodes'), {'url': SERIES_URL})
+
+    guids = [parse_qs(urlsplit(url).query)['guid'][0] for url, _, _ in kodi.directory]
+    assert guids == ['episode-%s' % x for x in list(range(10)) + [20, 21]]
+    assert kodi.plugin_calls['endOfDirectory'] == 1
+    assert len(stub.requests) == 4
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""The resident service: requests on behalf of the plugin and a changed site setting"""
+
+import threading
+
+import pytest
+
+from resources.lib.service import ADDRESS_PROPERTY, ServiceServer, ViaplayService
+from resources.lib.settings import Settings
+from resources.lib.viaplay import Viaplay
+from tests.stubserver import route_all
+
+URL = 'https://login.viaplay.se/api/persistentLogin/v1'
+COOKIE = 'session=warm; Domain=.viaplay.se; Path=/; Expires=Wed, 01 Jan 2031 00:00:00 GMT'
+
+
+@pytest.fixture
+def server(kodi, vp):
+    """The service's server, its Viaplay talking to the stub, with its address published."""
+    service_server = ServiceServer(vp)
+    threading.Thread(target=service_server.serve_forever, daemon=True).start()
+    kodi.properties[ADDRESS_PROPERTY] = '%s:%s' % (service_server.server_address[1], service_server.token)
+    yield service_server
+    service_server.shutdown()
+    service_server.server_close()
+
+
+@pytest.fixture
+def plugin(kodi, stub, monkeypatch):
+    """The Viaplay of a plugin invocation, sending its requests through the service.
+    Its own session, only set up when the service can't be reached, talks to the stub too."""
+    route_all(monkeypatch, stub)
+    return Viaplay(kodi.profile, 'se', use_service=True, settings=Settings())
+
+
+def test_the_plugin_request_is_made_by_the_service(stub, server, plugin):
+    stub.add(URL, {'success': True}, headers={'Set-Cookie': COOKIE})
+
+    assert plugin.make_request(URL, 'get') == {'success': True}
+    assert len(stub.requests) == 1
+    # the plugin never set up a session of its own
+    assert plugin._http_session is None
+    # the service saved the cookie it got, for the next invocation to load
+    with open(server.vp.cookie_jar.filename) as cookie_file:
+        assert 'warm' in cookie_file.read()
+
+
+def test_a_wrong_token_falls_back_to_the_plugin_session(kodi, stub, server, plugin):
+    stub.add(URL, {'success': True})
+    kodi.properties[ADDRESS_PROPERTY] = '%s:%s' % (server.server_address[1], 'not-the-token')
+
+    assert plugin.make_request(URL, 'get') == {'success': True}
+    assert len(stub.requests) == 1
+    assert plugin.use_service is False
+    assert plugin._http_session is not None
+
+
+def test_a_changed_site_rebuilds_the_service_viaplay(kodi):
+    service = ViaplayService()
+    service.start()
+    try:
+        assert service.vp.login_api == 'https://login.viaplay.se/api'
+
+        kodi.settings['site'] = '1'
+        service.onSettingsChanged()
+        assert service.vp.country == 'dk'
+        assert service.vp.device_key == 'xdk-dk'
+        assert service.vp.login_api == 'https://login.viaplay.dk/api'
+        assert service.server.vp is service.vp
+    finally:
+        service.stop()
+    assert ADDRESS_PROPERTY not in kodi.properties
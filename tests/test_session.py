@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""A failed login check forgets the cached session"""
+
+import pytest
+
+URL = 'https://content.viaplay.se/xdk-se/serier/samtliga'
+USER_DATA = {'userId': '1', 'firstName': 'Test'}
+
+
+def login_url(vp):
+    return 'https://login.viaplay.se/api/persistentLogin/v1?deviceKey=%s' % vp.device_key
+
+
+def test_cached_session_is_trusted(vp, stub):
+    vp.save_session(USER_DATA)
+
+    assert vp.validate_session()
+    assert stub.requests == []
+
+
+def test_failed_forced_check_invalidates_session(vp, stub):
+    vp.save_session(USER_DATA)
+    stub.add(login_url(vp), {'success': False, 'name': 'PersistentLoginError'})
+
+    with pytest.raises(vp.ViaplayError) as error:
+        vp.validate_session(force=True)
+
+    assert error.value.value == 'PersistentLoginError'
+    assert vp.get_session() is None
+    with pytest.raises(vp.ViaplayError):
+        vp.validate_session()
+
+
+def test_failed_request_revalidates_and_invalidates_session(vp, stub):
+    vp.save_session(USER_DATA)
+    stub.add(URL, {'success': False, 'name': 'MissingSessionCookieError'})
+    stub.add(login_url(vp), {'success': False, 'name': 'PersistentLoginError'})
+
+    with pytest.raises(vp.ViaplayError) as error:
+        vp.make_request(URL, 'get')
+
+    assert error.value.value == 'PersistentLoginError'
+    assert vp.get_session() is None
+
+
+def test_successful_forced_check_keeps_session(vp, stub):
+    vp.save_session(USER_DATA)
+    stub.add(login_url(vp), {'success': True, 'userData': USER_DATA})
+
+    assert vp.validate_session(force=True)
+    assert vp.get_session() == USER_DATA
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Stale cache entries: served at once and refreshed in the background, or when offline"""
+
+import threading
+import time
+
+import pytest
+import requests
+
+from tests.test_conditional_requests import BODY, URL, expire
+
+CHANGED = dict(BODY, title='changed')
+
+
+@pytest.fixture
+def revalidated(vp, monkeypatch):
+    """Set when a background revalidation has finished."""
+    finished = threading.Event()
+    revalidate = vp._revalidate
+
+    def signalling_revalidate(*args):
+        try:
+            revalidate(*args)
+        finally:
+            finished.set()
+
+    monkeypatch.setattr(vp, '_revalidate', signalling_revalidate)
+    return finished
+
+
+def cache_stale(vp, stub):
+    stub.add(URL, BODY, headers={'ETag': '"v1"'})
+    vp.make_request(URL, 'get')
+    expire(vp, URL, time.time() - 60)
+    stub.reset_counters()
+
+
+def test_a_stale_entry_is_served_and_refreshed_in_the_background(vp, stub, revalidated):
+    cache_stale(vp, stub)
+    stub.add(URL, CHANGED, headers={'ETag': '"v2"'})
+    stub.latency = 0.5
+
+    started = time.time()
+    assert vp.make_request(URL, 'get', stale_while_revalidate=True) == BODY
+    assert time.time() - started < stub.latency
+
+    assert revalidated.wait(5)
+    (_, _, headers), = stub.requests
+    assert headers['If-None-Match'] == '"v1"'
+    entry = vp.cache.get(URL)
+    assert entry['etag'] == '"v2"'
+    assert vp.cache.is_fresh(entry)
+    stub.latency = 0
+    assert vp.make_request(URL, 'get', stale_while_revalidate=True) == CHANGED
+    assert len(stub.requests) == 1
+
+
+def test_without_stale_while_revalidate_the_stale_entry_is_revalidated_first(vp, stub, revalidated):
+    cache_stale(vp, stub)
+    stub.add(URL, CHANGED, headers={'ETag': '"v2"'})
+
+    assert vp.make_request(URL, 'get') == CHANGED
+    assert len(stub.requests) == 1
+    assert not revalidated.is_set()
+
+
+def test_a_connection_error_returns_the_cached_entry(vp, stub, monkeypatch):
+    stub.add(URL, BODY)
+    vp.make_request(URL, 'get')
+    expire(vp, URL)
+
+    def offline(*args, **kwargs):
+        raise requests.exceptions.ConnectionError('Network is unreachable')
+
+    monkeypatch.setattr(vp, 'http_request', offline)
+    assert vp.make_request(URL, 'get') == BODY
+
+    vp.cache.discard(URL)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        vp.make_request(URL, 'get')